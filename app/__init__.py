@@ -5,8 +5,9 @@ __version__ = "0.1.0"
 
 import logging
 from logging.handlers import RotatingFileHandler
-from flask import Flask, current_app
+from flask import Flask, current_app, g
 from flask_sqlalchemy import SQLAlchemy
+from werkzeug.local import LocalProxy
 import sentry_sdk
 from sentry_sdk.integrations.flask import FlaskIntegration
 from config import config
@@ -27,7 +28,28 @@ def log_exception(e):
     sentry_sdk.capture_exception(e)
 
 
-db = SQLAlchemy()
+class _SQLAlchemy(SQLAlchemy):
+    """
+    Flask-SQLAlchemy extension which supports the SQLALCHEMY_POOL_PRE_PING setting.
+
+    If this setting is true, connections are tested for liveness whenever they are
+    checked out from the connection pool.
+
+    """
+
+    def apply_driver_hacks(self, app, info, options):
+        options.setdefault(
+            "pool_pre_ping", app.config.get("SQLALCHEMY_POOL_PRE_PING", False)
+        )
+        return SQLAlchemy.apply_driver_hacks(self, app, info, options)
+
+
+db = _SQLAlchemy()
+
+from app.cache import ResultCache  # noqa E402
+
+# cache for the results of the data loaders, which is shared by all requests
+result_cache = ResultCache("RESULT_CACHE")
 
 from app.dataloader import (
     ObservationLoader,
@@ -37,25 +59,71 @@ from app.dataloader import (
     InvestigatorLoader,
 )  # noqa E402
 
-loaders = {
-    "proposal_loader": ProposalLoader(),
-    "observation_loader": ObservationLoader(),
-    "observing_window_loader": ObservingWindowLoader(),
-    "block_loader": BlockLoader(),
-    "investigator_loader": InvestigatorLoader(),
-}
+
+def _request_loaders():
+    """
+    Get the data loaders for the current request.
+
+    The data loaders are created when they are first needed in a request, and they
+    are stored as property `loaders` of Flask's `g` object. So every request gets its
+    own loaders, and batches from concurrent requests never get mixed up.
+
+    Returns
+    -------
+    dict :
+        The data loaders for the current request.
+
+    """
+
+    if "loaders" not in g:
+        g.loaders = {
+            "proposal_loader": ProposalLoader(),
+            "observation_loader": ObservationLoader(),
+            "observing_window_loader": ObservingWindowLoader(),
+            "block_loader": BlockLoader(),
+            "investigator_loader": InvestigatorLoader(),
+        }
+    return g.loaders
+
+
+loaders = LocalProxy(_request_loaders)
 
 # these imports can only happen here as otherwise there might be import errors
-from app.auth import verify_token  # noqa E402
+from app.auth import user_cache, verify_token  # noqa E402
+from app.dataloader.fetch import close_request_connection  # noqa E402
+from app.events import change_detector  # noqa E402
+from app.statistics import (
+    refresh_semester_statistics_command,
+    semester_statistics,
+)  # noqa E402
 from app.main import main  # noqa E402
 from app.graphql import graphql  # noqa E402
+from app.graphql.cost import cost_limiter  # noqa E402
+from app.graphql.persisted_queries import document_cache  # noqa E402
+from app.graphql.views import persisted_queries  # noqa E402
+from app.jobs import job_queue  # noqa E402
+from app.profiling import statement_profiler  # noqa E402
+from app.response_cache import response_cache  # noqa E402
+from app.submission import SpoolingRequest  # noqa E402
+from app.tracing import tracer  # noqa E402
 
 
 def create_app(config_name):
     app = Flask("__name__")
     app.config.from_object(config[config_name])
 
+    # uploaded files are spooled to disk rather than kept in memory
+    app.request_class = SpoolingRequest
+
     db.init_app(app)
+    app.teardown_appcontext(close_request_connection)
+    result_cache.init_app(app)
+    user_cache.init_app(app)
+    semester_statistics.init_app(app)
+    document_cache.init_app(app)
+    response_cache.init_app(app)
+    cost_limiter.init_app(app)
+    tracer.init_app(app)
 
     # logging to file
     log_file_path = app.config["LOG_FILE_PATH"]
@@ -68,6 +136,15 @@ def create_app(config_name):
     handler.setFormatter(formatter)
     app.logger.addHandler(handler)
 
+    # profiling SQL statements, with slow statements logged to the log file
+    statement_profiler.init_app(app)
+
+    # background jobs, such as processing submissions
+    job_queue.init_app(app)
+
+    # server-sent events for block status changes and new observations
+    change_detector.init_app(app)
+
     # setting up Sentry
     sentry_dsn = app.config["SENTRY_DSN"]
     if not sentry_dsn:
@@ -80,6 +157,10 @@ def create_app(config_name):
     app.register_blueprint(graphql)
     app.register_blueprint(main)
 
+    persisted_queries.init_app(app)
+
     app.before_request(verify_token)
 
+    app.cli.add_command(refresh_semester_statistics_command)
+
     return app
@@ -3,6 +3,10 @@ import os
 from flask import g, request
 from saltuser import SALTUser
 from app import db
+from app.cache import ResultCache
+
+# cache for authenticated users and their permissions, shared by all requests
+user_cache = ResultCache("USER_CACHE")
 
 
 class User:
@@ -39,6 +43,23 @@ def load_user(user_id):
     return SALTUser(int(user_id), db.engine)
 
 
+def invalidate_user(user_id):
+    """
+    Remove a user and their permissions from the user cache.
+
+    This should be called whenever the roles or permissions of a user change.
+
+    Parameters
+    ----------
+    user_id : int
+        The user id.
+
+    """
+
+    user_cache.invalidate_matching("user", lambda key: key[0] == user_id)
+    user_cache.invalidate("viewable_proposals", user_id)
+
+
 def verify_token():
     """
     Verify the token sent in the Authorization header.
@@ -47,10 +68,14 @@ def verify_token():
     form 'Token abcdef', with 'abcdef` denoting an encrypted JWT token. In case it is
     indeed of this form, the token is decrypted and the :func:`load_user` function is
     called to create a user object. The user object thus created is assigned as
-    property `user` to Flask's `g` object.
+    property `user` to Flask's `g` object, and the user id as property `user_id`.
+
+    User objects are kept in a cache (keyed by user id and token) across requests, so
+    that clients sending many requests don't pay for loading the user every time.
 
     """
     g.user = None
+    g.user_id = None
     if "Authorization" in request.headers:
         parts = request.headers["Authorization"].split(None, 1)
         if len(parts) > 1:
@@ -62,7 +87,11 @@ def verify_token():
                     user = {}
 
                 if "user_id" in user:
-                    g.user = load_user(user["user_id"])
+                    g.user_id = int(user["user_id"])
+                    g.user = user_cache.get("user", (g.user_id, token))
+                    if g.user is None:
+                        g.user = load_user(g.user_id)
+                        user_cache.set("user", (g.user_id, token), g.user)
 
 
 def encode(content):
@@ -0,0 +1,292 @@
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from app.metrics import registry
+
+# all result caches, so that their statistics can be exposed as metrics
+_caches = weakref.WeakSet()
+
+
+class ResultCache:
+    """
+    A thread-safe, process-wide LRU cache with a time to live for its entries.
+
+    Entries are stored by namespace (such as "proposal" or "block") and key (such as
+    a proposal code or block id). The cache is configured from the Flask app
+    configuration by calling :meth:`init_app`, using the settings
+    `<config_prefix>_MAX_SIZE` and `<config_prefix>_TTL`. A maximum size of 0
+    disables the cache, and a time to live of None means that entries never expire.
+
+    The numbers of cache hits and misses are recorded, and together with the cache
+    size they are available from :meth:`stats`.
+
+    Parameters
+    ----------
+    config_prefix : str
+        The prefix of the configuration settings for this cache.
+    max_size : int
+        The maximum number of entries, which is used until :meth:`init_app` is
+        called.
+    ttl : float or None
+        The time to live of an entry, in seconds, which is used until
+        :meth:`init_app` is called.
+
+    """
+
+    def __init__(self, config_prefix="RESULT_CACHE", max_size=0, ttl=None):
+        self.config_prefix = config_prefix
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        _caches.add(self)
+
+    @property
+    def name(self):
+        """The cache name, which is the lower case config prefix."""
+
+        return self.config_prefix.lower()
+
+    def init_app(self, app):
+        """
+        Configure the cache from the configuration of a Flask app.
+
+        Parameters
+        ----------
+        app : Flask
+            The Flask app.
+
+        """
+
+        self.max_size = app.config.get(self.config_prefix + "_MAX_SIZE", 0)
+        self.ttl = app.config.get(self.config_prefix + "_TTL")
+        self.clear()
+
+    def get(self, namespace, key):
+        """
+        Get a cached value.
+
+        Parameters
+        ----------
+        namespace : str
+            The namespace, such as "proposal".
+        key : hashable
+            The key, such as a proposal code.
+
+        Returns
+        -------
+        object :
+            The cached value, or None if there is no (unexpired) value.
+
+        """
+
+        return self.get_many(namespace, [key]).get(key)
+
+    def get_many(self, namespace, keys):
+        """
+        Get the cached values for a list of keys.
+
+        Parameters
+        ----------
+        namespace : str
+            The namespace, such as "proposal".
+        keys : iterable
+            The keys, such as proposal codes.
+
+        Returns
+        -------
+        dict :
+            A dictionary of the keys with a cached (unexpired) value and their
+            values.
+
+        """
+
+        now = time.monotonic()
+        values = dict()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get((namespace, key))
+                if entry is None:
+                    self._misses += 1
+                    continue
+                expires, value = entry
+                if expires is not None and expires <= now:
+                    del self._entries[(namespace, key)]
+                    self._misses += 1
+                    continue
+                self._entries.move_to_end((namespace, key))
+                values[key] = value
+                self._hits += 1
+
+        return values
+
+    def set(self, namespace, key, value):
+        """
+        Cache a value.
+
+        Parameters
+        ----------
+        namespace : str
+            The namespace, such as "proposal".
+        key : hashable
+            The key, such as a proposal code.
+        value : object
+            The value to cache.
+
+        """
+
+        self.set_many(namespace, {key: value})
+
+    def set_many(self, namespace, values):
+        """
+        Cache several values.
+
+        Parameters
+        ----------
+        namespace : str
+            The namespace, such as "proposal".
+        values : dict
+            A dictionary of the keys and the values to cache.
+
+        """
+
+        if self.max_size <= 0:
+            return
+
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            for key, value in values.items():
+                self._entries[(namespace, key)] = (expires, value)
+                self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_or_fetch(self, namespace, keys, fetch):
+        """
+        Get the values for a list of keys, fetching those which aren't cached.
+
+        The fetched values are added to the cache.
+
+        Parameters
+        ----------
+        namespace : str
+            The namespace, such as "proposal".
+        keys : list
+            The keys, such as proposal codes.
+        fetch : function
+            A function which accepts a list of keys and returns the list of
+            corresponding values, in the same order.
+
+        Returns
+        -------
+        list :
+            The values, in the same order as the keys.
+
+        """
+
+        values = self.get_many(namespace, keys)
+        missing = [key for key in keys if key not in values]
+        if missing:
+            fetched = dict(zip(missing, fetch(missing)))
+            self.set_many(namespace, fetched)
+            values.update(fetched)
+
+        return [values[key] for key in keys]
+
+    def invalidate(self, namespace, key=None):
+        """
+        Remove a value, or all the values in a namespace, from the cache.
+
+        Parameters
+        ----------
+        namespace : str
+            The namespace, such as "proposal".
+        key : hashable
+            The key, such as a proposal code. If no key is given, all the values in
+            the namespace are removed.
+
+        """
+
+        with self._lock:
+            if key is not None:
+                self._entries.pop((namespace, key), None)
+            else:
+                for cache_key in [k for k in self._entries if k[0] == namespace]:
+                    del self._entries[cache_key]
+
+    def invalidate_matching(self, namespace, match):
+        """
+        Remove all values whose key matches a condition from a namespace.
+
+        Parameters
+        ----------
+        namespace : str
+            The namespace, such as "user".
+        match : function
+            A function which accepts a key and returns whether its value should be
+            removed.
+
+        """
+
+        with self._lock:
+            for cache_key in [
+                k for k in self._entries if k[0] == namespace and match(k[1])
+            ]:
+                del self._entries[cache_key]
+
+    def clear(self):
+        """
+        Remove all values from the cache.
+
+        The hit and miss counts are reset as well.
+
+        """
+
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def stats(self):
+        """
+        Get the cache statistics.
+
+        Returns
+        -------
+        dict :
+            The current number of entries ("size"), the maximum number of entries
+            ("max_size"), the numbers of hits ("hits") and misses ("misses"), and the
+            fraction of lookups which were hits ("hit_rate").
+
+        """
+
+        with self._lock:
+            lookups = self._hits + self._misses
+            return dict(
+                size=len(self._entries),
+                max_size=self.max_size,
+                hits=self._hits,
+                misses=self._misses,
+                hit_rate=self._hits / lookups if lookups else 0.0,
+            )
+
+
+def _collect_cache_stats(stat):
+    return {(cache.name,): cache.stats()[stat] for cache in list(_caches)}
+
+
+for _stat, _description in [
+    ("size", "The number of entries in the cache."),
+    ("hits", "The number of cache hits."),
+    ("misses", "The number of cache misses."),
+    ("hit_rate", "The fraction of cache lookups which were hits."),
+]:
+    registry.gauge(
+        "cache_" + _stat,
+        _description,
+        labels=("cache",),
+        collect=lambda stat=_stat: _collect_cache_stats(stat),
+    )
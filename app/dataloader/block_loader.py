@@ -1,9 +1,9 @@
 from collections import namedtuple
-import pandas as pd
-from promise import Promise
 from promise.dataloader import DataLoader
 from graphql import GraphQLError
-from app import db
+from app import result_cache
+from app.dataloader.fetch import fetch_rows, load_batch, run_concurrently
+from app.response_cache import record_tag
 from app.util import _SemesterContent, BlockStatus
 
 BlockContent = namedtuple(
@@ -24,16 +24,38 @@ BlockContent = namedtuple(
 )
 
 
-class BlockLoader(DataLoader):
-    def __init__(self):
-        DataLoader.__init__(self, cache=False)
+BlockKey = namedtuple("BlockKey", ["block_id", "parts"])
+
+# the parts of a block which are only loaded if they are requested
+BLOCK_PARTS = frozenset(["visits"])
+
+
+def block_key(block_id, fields=None):
+    """
+    Get the key for loading a block with the block loader.
+
+    Parameters
+    ----------
+    block_id : int
+        The block id.
+    fields : iterable of str
+        The requested block fields, such as "name" or "visits". If None, all parts of
+        the block are loaded.
 
-    def batch_load_fn(self, block_ids):
-        return Promise.resolve(self.get_blocks(block_ids))
+    Returns
+    -------
+    BlockKey :
+        The key.
 
-    def get_blocks(self, block_ids):
-        # block details
-        sql = """
+    """
+
+    if fields is None:
+        return BlockKey(block_id, BLOCK_PARTS)
+    return BlockKey(block_id, BLOCK_PARTS.intersection(fields))
+
+
+def _block_details(connection, block_ids):
+    sql = """
 SELECT Block_Id, BlockCode, Proposal_Code, Block_Name, BlockStatus, BlockStatusReason,
        Year, Semester, ObsTime, Priority
        FROM Block AS b
@@ -42,49 +64,90 @@ SELECT Block_Id, BlockCode, Proposal_Code, Block_Name, BlockStatus, BlockStatusR
        JOIN ProposalCode ON b.ProposalCode_Id = ProposalCode.ProposalCode_Id
        JOIN Proposal AS p ON b.Proposal_Id = p.Proposal_Id
        JOIN Semester AS s ON p.Semester_Id = s.Semester_Id
-       WHERE Block_Id IN %(block_ids)s
+       WHERE Block_Id IN :block_ids
 """
-        df_blocks = pd.read_sql(sql, con=db.engine, params=dict(block_ids=block_ids))
+    values = dict()
+    for row in fetch_rows(sql, dict(block_ids=block_ids), con=connection):
+        # collect details of the block
+        values[row.Block_Id] = dict(
+            id=row.Block_Id,
+            block_code=row.BlockCode,
+            proposal=row.Proposal_Code,
+            name=row.Block_Name,
+            status=BlockStatus.get(row.BlockStatus),
+            status_reason=row.BlockStatusReason,
+            semester=_SemesterContent(year=row.Year, semester=row.Semester),
+            length=row.ObsTime,
+            priority=row.Priority,
+            # The observing windows depend on the block id as well as the window
+            # type. The latter is passed as argument when requesting observing
+            # windows. We use the block id as the observing windows value so that it
+            # can be picked up by the resolver function for observing windows later
+            # on.
+            observing_windows=row.Block_Id,
+        )
+    return values
+
 
-        # block visits
-        sql = """
+def _block_visits(connection, block_ids):
+    sql = """
 SELECT Block_Id, BlockVisit_Id
        FROM BlockVisit AS bv
-       WHERE Block_Id IN %(block_ids)s
+       WHERE Block_Id IN :block_ids
 """
-        df_visits = pd.read_sql(sql, con=db.engine, params=dict(block_ids=block_ids))
-
-        # collect details of observing windows and group them according to past, tonight's and remaining
-        values = dict()
-        for _, row in df_blocks.iterrows():
-            # collect details of the block
-            values[row["Block_Id"]] = dict(
-                id=row["Block_Id"],
-                block_code=row["BlockCode"],
-                proposal=row["Proposal_Code"],
-                name=row["Block_Name"],
-                status=BlockStatus.get(row["BlockStatus"]),
-                status_reason=row["BlockStatusReason"],
-                semester=_SemesterContent(year=row["Year"], semester=row["Semester"]),
-                length=row["ObsTime"],
-                priority=row["Priority"],
-                visits=set(),
-                # The observing windows depend on the block id as well as the window type.
-                # The latter is passed as argument when requesting observing windows.
-                # We use the block id as the observing windows value so that
-                # it can be picked up by the resolver function for observing windows later on.
-                observing_windows=row["Block_Id"]
-            )
+    values = {block_id: set() for block_id in block_ids}
+    for row in fetch_rows(sql, dict(block_ids=block_ids), con=connection):
+        values[row.Block_Id].add(row.BlockVisit_Id)
+    return values
+
+
+class BlockLoader(DataLoader):
+    """
+    Data loader for blocks.
+
+    The keys must be created with :func:`block_key`. The block visits are only
+    queried if they are requested. Otherwise they are None in the returned block
+    content.
+    """
 
-        for _, row in df_visits.iterrows():
-            values[row["Block_Id"]]["visits"].add(row["BlockVisit_Id"].item())
+    def batch_load_fn(self, keys):
+        for key in keys:
+            record_tag("block", key.block_id)
+        return load_batch("block", self.get_blocks, keys)
+
+    def get_blocks(self, keys):
+        block_ids = list(dict.fromkeys(key.block_id for key in keys))
+        visit_block_ids = list(
+            dict.fromkeys(key.block_id for key in keys if "visits" in key.parts)
+        )
+
+        # get whatever is in the cache, and query for the rest
+        blocks = result_cache.get_many("block", block_ids)
+        visits = result_cache.get_many("block_visits", visit_block_ids)
+        missing_block_ids = [i for i in block_ids if i not in blocks]
+        missing_visit_block_ids = [i for i in visit_block_ids if i not in visits]
+        tasks = dict()
+        if missing_block_ids:
+            tasks["block"] = lambda connection: _block_details(
+                connection, missing_block_ids
+            )
+        if missing_visit_block_ids:
+            tasks["block_visits"] = lambda connection: _block_visits(
+                connection, missing_visit_block_ids
+            )
+        fetched = run_concurrently(tasks)
+        for namespace, values in [("block", blocks), ("block_visits", visits)]:
+            if namespace in fetched:
+                result_cache.set_many(namespace, fetched[namespace])
+                values.update(fetched[namespace])
 
-        def get_block_content(block_id):
-            block = values.get(block_id)
+        def get_block_content(key):
+            block = blocks.get(key.block_id)
             if not block:
                 raise GraphQLError(
-                    "There is no block with id {block_id}".format(block_id=block_id)
+                    "There is no block with id {block_id}".format(block_id=key.block_id)
                 )
-            return BlockContent(**block)
+            block_visits = visits[key.block_id] if "visits" in key.parts else None
+            return BlockContent(visits=block_visits, **block)
 
-        return [get_block_content(block_id) for block_id in block_ids]
+        return [get_block_content(key) for key in keys]
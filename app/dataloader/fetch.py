@@ -0,0 +1,299 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from collections import namedtuple
+from functools import lru_cache
+from flask import current_app, g
+from promise import Promise
+from sqlalchemy import bindparam, exc, text
+from app import db
+from app.metrics import registry
+from app.tracing import (
+    current_loader,
+    current_trace,
+    timed_batch,
+    use_loader,
+    use_trace,
+)
+
+
+FETCH_SIZE = 1000
+
+_checkout_seconds = registry.histogram(
+    "db_pool_checkout_seconds",
+    "Time spent waiting for a connection from the database connection pool.",
+)
+
+_pool_exhausted = registry.counter(
+    "db_pool_exhausted_total",
+    "Connection checkouts which found all pooled connections in use.",
+)
+
+_pool_timeouts = registry.counter(
+    "db_pool_timeouts_total",
+    "Connection checkouts which timed out because the pool was exhausted.",
+)
+
+
+def _pool_status():
+    pool = db.engine.pool
+    status = dict()
+    for name in ["size", "checkedin", "checkedout", "overflow"]:
+        if hasattr(pool, name):
+            status[(name,)] = getattr(pool, name)()
+    return status
+
+
+registry.gauge(
+    "db_pool_connections",
+    "The state of the database connection pool.",
+    labels=("state",),
+    collect=_pool_status,
+)
+
+
+def checkout_connection(engine=None):
+    """
+    Check out a connection from the connection pool of a database engine.
+
+    The time spent waiting for the connection and pool exhaustion are recorded as
+    metrics.
+
+    Parameters
+    ----------
+    engine : Engine
+        The database engine. The engine of the app's database is used by default.
+
+    Returns
+    -------
+    Connection :
+        The database connection.
+
+    """
+
+    engine = engine if engine is not None else db.engine
+    pool = engine.pool
+    if hasattr(pool, "checkedout") and hasattr(pool, "size"):
+        max_overflow = getattr(pool, "_max_overflow", 0)
+        if max_overflow >= 0 and pool.checkedout() >= pool.size() + max_overflow:
+            _pool_exhausted.inc()
+
+    start = time.perf_counter()
+    try:
+        return engine.connect()
+    except exc.TimeoutError:
+        _pool_timeouts.inc()
+        raise
+    finally:
+        _checkout_seconds.observe(time.perf_counter() - start)
+
+
+def request_connection():
+    """
+    Get the database connection for the current request.
+
+    The connection is checked out from the connection pool when it is first needed,
+    and it is reused by all queries in the same request (or, more precisely, app
+    context). It is returned to the pool by :func:`close_request_connection` when
+    the app context is torn down.
+
+    Returns
+    -------
+    Connection :
+        The database connection.
+
+    """
+
+    if "db_connection" not in g:
+        g.db_connection = checkout_connection()
+    return g.db_connection
+
+
+def close_request_connection(exception=None):
+    """
+    Return the database connection of the current request (if there is one) to the
+    connection pool.
+
+    This function is registered as a teardown function for the app context.
+
+    Parameters
+    ----------
+    exception : Exception
+        The exception which caused the teardown, if any.
+
+    """
+
+    connection = g.pop("db_connection", None)
+    if connection is not None:
+        connection.close()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _query_executor(max_workers):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="db-query"
+            )
+        return _executor
+
+
+def run_concurrently(tasks):
+    """
+    Run database tasks concurrently, each with its own pooled connection.
+
+    Each task is a function which takes a database connection as its only argument.
+    The tasks are run on a thread pool whose size is given by the
+    DATABASE_QUERY_THREADS setting, and each task checks out its own connection from
+    the connection pool, so that the round trips to the database overlap. If the
+    setting is 0 or there is only one task, the tasks are run one after the other on
+    the connection of the current request.
+
+    Note that every concurrent task needs a connection of its own, so the connection
+    pool should be large enough for the number of threads.
+
+    Parameters
+    ----------
+    tasks : dict
+        The tasks, as a dictionary of names and functions.
+
+    Returns
+    -------
+    dict :
+        The task results, as a dictionary of names and results.
+
+    """
+
+    max_workers = current_app.config.get("DATABASE_QUERY_THREADS", 0)
+    if max_workers <= 0 or len(tasks) <= 1:
+        connection = request_connection()
+        return {name: task(connection) for name, task in tasks.items()}
+
+    # the engine and trace must be looked up in this thread, as they require the app
+    # context
+    engine = db.engine
+    trace = current_trace()
+    loader = current_loader()
+
+    def run(task):
+        connection = checkout_connection(engine)
+        try:
+            with use_trace(trace), use_loader(loader):
+                return task(connection)
+        finally:
+            connection.close()
+
+    executor = _query_executor(max_workers)
+    futures = {name: executor.submit(run, task) for name, task in tasks.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+
+def load_batch(loader, fetch, keys):
+    """
+    Load the values for a batch of data loader keys.
+
+    If the GraphQL request is executed with an executor which supports offloading
+    (see :class:`~app.graphql.executor.ThreadOffloadingExecutor`), the fetch
+    function is run on a background thread, so that independent batches are loaded
+    concurrently. Otherwise it is run immediately.
+
+    The batch size and the time taken for loading the batch are recorded (see
+    :func:`~app.tracing.timed_batch`).
+
+    Parameters
+    ----------
+    loader : str
+        The name of the data loader, such as "proposal".
+    fetch : function
+        A function which accepts the list of keys and returns the list of
+        corresponding values, in the same order.
+    keys : list
+        The keys.
+
+    Returns
+    -------
+    Promise :
+        A promise for the list of values.
+
+    """
+
+    fetch = timed_batch(loader, fetch)
+    executor = g.get("graphql_executor")
+    if executor is None:
+        return Promise.resolve(fetch(keys))
+    return executor.offload(fetch, keys)
+
+
+@lru_cache(maxsize=256)
+def _row_type(columns):
+    """
+    Get the named tuple type for rows with given columns.
+
+    Parameters
+    ----------
+    columns : tuple of str
+        The column names.
+
+    Returns
+    -------
+    type :
+        The named tuple type.
+
+    """
+
+    return namedtuple("Row", columns, rename=True)
+
+
+def fetch_rows(sql, params=None, con=None):
+    """
+    Execute an SQL query and yield the resulting rows as named tuples.
+
+    The query is executed with SQLAlchemy, and rows are fetched from the database
+    cursor in chunks. Named parameters must be given in the form `:name` in the SQL
+    query. A parameter whose value is a list, tuple or set is expanded, so that it can
+    be used with the IN operator, as in `WHERE Block_Id IN :block_ids`.
+
+    If no database connection is passed, the connection of the current request is
+    used (see :func:`request_connection`).
+
+    Parameters
+    ----------
+    sql : str
+        The SQL query.
+    params : dict
+        The query parameters.
+    con : Connection
+        The database connection to use.
+
+    Yields
+    ------
+    namedtuple :
+        The rows, with the column names as field names.
+
+    """
+
+    params = dict(params or {})
+    statement = text(sql)
+    expanding = []
+    for name, value in params.items():
+        if isinstance(value, (list, tuple, set, frozenset)):
+            params[name] = list(value)
+            expanding.append(bindparam(name, expanding=True))
+    if expanding:
+        statement = statement.bindparams(*expanding)
+
+    connection = con if con is not None else request_connection()
+    result = connection.execute(statement, params)
+    if not result.returns_rows:
+        return
+    row_type = _row_type(tuple(result.keys()))
+    while True:
+        rows = result.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        for row in rows:
+            yield row_type._make(row)
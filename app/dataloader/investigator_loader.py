@@ -1,9 +1,9 @@
 from collections import namedtuple
-import pandas as pd
-from promise import Promise
 from promise.dataloader import DataLoader
 from graphql import GraphQLError
-from app import db
+from app import result_cache
+from app.dataloader.fetch import fetch_rows, load_batch
+from app.response_cache import record_tag
 
 
 InvestigatorContent = namedtuple(
@@ -12,30 +12,32 @@ InvestigatorContent = namedtuple(
 
 
 class InvestigatorLoader(DataLoader):
-    def __init__(self):
-        DataLoader.__init__(self, cache=False)
-
     def batch_load_fn(self, investigator_ids):
-        return Promise.resolve(self.get_investigators(investigator_ids))
+        for investigator_id in investigator_ids:
+            record_tag("investigator", investigator_id)
+        return load_batch(
+            "investigator",
+            lambda ids: result_cache.get_or_fetch(
+                "investigator", ids, self.get_investigators
+            ),
+            investigator_ids,
+        )
 
     def get_investigators(self, investigator_ids):
         sql = """
 SELECT Investigator_Id, FirstName, Surname, Email
        FROM Investigator
-       WHERE Investigator_Id IN %(investigator_ids)s
+       WHERE Investigator_Id IN :investigator_ids
         """
-        df = pd.read_sql(
-            sql, con=db.engine, params=dict(investigator_ids=investigator_ids)
-        )
 
         # collect the values
         data = dict()
-        for _, row in df.iterrows():
-            data[row["Investigator_Id"]] = dict(
-                id=row["Investigator_Id"],
-                given_name=row["FirstName"],
-                family_name=row["Surname"],
-                email=row["Email"],
+        for row in fetch_rows(sql, dict(investigator_ids=investigator_ids)):
+            data[row.Investigator_Id] = dict(
+                id=row.Investigator_Id,
+                given_name=row.FirstName,
+                family_name=row.Surname,
+                email=row.Email,
             )
 
         def get_investigator(investigator_id):
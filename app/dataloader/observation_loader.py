@@ -1,10 +1,10 @@
 from collections import namedtuple
-import pandas as pd
 import pytz
-from promise import Promise
 from promise.dataloader import DataLoader
 from graphql import GraphQLError
-from app import db
+from app import result_cache
+from app.dataloader.fetch import fetch_rows, load_batch, run_concurrently
+from app.response_cache import record_tag
 from app.util import ObservationStatus
 
 
@@ -13,70 +13,129 @@ ObservationContent = namedtuple(
 )
 
 
-class ObservationLoader(DataLoader):
+ObservationKey = namedtuple("ObservationKey", ["observation_id", "parts"])
+
+# the parts of an observation which are only loaded if they are requested
+OBSERVATION_PARTS = frozenset(["start"])
+
+
+def observation_key(observation_id, fields=None):
     """
-    Data loader for observations.
+    Get the key for loading an observation with the observation loader.
+
+    Parameters
+    ----------
+    observation_id : int
+        The observation (i.e. block visit) id.
+    fields : iterable of str
+        The requested observation fields, such as "night" or "start". If None, all
+        parts of the observation are loaded.
+
+    Returns
+    -------
+    ObservationKey :
+        The key.
 
-    Observations in the GraphQL schema are called BlockVisit in the database.
     """
 
-    def __init__(self):
-        DataLoader.__init__(self, cache=False)
+    if fields is None:
+        return ObservationKey(observation_id, OBSERVATION_PARTS)
+    return ObservationKey(observation_id, OBSERVATION_PARTS.intersection(fields))
 
-    def batch_load_fn(self, observation_ids):
-        return Promise.resolve(self.get_observations(observation_ids))
 
-    def get_observations(self, observation_ids):
-        sql_visit = """
+def _visits(connection, observation_ids):
+    sql = """
 SELECT BlockVisit_Id, Block_Id, Date, BlockVisitStatus, RejectedReason
        FROM BlockVisit AS bv
        JOIN NightInfo AS ni ON bv.NightInfo_Id = ni.NightInfo_Id
        JOIN BlockVisitStatus AS bvs ON bv.BlockVisitStatus_Id = bvs.BlockVisitStatus_Id
        LEFT JOIN BlockRejectedReason AS brr
             ON bv.BlockRejectedReason_Id = brr.BlockRejectedReason_Id
-       WHERE BlockVisit_Id IN %(block_visit_ids)s
+       WHERE BlockVisit_Id IN :block_visit_ids
         """
-        df_visit = pd.read_sql(
-            sql_visit, con=db.engine, params=dict(block_visit_ids=observation_ids)
+    values = dict()
+    params = dict(block_visit_ids=observation_ids)
+    for row in fetch_rows(sql, params, con=connection):
+        values[row.BlockVisit_Id] = dict(
+            block=int(row.Block_Id),
+            night=row.Date,
+            status=ObservationStatus.get(row.BlockVisitStatus),
+            rejection_reason=row.RejectedReason,
         )
+    return values
 
-        sql_start = """
+
+def _starts(connection, observation_ids):
+    # the start time is the start time of the first file taken
+    sql = """
 SELECT BlockVisit_Id, MIN(UTStart) AS Start
        FROM FileData
-       WHERE BlockVisit_Id IN %(block_visit_ids)s
+       WHERE BlockVisit_Id IN :block_visit_ids
        GROUP BY BlockVisit_Id
 """
-        df_start = pd.read_sql(
-            sql_start, con=db.engine, params=dict(block_visit_ids=observation_ids)
+    values = {observation_id: None for observation_id in observation_ids}
+    params = dict(block_visit_ids=observation_ids)
+    for row in fetch_rows(sql, params, con=connection):
+        values[row.BlockVisit_Id] = row.Start.replace(tzinfo=pytz.UTC)
+    return values
+
+
+class ObservationLoader(DataLoader):
+    """
+    Data loader for observations.
+
+    Observations in the GraphQL schema are called BlockVisit in the database.
+
+    The keys must be created with :func:`observation_key`. The start time of an
+    observation requires an aggregate query over all its files, and it is only
+    queried if it is requested. Otherwise it is None in the returned observation
+    content.
+    """
+
+    def batch_load_fn(self, keys):
+        for key in keys:
+            record_tag("observation", key.observation_id)
+        return load_batch("observation", self.get_observations, keys)
+
+    def get_observations(self, keys):
+        observation_ids = list(dict.fromkeys(key.observation_id for key in keys))
+        start_ids = list(
+            dict.fromkeys(key.observation_id for key in keys if "start" in key.parts)
         )
 
-        # collect the values
-        values = dict()
-        for _, row in df_visit.iterrows():
-            values[row["BlockVisit_Id"]] = dict(
-                block=int(row["Block_Id"]),
-                night=row["Date"],
-                status=ObservationStatus.get(row["BlockVisitStatus"]),
-                rejection_reason=row["RejectedReason"],
-                start=None,
+        # get whatever is in the cache, and query for the rest
+        visits = result_cache.get_many("observation", observation_ids)
+        starts = result_cache.get_many("observation_start", start_ids)
+        missing_visit_ids = [i for i in observation_ids if i not in visits]
+        missing_start_ids = [i for i in start_ids if i not in starts]
+        tasks = dict()
+        if missing_visit_ids:
+            tasks["observation"] = lambda connection: _visits(
+                connection, missing_visit_ids
             )
-        for _, row in df_start.iterrows():
-            values[row["BlockVisit_Id"]]["start"] = row["Start"].replace(
-                tzinfo=pytz.UTC
+        if missing_start_ids:
+            tasks["observation_start"] = lambda connection: _starts(
+                connection, missing_start_ids
             )
+        fetched = run_concurrently(tasks)
+        for namespace, values in [
+            ("observation", visits),
+            ("observation_start", starts),
+        ]:
+            if namespace in fetched:
+                result_cache.set_many(namespace, fetched[namespace])
+                values.update(fetched[namespace])
 
-        def get_observation_content(observation_id):
-            visit = values.get(observation_id)
+        def get_observation_content(key):
+            visit = visits.get(key.observation_id)
             if not visit:
                 raise GraphQLError(
                     "There is no observation with id {observation_id}".format(
-                        observation_id=observation_id
+                        observation_id=key.observation_id
                     )
                 )
 
-            return ObservationContent(**visit)
+            start = starts[key.observation_id] if "start" in key.parts else None
+            return ObservationContent(start=start, **visit)
 
-        return [
-            get_observation_content(observation_id)
-            for observation_id in observation_ids
-        ]
+        return [get_observation_content(key) for key in keys]
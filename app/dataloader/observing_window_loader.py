@@ -1,45 +1,193 @@
 import time
 from collections import namedtuple
-import pandas as pd
-from promise import Promise
+import numpy as np
 from promise.dataloader import DataLoader
 from graphql import GraphQLError
-from app import db
+from app.dataloader.fetch import fetch_rows, load_batch
 from datetime import datetime
 
-ObservingWindowContent = namedtuple(
-  "ObservingWindowContent", ["visibility_start", "visibility_end", "duration", "window_type"]
-)
+
+class ObservingWindowContent:
+    """
+    An observing window.
+
+    The visibility start and end are stored as Unix timestamps, and they are only
+    formatted as ISO strings when they are accessed.
+
+    Parameters
+    ----------
+    start : int
+        The visibility start, as a Unix timestamp.
+    end : int
+        The visibility end, as a Unix timestamp.
+    window_type : str
+        The window type.
+
+    """
+
+    __slots__ = ("start", "end", "window_type")
+
+    def __init__(self, start, end, window_type):
+        self.start = start
+        self.end = end
+        self.window_type = window_type
+
+    @property
+    def visibility_start(self):
+        return datetime.fromtimestamp(self.start).isoformat()
+
+    @property
+    def visibility_end(self):
+        return datetime.fromtimestamp(self.end).isoformat()
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
 
 BlockObservingWindowContent = namedtuple(
   "BlockObservingWindowContent", ["past_windows", "tonights_windows", "future_windows"]
 )
 
+# the categories of observing windows, in the order of their category numbers
+_WINDOW_CATEGORIES = ("past_windows", "tonights_windows", "future_windows")
+
 
 class ObservingWindowLoader(DataLoader):
     """
     Data loader for observing windows.
 
+    The observing windows are not kept in the result cache shared by requests, as
+    whether a window is a past, tonight's or future one changes with time.
+
     """
 
     START_OF_DAY_HOURS = 6  # 6:00 UT = 8:00 SAST
 
-    def __init__(self):
-        DataLoader.__init__(self, cache=False)
-
     def start_of_day(self, timestamp, day_start_hour):
+        """
+        Get the start of the day for a timestamp, where a day starts at the given
+        hour (UT) rather than at midnight.
+
+        Parameters
+        ----------
+        timestamp : int or array of int
+            The Unix timestamp(s).
+        day_start_hour : int
+            The hour at which a day starts.
+
+        Returns
+        -------
+        int or array of int :
+            The start of the day, as Unix timestamp(s).
+
+        """
+
         seconds_until_start_hour = day_start_hour * 3600
         seconds_per_day = 24 * 3600
-        seconds_since_midnight = timestamp % seconds_per_day
-        if seconds_since_midnight >= seconds_until_start_hour:
-            # The day has started, and we may use today's start time.
-            return (timestamp - seconds_since_midnight) + seconds_until_start_hour
-        else:
-            # The day has not started yet, and we have to use yesterday's start time
-            return (timestamp - seconds_since_midnight) - seconds_per_day + seconds_until_start_hour
+        return (
+            timestamp - seconds_until_start_hour
+        ) // seconds_per_day * seconds_per_day + seconds_until_start_hour
+
+    def group_observing_windows(self, block_ids_window_types, rows, now):
+        """
+        Group observing windows by block id and window type, and classify them as
+        past, tonight's and future windows.
+
+        The visibility starts and ends are processed as NumPy arrays, so that the
+        start of night, the classification and the sorting are done in bulk rather
+        than row by row. Duplicate windows are removed.
+
+        Parameters
+        ----------
+        block_ids_window_types : iterable of tuple
+            The requested (block id, window type) pairs.
+        rows : iterable
+            The observing window rows, with Block_Id, BlockVisibilityWindowType,
+            VisibilityStart and VisibilityEnd (as Unix timestamps) fields.
+        now : int
+            The current time, as a Unix timestamp.
+
+        Returns
+        -------
+        dict :
+            A dictionary of the requested (block id, window type) pairs and
+            dictionaries with the past, tonight's and future windows, sorted by
+            their visibility start.
+
+        """
+
+        values = {
+            block_id_window_type: {category: [] for category in _WINDOW_CATEGORIES}
+            for block_id_window_type in block_ids_window_types
+        }
+        rows = list(rows)
+        if not rows:
+            return values
+
+        # columns of the rows, with the requested (block id, window type) pairs
+        # numbered
+        columns = dict(zip(rows[0]._fields, zip(*rows)))
+        key_numbers = {key: number for number, key in enumerate(values)}
+        keys = np.fromiter(
+            (
+                key_numbers.get(key, -1)
+                for key in zip(
+                    columns["Block_Id"], columns["BlockVisibilityWindowType"]
+                )
+            ),
+            dtype=np.int64,
+            count=len(rows),
+        )
+        starts = np.array(columns["VisibilityStart"], dtype=np.int64)
+        ends = np.array(columns["VisibilityEnd"], dtype=np.int64)
+
+        # ignore the windows which have not been requested
+        requested = keys >= 0
+        keys, starts, ends = keys[requested], starts[requested], ends[requested]
+
+        # categories: 0 for past, 1 for tonight's and 2 for future windows
+        today = self.start_of_day(now, self.START_OF_DAY_HOURS)
+        start_of_nights = self.start_of_day(starts, self.START_OF_DAY_HOURS)
+        categories = np.sign(start_of_nights - today).astype(np.int64) + 1
+
+        # sort by key, category, visibility start and end, and remove duplicates
+        order = np.lexsort((ends, starts, categories, keys))
+        keys, categories = keys[order], categories[order]
+        starts, ends = starts[order], ends[order]
+        unique = np.ones(len(keys), dtype=bool)
+        unique[1:] = (
+            (keys[1:] != keys[:-1])
+            | (categories[1:] != categories[:-1])
+            | (starts[1:] != starts[:-1])
+            | (ends[1:] != ends[:-1])
+        )
+        keys, categories = keys[unique], categories[unique]
+        starts, ends = starts[unique].tolist(), ends[unique].tolist()
+
+        # split into the groups of windows with the same key and category
+        boundaries = np.flatnonzero(
+            (keys[1:] != keys[:-1]) | (categories[1:] != categories[:-1])
+        ) + 1
+        group_starts = np.concatenate(([0], boundaries)).tolist()
+        group_ends = np.concatenate((boundaries, [len(keys)])).tolist()
+        block_ids_window_types = list(values)
+        for first, last in zip(group_starts, group_ends):
+            if first == last:
+                continue
+            key = block_ids_window_types[keys[first]]
+            window_type = key[1]
+            values[key][_WINDOW_CATEGORIES[categories[first]]] = [
+                ObservingWindowContent(start, end, window_type)
+                for start, end in zip(starts[first:last], ends[first:last])
+            ]
+
+        return values
 
     def batch_load_fn(self, block_ids_window_types):
-        return Promise.resolve(self.get_observing_windows(block_ids_window_types))
+        return load_batch(
+            "observing_window", self.get_observing_windows, block_ids_window_types
+        )
 
     def get_observing_windows(self, block_ids_window_types):
         block_ids = set()
@@ -54,63 +202,16 @@ class ObservingWindowLoader(DataLoader):
         UNIX_TIMESTAMP(VisibilityEnd) AS VisibilityEnd, BlockVisibilityWindowType 
         FROM BlockVisibilityWindow AS bvw
         JOIN BlockVisibilityWindowType AS bvwt ON bvw.BlockVisibilityWindowType_Id = bvwt.BlockVisibilityWindowType_Id
-        WHERE Block_Id IN %(block_ids)s AND BlockVisibilityWindowType IN %(window_types)s
+        WHERE Block_Id IN :block_ids AND BlockVisibilityWindowType IN :window_types
         ORDER BY VisibilityStart DESC
         """
 
-        df_block_observing_windows = pd.read_sql(
-            sql_observing_windows,
-            con=db.engine,
-            params=dict(block_ids=block_ids, window_types=window_types)
+        rows = fetch_rows(
+            sql_observing_windows, dict(block_ids=block_ids, window_types=window_types)
+        )
+        values = self.group_observing_windows(
+            block_ids_window_types, rows, int(time.time())
         )
-
-        # now timestamp
-        now = int(time.time())
-        # the time today began
-        today = self.start_of_day(now, self.START_OF_DAY_HOURS)
-
-        # collect the values
-        values = dict()
-        for block_id_window_type in block_ids_window_types:
-            past_windows = set()
-            tonights_windows = set()
-            future_windows = set()
-            for _, row in df_block_observing_windows.iterrows():
-                if block_id_window_type == (row["Block_Id"], row["BlockVisibilityWindowType"]):
-                    visibility_start = row["VisibilityStart"]
-                    visibility_end = row["VisibilityEnd"]
-                    window_type = row["BlockVisibilityWindowType"]
-                    # the start time for the date to which this observing window belongs
-                    start_of_night = self.start_of_day(visibility_start, self.START_OF_DAY_HOURS)
-                    # observing window details
-                    observing_window_details = ObservingWindowContent(
-                        visibility_start=datetime.fromtimestamp(visibility_start).isoformat(),
-                        visibility_end=datetime.fromtimestamp(visibility_end).isoformat(),
-                        duration=visibility_end - visibility_start,
-                        window_type=window_type
-                    )
-                    if start_of_night < today:
-                        past_windows.add(observing_window_details)
-                    elif start_of_night == today:
-                        tonights_windows.add(observing_window_details)
-                    elif start_of_night > today:
-                        future_windows.add(observing_window_details)
-
-            # collect details of the block
-            values[block_id_window_type] = dict(
-                past_windows=sorted(
-                    past_windows,
-                    key=lambda x: x[0]
-                ),
-                tonights_windows=sorted(
-                    tonights_windows,
-                    key=lambda x: x[0]
-                ),
-                future_windows=sorted(
-                    future_windows,
-                    key=lambda x: x[0]
-                ),
-            )
 
         def get_observing_window_content(observing_window_id):
             observing_window = values.get(observing_window_id)
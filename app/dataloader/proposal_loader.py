@@ -1,9 +1,9 @@
 from collections import namedtuple
-import pandas as pd
-from promise import Promise
 from promise.dataloader import DataLoader
 from graphql import GraphQLError
-from app import db
+from app import result_cache
+from app.dataloader.fetch import fetch_rows, load_batch, run_concurrently
+from app.response_cache import record_tag
 from app.util import (
     _SemesterContent,
     ProposalInactiveReason,
@@ -48,146 +48,302 @@ CompletionCommentContent = namedtuple(
     "CompletionCommentContent", ["semester", "comment"]
 )
 
+ProposalKey = namedtuple("ProposalKey", ["proposal_code", "parts"])
 
-class ProposalLoader(DataLoader):
-    def __init__(self):
-        DataLoader.__init__(self, cache=False)
+# Groups of general proposal fields, with the columns and joins needed for them.
+# All the requested groups are queried together.
+_GENERAL_PARTS = dict(
+    title=dict(
+        fields=["title"],
+        columns="Title",
+        joins="JOIN ProposalText AS pt ON p.ProposalCode_Id = pt.ProposalCode_Id",
+    ),
+    general_info=dict(
+        fields=["proposal_type", "status", "status_comment", "inactive_reason"],
+        columns="ProposalType, Status, StatusComment, InactiveReason",
+        joins="""JOIN ProposalGeneralInfo AS pgi ON p.ProposalCode_Id = pgi.ProposalCode_Id
+       JOIN ProposalStatus AS ps ON pgi.ProposalStatus_Id = ps.ProposalStatus_Id
+       JOIN ProposalType AS type ON pgi.ProposalType_Id = type.ProposalType_Id
+       LEFT JOIN ProposalInactiveReason AS pir
+                 ON pgi.ProposalInactiveReason_Id = pir.ProposalInactiveReason_Id""",  # noqa
+    ),
+    contacts=dict(
+        fields=["principal_investigator", "principal_contact", "liaison_astronomer"],
+        columns="Leader_Id, Contact_Id, Astronomer_Id",
+        joins="JOIN ProposalContact contact ON pc.ProposalCode_Id = contact.ProposalCode_Id",  # noqa
+    ),
+)
+
+# the parts of a proposal which are queried separately
+_LIST_PARTS = ["completion_comments", "blocks", "observations", "time_allocations"]
+
+# the parts of a proposal which are only loaded if they are requested
+PROPOSAL_PARTS = frozenset(list(_GENERAL_PARTS) + _LIST_PARTS)
+
+# the part for each proposal field
+_FIELD_PARTS = dict(
+    {
+        field: part
+        for part, group in _GENERAL_PARTS.items()
+        for field in group["fields"]
+    },
+    **{part: part for part in _LIST_PARTS}
+)
+
+
+def proposal_key(proposal_code, fields=None):
+    """
+    Get the key for loading a proposal with the proposal loader.
+
+    The key includes the parts of the proposal (see `PROPOSAL_PARTS`) which are
+    needed for the requested fields, so that the columns, joins and queries for the
+    other parts can be skipped.
 
-    def batch_load_fn(self, proposal_codes):
-        return Promise.resolve(self.get_proposals(proposal_codes))
+    Parameters
+    ----------
+    proposal_code : str
+        The proposal code.
+    fields : iterable of str
+        The requested proposal fields, such as "title" or "blocks". If None, all parts
+        of the proposal are loaded.
 
-    def get_proposals(self, proposal_codes):
-        # general proposal info
-        sql = """
-SELECT Proposal_Code, Title, ProposalType, Status, StatusComment, InactiveReason,
-       Leader_Id, Contact_Id, Astronomer_Id
+    Returns
+    -------
+    ProposalKey :
+        The key.
+
+    """
+
+    if fields is None:
+        return ProposalKey(proposal_code, PROPOSAL_PARTS)
+    return ProposalKey(
+        proposal_code,
+        frozenset(_FIELD_PARTS[field] for field in fields if field in _FIELD_PARTS),
+    )
+
+
+def _general_info(connection, proposal_codes, parts):
+    """
+    Query for the general information of proposals.
+
+    Only the columns and joins needed for the given parts are included in the query.
+    The result includes the part "exists", which maps the codes of all existing
+    proposals to True.
+
+    """
+
+    columns = ["Proposal_Code"] + [_GENERAL_PARTS[part]["columns"] for part in parts]
+    joins = [_GENERAL_PARTS[part]["joins"] for part in parts]
+    sql = """
+SELECT {columns}
        FROM Proposal AS p
        JOIN ProposalCode AS pc ON p.ProposalCode_Id = pc.ProposalCode_Id
-       JOIN ProposalText AS pt ON p.ProposalCode_Id = pt.ProposalCode_Id
-       JOIN ProposalGeneralInfo AS pgi ON p.ProposalCode_Id = pgi.ProposalCode_Id
-       JOIN ProposalStatus AS ps ON pgi.ProposalStatus_Id = ps.ProposalStatus_Id
-       JOIN ProposalType AS type ON pgi.ProposalType_Id = type.ProposalType_Id
-       JOIN P1ObservingConditions AS p1o ON p1o.ProposalCode_Id = p.ProposalCode_Id
-       LEFT JOIN ProposalInactiveReason AS pir
-                 ON pgi.ProposalInactiveReason_Id = pir.ProposalInactiveReason_Id
-       JOIN ProposalContact contact ON pc.ProposalCode_Id = contact.ProposalCode_Id
-       WHERE Current=1 AND Proposal_Code IN %(proposal_codes)s
-       """
-        df_general_info = pd.read_sql(
-            sql, con=db.engine, params=dict(proposal_codes=proposal_codes)
-        )
-        values = dict()
-        for _, row in df_general_info.iterrows():
+       {joins}
+       WHERE Current=1 AND Proposal_Code IN :proposal_codes
+       """.format(
+        columns=", ".join(columns), joins="\n       ".join(joins)
+    )
+    values = {part: dict() for part in parts}
+    values["exists"] = dict()
+    params = dict(proposal_codes=proposal_codes)
+    for row in fetch_rows(sql, params, con=connection):
+        proposal_code = row.Proposal_Code
+        values["exists"][proposal_code] = True
+        if "title" in parts:
+            values["title"][proposal_code] = dict(title=row.Title)
+        if "general_info" in parts:
             inactive_reason = (
-                ProposalInactiveReason.get(row["InactiveReason"])
-                if row["InactiveReason"]
+                ProposalInactiveReason.get(row.InactiveReason)
+                if row.InactiveReason
                 else None
             )
-            liaison_astronomer = (
-                row["Astronomer_Id"] if pd.notnull(row["Astronomer_Id"]) else None
-            )
-            values[row["Proposal_Code"]] = dict(
-                proposal_code=row["Proposal_Code"],
-                title=row["Title"],
-                time_allocations=set(),
-                requested_times=set(),
-                proposal_type=ProposalType.get(row["ProposalType"]),
-                status=ProposalStatus.get(row["Status"]),
-                status_comment=row["StatusComment"],
+            values["general_info"][proposal_code] = dict(
+                proposal_type=ProposalType.get(row.ProposalType),
+                status=ProposalStatus.get(row.Status),
+                status_comment=row.StatusComment,
                 inactive_reason=inactive_reason,
-                completion_comments=set(),
-                principal_investigator=row["Leader_Id"],
-                principal_contact=row["Contact_Id"],
-                liaison_astronomer=liaison_astronomer,
-                blocks=set(),
-                observations=set(),
             )
+        if "contacts" in parts:
+            values["contacts"][proposal_code] = dict(
+                principal_investigator=row.Leader_Id,
+                principal_contact=row.Contact_Id,
+                liaison_astronomer=row.Astronomer_Id,
+            )
+    return values
+
 
-        # completion comments
-        sql = """
+def _completion_comments(connection, proposal_codes):
+    sql = """
 SELECT Proposal_Code, CompletionComment, Year, Semester
        FROM ProposalText AS pt
        JOIN ProposalCode AS pc on pt.ProposalCode_Id = pc.ProposalCode_Id
        JOIN Semester AS s ON pt.Semester_Id=s.Semester_Id
-       WHERE Proposal_Code IN %(proposal_codes)s
+       WHERE Proposal_Code IN :proposal_codes
         """
-        df_completion_comments = pd.read_sql(
-            sql, con=db.engine, params=dict(proposal_codes=proposal_codes)
+    values = {proposal_code: set() for proposal_code in proposal_codes}
+    params = dict(proposal_codes=proposal_codes)
+    for row in fetch_rows(sql, params, con=connection):
+        semester = _SemesterContent(year=row.Year, semester=row.Semester)
+        comment = CompletionCommentContent(
+            semester=semester, comment=row.CompletionComment
         )
-        for _, row in df_completion_comments.iterrows():
-            semester = _SemesterContent(year=row["Year"], semester=row["Semester"])
-            comment = CompletionCommentContent(
-                semester=semester, comment=row["CompletionComment"]
-            )
-            values[row["Proposal_Code"]]["completion_comments"].add(comment)
+        values[row.Proposal_Code].add(comment)
+    return values
+
 
-        # blocks
-        sql = """
+def _blocks(connection, proposal_codes):
+    sql = """
 SELECT Proposal_Code, Block_Id
        FROM Block AS b
        JOIN ProposalCode AS pc ON b.ProposalCode_Id = pc.ProposalCode_Id
        JOIN BlockStatus AS bs ON b.BlockStatus_Id = bs.BlockStatus_Id
-       WHERE Proposal_Code IN %(proposal_codes)s
+       WHERE Proposal_Code IN :proposal_codes
              AND BlockStatus IN ('Active', 'Completed', 'On Hold')
         """
-        df_blocks = pd.read_sql(
-            sql, con=db.engine, params=dict(proposal_codes=proposal_codes)
-        )
-        for _, row in df_blocks.iterrows():
-            values[row["Proposal_Code"]]["blocks"].add(row["Block_Id"])
+    values = {proposal_code: set() for proposal_code in proposal_codes}
+    params = dict(proposal_codes=proposal_codes)
+    for row in fetch_rows(sql, params, con=connection):
+        values[row.Proposal_Code].add(row.Block_Id)
+    return values
 
-        # observations (i.e. block visits)
-        sql = """
+
+def _observations(connection, proposal_codes):
+    # observations are called block visits in the database
+    sql = """
 SELECT Proposal_Code, BlockVisit_Id
        FROM BlockVisit AS bv
        JOIN Block AS b ON bv.Block_Id = b.Block_Id
        JOIN ProposalCode AS pc ON b.ProposalCode_Id = pc.ProposalCode_Id
-       WHERE Proposal_Code IN %(proposal_codes)s
+       WHERE Proposal_Code IN :proposal_codes
         """
-        df_block_visits = pd.read_sql(
-            sql, con=db.engine, params=dict(proposal_codes=proposal_codes)
-        )
-        for _, row in df_block_visits.iterrows():
-            values[row["Proposal_Code"]]["observations"].add(row["BlockVisit_Id"])
+    values = {proposal_code: set() for proposal_code in proposal_codes}
+    params = dict(proposal_codes=proposal_codes)
+    for row in fetch_rows(sql, params, con=connection):
+        values[row.Proposal_Code].add(row.BlockVisit_Id)
+    return values
+
 
-        # time allocations
-        sql = """
+def _time_allocations(connection, proposal_codes):
+    sql = """
 SELECT Proposal_Code, Priority, Year, Semester, Partner_Code, TimeAlloc
        FROM PriorityAlloc AS pa
        JOIN MultiPartner AS mp ON pa.MultiPartner_Id = mp.MultiPartner_Id
        JOIN Partner AS p ON mp.Partner_Id = p.Partner_Id
        JOIN Semester AS s ON mp.Semester_Id = s.Semester_Id
        JOIN ProposalCode AS pc ON mp.ProposalCode_Id = pc.ProposalCode_Id
-       WHERE Proposal_Code IN %(proposal_codes)s AND TimeAlloc>0
+       WHERE Proposal_Code IN :proposal_codes AND TimeAlloc>0
 """
-        df_time_alloc = pd.read_sql(
-            sql, con=db.engine, params=dict(proposal_codes=proposal_codes)
+    values = {proposal_code: set() for proposal_code in proposal_codes}
+    params = dict(proposal_codes=proposal_codes)
+    for row in fetch_rows(sql, params, con=connection):
+        semester = _SemesterContent(year=row.Year, semester=row.Semester)
+        values[row.Proposal_Code].add(
+            TimeAllocationContent(
+                priority=row.Priority,
+                semester=semester,
+                partner_code=row.Partner_Code,
+                amount=row.TimeAlloc,
+            )
         )
-        for _, row in df_time_alloc.iterrows():
-            semester = _SemesterContent(year=row["Year"], semester=row["Semester"])
-            values[row["Proposal_Code"]]["time_allocations"].add(
-                TimeAllocationContent(
-                    priority=row["Priority"],
-                    semester=semester,
-                    partner_code=row["Partner_Code"],
-                    amount=row["TimeAlloc"],
+    return values
+
+
+class ProposalLoader(DataLoader):
+    """
+    Data loader for proposals.
+
+    The keys must be created with :func:`proposal_key`. Only the proposal parts
+    included in a key are loaded, and the fields of other parts are None in the
+    returned proposal content. The general proposal information is queried with
+    only the columns and joins needed for the requested parts. It is queried
+    concurrently with the other requested parts (see
+    :func:`~app.dataloader.fetch.run_concurrently`). Each part is cached separately
+    in the result cache.
+    """
+
+    FETCH = dict(
+        completion_comments=_completion_comments,
+        blocks=_blocks,
+        observations=_observations,
+        time_allocations=_time_allocations,
+    )
+
+    def batch_load_fn(self, keys):
+        for key in keys:
+            record_tag("proposal", key.proposal_code)
+        return load_batch("proposal", self.get_proposals, keys)
+
+    def get_proposals(self, keys):
+        proposal_codes = list(dict.fromkeys(key.proposal_code for key in keys))
+
+        # find out which proposals are needed for each part
+        needed = dict(exists=proposal_codes)
+        for part in PROPOSAL_PARTS:
+            codes = [key.proposal_code for key in keys if part in key.parts]
+            if codes:
+                needed[part] = list(dict.fromkeys(codes))
+
+        # get whatever is in the cache
+        values = dict()
+        missing = dict()
+        for part, codes in needed.items():
+            values[part] = result_cache.get_many(self._namespace(part), codes)
+            missing[part] = [code for code in codes if code not in values[part]]
+
+        # query for the rest, using a single query for the general information
+        tasks = dict()
+        general_parts = [part for part in _GENERAL_PARTS if missing.get(part)]
+        if missing["exists"] or general_parts:
+            general_codes = list(
+                dict.fromkeys(
+                    code
+                    for part in ["exists"] + general_parts
+                    for code in missing[part]
                 )
             )
+            tasks["general"] = lambda connection: _general_info(
+                connection, general_codes, general_parts
+            )
+        for part in _LIST_PARTS:
+            if missing.get(part):
+                tasks[part] = self._task(part, missing[part])
+        results = run_concurrently(tasks)
+        results.update(results.pop("general", {}))
+        for part, fetched in results.items():
+            result_cache.set_many(self._namespace(part), fetched)
+            values[part].update(fetched)
 
-        def proposal_content(proposal_code):
-            proposal = values.get(proposal_code)
-            if not proposal:
+        def proposal_content(key):
+            proposal_code = key.proposal_code
+            if proposal_code not in values["exists"] or any(
+                proposal_code not in values[part]
+                for part in _GENERAL_PARTS
+                if part in key.parts
+            ):
                 raise GraphQLError(
                     "There exists no proposal with proposal code {code}".format(
                         code=proposal_code
                     )
                 )
 
+            proposal = dict(proposal_code=proposal_code, requested_times=set())
+            for part, group in _GENERAL_PARTS.items():
+                if part in key.parts:
+                    proposal.update(values[part][proposal_code])
+                else:
+                    proposal.update(dict.fromkeys(group["fields"]))
+            for part in _LIST_PARTS:
+                proposal[part] = (
+                    values[part][proposal_code] if part in key.parts else None
+                )
             return ProposalContent(**proposal)
 
-        # collect results
-        proposals = [
-            proposal_content(proposal_code) for proposal_code in proposal_codes
-        ]
+        return [proposal_content(key) for key in keys]
+
+    @staticmethod
+    def _namespace(part):
+        return "proposal" if part == "exists" else "proposal_" + part
 
-        return Promise.resolve(proposals)
+    def _task(self, part, proposal_codes):
+        fetch = self.FETCH[part]
+        return lambda connection: fetch(connection, proposal_codes)
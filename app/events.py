@@ -0,0 +1,392 @@
+import itertools
+import json
+import queue
+import threading
+import time
+from collections import namedtuple
+from app import log_exception
+from app.dataloader.fetch import fetch_rows
+from app.metrics import registry
+
+Event = namedtuple("Event", ["id", "kind", "proposal_code", "data"])
+
+# marker for a change detector which has not polled yet
+_UNSET = object()
+
+# block statuses for which changes are detected by comparing snapshots; blocks
+# leaving these statuses are detected as they disappear from the snapshot
+_LIVE_BLOCK_STATUSES = ("Active", "On Hold")
+
+# the maximum number of new observations reported per poll
+MAX_NEW_OBSERVATIONS = 1000
+
+
+class TooManySubscribers(Exception):
+    """The maximum number of event subscriptions has been reached."""
+
+
+class Subscription:
+    """
+    A subscription to the events for some proposals.
+
+    The events are put into a bounded queue. If the queue is full, further events
+    are dropped, and the subscriber is told to reload its data instead (see
+    :meth:`next_event`).
+
+    Parameters
+    ----------
+    proposal_codes : set of str or None
+        The codes of the proposals whose events are wanted, or None for all
+        proposals.
+    max_queue_size : int
+        The maximum number of events waiting to be sent.
+
+    """
+
+    def __init__(self, proposal_codes, max_queue_size):
+        self.proposal_codes = proposal_codes
+        self._events = queue.Queue(max_queue_size)
+        self._lost_events = False
+
+    def wants(self, proposal_code):
+        """Whether the subscription includes a proposal."""
+
+        return self.proposal_codes is None or proposal_code in self.proposal_codes
+
+    def put(self, event):
+        """Add an event to the queue, unless the queue is full."""
+
+        try:
+            self._events.put_nowait(event)
+        except queue.Full:
+            self._lost_events = True
+
+    def next_event(self, timeout):
+        """
+        Wait for the next event.
+
+        If events have been dropped because the queue was full, the queue is
+        cleared and a "reload" event is returned.
+
+        Parameters
+        ----------
+        timeout : float
+            The maximum time to wait, in seconds.
+
+        Returns
+        -------
+        Event or None :
+            The event, or None if there was no event within the timeout.
+
+        """
+
+        if self._lost_events:
+            self._lost_events = False
+            while True:
+                try:
+                    self._events.get_nowait()
+                except queue.Empty:
+                    break
+            return Event(None, "reload", None, dict())
+        try:
+            return self._events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class ChangeDetector:
+    """
+    A single poller for block status changes and new observations, which fans out
+    events to all subscriptions.
+
+    Rather than every client re-querying proposals to find out whether something has
+    changed, a background thread polls the database every EVENTS_POLL_INTERVAL
+    seconds while there are subscriptions, and the detected changes are added to the
+    subscriptions for the affected proposals. So the cost of polling does not grow
+    with the number of clients.
+
+    New observations are found with the largest observation (BlockVisit) id as a
+    marker. Block status changes are found by comparing the statuses of the active
+    and on-hold blocks of the proposals with a subscription to those found by the
+    previous poll.
+
+    The following events are created, all with the proposal code:
+
+    * "block_status", with the block id and the new status.
+    * "observation", with the observation id, block id and observation status.
+
+    The number of subscriptions is limited by the EVENTS_MAX_SUBSCRIBERS setting.
+    As every subscription keeps a request (and hence a server worker) busy, this
+    limit must be lower than the number of concurrent requests the server can
+    handle.
+
+    """
+
+    def __init__(self):
+        self.poll_interval = 10
+        self.max_subscribers = 20
+        self.max_queue_size = 100
+        self._app = None
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._ids = itertools.count(1)
+        self._reset()
+
+    def init_app(self, app):
+        """
+        Configure the change detector from the configuration of a Flask app.
+
+        Parameters
+        ----------
+        app : Flask
+            The Flask app.
+
+        """
+
+        self.poll_interval = app.config.get("EVENTS_POLL_INTERVAL", 10)
+        self.max_subscribers = app.config.get("EVENTS_MAX_SUBSCRIBERS", 20)
+        self.max_queue_size = app.config.get("EVENTS_QUEUE_SIZE", 100)
+        self._app = app
+
+    def subscribe(self, proposal_codes):
+        """
+        Subscribe to the events for some proposals.
+
+        The caller must check that the proposals may be viewed.
+
+        Parameters
+        ----------
+        proposal_codes : iterable of str or None
+            The codes of the proposals, or None for all proposals.
+
+        Returns
+        -------
+        Subscription :
+            The subscription.
+
+        """
+
+        subscription = Subscription(
+            frozenset(proposal_codes) if proposal_codes is not None else None,
+            self.max_queue_size,
+        )
+        with self._lock:
+            if len(self._subscriptions) >= self.max_subscribers:
+                raise TooManySubscribers()
+            self._subscriptions.add(subscription)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="change-detector", daemon=True
+                )
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Cancel a subscription.
+
+        Parameters
+        ----------
+        subscription : Subscription
+            The subscription.
+
+        """
+
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def subscriber_count(self):
+        """The number of subscriptions."""
+
+        with self._lock:
+            return len(self._subscriptions)
+
+    def poll(self):
+        """
+        Poll the database for changes and add the events to the subscriptions.
+
+        This method is called regularly by the background thread, and it must be
+        called within an app context.
+
+        """
+
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        if not subscriptions:
+            # start afresh when there are subscriptions again
+            self._reset()
+            return
+
+        watched = set()
+        for subscription in subscriptions:
+            if subscription.proposal_codes is None:
+                watched = None
+                break
+            watched.update(subscription.proposal_codes)
+
+        events = self._new_observations() + self._block_status_changes(watched)
+        for event in events:
+            for subscription in subscriptions:
+                if subscription.wants(event.proposal_code):
+                    subscription.put(event)
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                if not self._subscriptions:
+                    self._thread = None
+                    self._reset()
+                    return
+            try:
+                with self._app.app_context():
+                    self.poll()
+            except Exception as e:
+                log_exception(e)
+
+    def _reset(self):
+        self._last_observation_id = None
+        self._blocks = dict()
+        self._watched = _UNSET
+
+    def _event(self, kind, proposal_code, **data):
+        data["proposalCode"] = proposal_code
+        return Event(next(self._ids), kind, proposal_code, data)
+
+    def _new_observations(self):
+        if self._last_observation_id is None:
+            sql = "SELECT MAX(BlockVisit_Id) AS Max_Id FROM BlockVisit"
+            self._last_observation_id = list(fetch_rows(sql))[0].Max_Id or 0
+            return []
+
+        sql = """
+SELECT BlockVisit_Id, bv.Block_Id, Proposal_Code, BlockVisitStatus
+       FROM BlockVisit AS bv
+       JOIN BlockVisitStatus AS bvs ON bv.BlockVisitStatus_Id = bvs.BlockVisitStatus_Id
+       JOIN Block AS b ON bv.Block_Id = b.Block_Id
+       JOIN ProposalCode AS pc ON b.ProposalCode_Id = pc.ProposalCode_Id
+       WHERE BlockVisit_Id > :last_id
+       ORDER BY BlockVisit_Id
+       LIMIT :limit
+        """
+        events = []
+        rows = fetch_rows(
+            sql,
+            dict(last_id=self._last_observation_id, limit=MAX_NEW_OBSERVATIONS),
+        )
+        for row in rows:
+            self._last_observation_id = row.BlockVisit_Id
+            events.append(
+                self._event(
+                    "observation",
+                    row.Proposal_Code,
+                    observationId=row.BlockVisit_Id,
+                    blockId=row.Block_Id,
+                    status=row.BlockVisitStatus,
+                )
+            )
+        return events
+
+    def _block_status_changes(self, watched):
+        sql = """
+SELECT Block_Id, Proposal_Code, BlockStatus
+       FROM Block AS b
+       JOIN BlockStatus AS bs ON b.BlockStatus_Id = bs.BlockStatus_Id
+       JOIN ProposalCode AS pc ON b.ProposalCode_Id = pc.ProposalCode_Id
+       WHERE BlockStatus IN :live_statuses
+        """
+        params = dict(live_statuses=_LIVE_BLOCK_STATUSES)
+        if watched is not None:
+            if not watched:
+                self._blocks, self._watched = dict(), watched
+                return []
+            sql += " AND Proposal_Code IN :proposal_codes"
+            params["proposal_codes"] = watched
+        blocks = {
+            row.Block_Id: (row.Proposal_Code, row.BlockStatus)
+            for row in fetch_rows(sql, params)
+        }
+
+        previous_blocks, previously_watched = self._blocks, self._watched
+        self._blocks, self._watched = blocks, watched
+
+        def was_watched(proposal_code):
+            if previously_watched is _UNSET:
+                return False
+            return previously_watched is None or proposal_code in previously_watched
+
+        def is_watched(proposal_code):
+            return watched is None or proposal_code in watched
+
+        events = []
+        for block_id, (proposal_code, status) in blocks.items():
+            previous = previous_blocks.get(block_id)
+            if previous is None and not was_watched(proposal_code):
+                # this is the first poll for the proposal
+                continue
+            if previous is None or previous[1] != status:
+                events.append(
+                    self._event(
+                        "block_status", proposal_code, blockId=block_id, status=status
+                    )
+                )
+
+        # blocks which are not active or on hold any longer
+        gone = [
+            block_id
+            for block_id, (proposal_code, _) in previous_blocks.items()
+            if block_id not in blocks and is_watched(proposal_code)
+        ]
+        if gone:
+            sql = """
+SELECT Block_Id, Proposal_Code, BlockStatus
+       FROM Block AS b
+       JOIN BlockStatus AS bs ON b.BlockStatus_Id = bs.BlockStatus_Id
+       JOIN ProposalCode AS pc ON b.ProposalCode_Id = pc.ProposalCode_Id
+       WHERE Block_Id IN :block_ids
+            """
+            for row in fetch_rows(sql, dict(block_ids=gone)):
+                events.append(
+                    self._event(
+                        "block_status",
+                        row.Proposal_Code,
+                        blockId=row.Block_Id,
+                        status=row.BlockStatus,
+                    )
+                )
+
+        return events
+
+
+def format_event(event):
+    """
+    Format an event as a server-sent event.
+
+    Parameters
+    ----------
+    event : Event
+        The event.
+
+    Returns
+    -------
+    str :
+        The event in the text/event-stream format.
+
+    """
+
+    lines = []
+    if event.id is not None:
+        lines.append("id: {}".format(event.id))
+    lines.append("event: {}".format(event.kind))
+    lines.append("data: {}".format(json.dumps(event.data)))
+    return "\n".join(lines) + "\n\n"
+
+
+change_detector = ChangeDetector()
+
+registry.gauge(
+    "event_subscribers",
+    "Number of open subscriptions to server-sent events.",
+    collect=change_detector.subscriber_count,
+)
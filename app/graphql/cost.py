@@ -0,0 +1,357 @@
+import threading
+import time
+from flask import g
+from graphql.language import ast
+from graphql.type import (
+    GraphQLInterfaceType,
+    GraphQLList,
+    GraphQLNonNull,
+    GraphQLObjectType,
+)
+from graphql_server import HttpQueryError
+from app.graphql.schema import MAX_PROPOSALS_PAGE_SIZE
+from app.metrics import registry
+
+
+# the expected number of items returned by list fields, by "Type.field"
+LIST_SIZES = {
+    "Query.proposals": 100,
+    "Query.partnerShareTimes": 50,
+    "Query.partnerStatObservations": 1000,
+    "Query.partnerStatObservationTotals": 20,
+    "ProposalConnection.edges": 1,  # the page size is taken from the first argument
+    "Proposal.blocks": 20,
+    "Proposal.observations": 50,
+    "Proposal.timeAllocations": 5,
+    "Proposal.completionComments": 5,
+    "Block.visits": 5,
+    "BlockObservingWindow.pastWindows": 20,
+    "BlockObservingWindow.tonightsWindows": 2,
+    "BlockObservingWindow.futureWindows": 20,
+}
+
+# the expected number of items for list fields not included in LIST_SIZES
+DEFAULT_LIST_SIZE = 10
+
+# the assumed value of the first argument if it is not given or is a variable
+# without a value
+DEFAULT_PAGE_SIZE = 50
+
+_query_cost = registry.histogram(
+    "graphql_query_cost",
+    "The estimated and actual costs of GraphQL requests.",
+    labels=("kind",),
+    buckets=(1, 10, 100, 1000, 10000, 100000, 1000000),
+)
+
+_rejected_queries = registry.counter(
+    "graphql_rejected_queries_total",
+    "GraphQL requests rejected because of their cost or depth.",
+    labels=("reason",),
+)
+
+
+def _unwrap(graphql_type):
+    is_list = False
+    while isinstance(graphql_type, (GraphQLList, GraphQLNonNull)):
+        if isinstance(graphql_type, GraphQLList):
+            is_list = True
+        graphql_type = graphql_type.of_type
+    return graphql_type, is_list
+
+
+def _is_composite(graphql_type):
+    return isinstance(graphql_type, (GraphQLObjectType, GraphQLInterfaceType))
+
+
+class CostEstimate:
+    """
+    A static estimate of the cost and depth of a GraphQL operation.
+
+    The cost of an operation is the number of objects it is expected to resolve,
+    as every object requires a data loader call (and possibly a database query).
+    Scalar fields are free. A list field is assumed to return the number of items
+    given in `LIST_SIZES` (or `DEFAULT_LIST_SIZE`), and a field with a first
+    argument the number of items given by that argument (clamped to between 0 and
+    `MAX_PROPOSALS_PAGE_SIZE`). So, for example, the estimated cost of
+
+        proposals {
+            blocks {
+                visits { night }
+            }
+        }
+
+    is 100 * (1 + 20 * (1 + 5)) = 12100.
+
+    Parameters
+    ----------
+    schema : GraphQLSchema
+        The GraphQL schema.
+    document_ast : Document
+        The parsed GraphQL document.
+    operation_name : str
+        The name of the operation to execute, if the document has more than one.
+    variables : dict
+        The variables.
+
+    """
+
+    def __init__(self, schema, document_ast, operation_name=None, variables=None):
+        self.schema = schema
+        self.variables = variables or {}
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document_ast.definitions
+            if isinstance(definition, ast.FragmentDefinition)
+        }
+        self.depth = 0
+        self.cost = 0
+
+        operation = self._operation(document_ast, operation_name)
+        if operation is None:
+            return
+        if operation.operation == "mutation":
+            root_type = schema.get_mutation_type()
+        else:
+            root_type = schema.get_query_type()
+        if root_type is not None:
+            self.cost = self._selection_cost(root_type, operation.selection_set, 1, ())
+
+    @staticmethod
+    def _operation(document_ast, operation_name):
+        operations = [
+            definition
+            for definition in document_ast.definitions
+            if isinstance(definition, ast.OperationDefinition)
+        ]
+        for operation in operations:
+            if operation_name is None or (
+                operation.name and operation.name.value == operation_name
+            ):
+                return operation
+        return None
+
+    def _selection_cost(self, parent_type, selection_set, depth, fragment_names):
+        if selection_set is None:
+            return 0
+
+        cost = 0
+        for selection in selection_set.selections:
+            if isinstance(selection, ast.Field):
+                cost += self._field_cost(parent_type, selection, depth, fragment_names)
+            elif isinstance(selection, ast.InlineFragment):
+                fragment_type = parent_type
+                if selection.type_condition:
+                    fragment_type = self.schema.get_type(
+                        selection.type_condition.name.value
+                    )
+                cost += self._selection_cost(
+                    fragment_type, selection.selection_set, depth, fragment_names
+                )
+            elif isinstance(selection, ast.FragmentSpread):
+                name = selection.name.value
+                fragment = self.fragments.get(name)
+                if fragment is None or name in fragment_names:
+                    continue
+                fragment_type = self.schema.get_type(fragment.type_condition.name.value)
+                cost += self._selection_cost(
+                    fragment_type,
+                    fragment.selection_set,
+                    depth,
+                    fragment_names + (name,),
+                )
+        return cost
+
+    def _field_cost(self, parent_type, field, depth, fragment_names):
+        name = field.name.value
+        if name.startswith("__") or not hasattr(parent_type, "fields"):
+            return 0
+        field_definition = parent_type.fields.get(name)
+        if field_definition is None:
+            return 0
+        field_type, is_list = _unwrap(field_definition.type)
+        if not _is_composite(field_type):
+            return 0
+
+        self.depth = max(self.depth, depth)
+        page_size = self._first_argument(field)
+        if page_size is None and "first" in (field_definition.args or {}):
+            page_size = DEFAULT_PAGE_SIZE
+        if page_size is not None:
+            multiplier = page_size
+        elif is_list:
+            multiplier = LIST_SIZES.get(
+                "{type}.{field}".format(type=parent_type.name, field=name),
+                DEFAULT_LIST_SIZE,
+            )
+        else:
+            multiplier = 1
+        multiplier = max(0, multiplier)
+
+        return multiplier * (
+            1
+            + self._selection_cost(
+                field_type, field.selection_set, depth + 1, fragment_names
+            )
+        )
+
+    def _first_argument(self, field):
+        for argument in field.arguments or []:
+            if argument.name.value != "first":
+                continue
+            value = argument.value
+            if isinstance(value, ast.IntValue):
+                first = int(value.value)
+            elif isinstance(value, ast.Variable):
+                first = self.variables.get(value.name.value)
+                if not isinstance(first, int):
+                    first = DEFAULT_PAGE_SIZE
+            else:
+                return None
+
+            # an invalid value must not lower the cost of the other fields
+            return max(0, min(first, MAX_PROPOSALS_PAGE_SIZE))
+        return None
+
+
+class CostLimiter:
+    """
+    Limits for the cost and depth of GraphQL operations.
+
+    An operation whose estimated cost (see :class:`CostEstimate`) exceeds the
+    GRAPHQL_MAX_QUERY_COST setting, or whose depth exceeds the
+    GRAPHQL_MAX_QUERY_DEPTH setting, is rejected before it is executed.
+
+    In addition, the total cost of the requests of each client is limited with a
+    token bucket, which is refilled at GRAPHQL_COST_RATE cost units per second and
+    holds at most GRAPHQL_COST_BURST cost units. A request whose estimated cost
+    exceeds the tokens left is rejected with a 429 (Too Many Requests) error. A rate
+    of 0 disables this throttling. Buckets which have been idle for long enough to
+    be full again are removed, as they are the same as a new bucket.
+
+    """
+
+    def __init__(self):
+        self.max_cost = 0
+        self.max_depth = 0
+        self.rate = 0
+        self.burst = 0
+        self._buckets = dict()
+        self._last_pruned = time.monotonic()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Configure the limits from the configuration of a Flask app.
+
+        Parameters
+        ----------
+        app : Flask
+            The Flask app.
+
+        """
+
+        self.max_cost = app.config.get("GRAPHQL_MAX_QUERY_COST", 0)
+        self.max_depth = app.config.get("GRAPHQL_MAX_QUERY_DEPTH", 0)
+        self.rate = app.config.get("GRAPHQL_COST_RATE", 0)
+        self.burst = app.config.get("GRAPHQL_COST_BURST", 0)
+        with self._lock:
+            self._buckets = dict()
+            self._last_pruned = time.monotonic()
+
+    def check(self, estimate, client):
+        """
+        Check whether an operation may be executed.
+
+        Parameters
+        ----------
+        estimate : CostEstimate
+            The estimated cost of the operation.
+        client : str
+            An identifier of the client making the request.
+
+        Raises
+        ------
+        HttpQueryError :
+            If the operation exceeds a limit.
+
+        """
+
+        _query_cost.observe(estimate.cost, kind="estimated")
+        if self.max_depth and estimate.depth > self.max_depth:
+            _rejected_queries.inc(reason="depth")
+            raise HttpQueryError(
+                400,
+                "The query depth of {depth} exceeds the maximum depth of "
+                "{max_depth}.".format(depth=estimate.depth, max_depth=self.max_depth),
+            )
+        if self.max_cost and estimate.cost > self.max_cost:
+            _rejected_queries.inc(reason="cost")
+            raise HttpQueryError(
+                400,
+                "The estimated query cost of {cost} exceeds the maximum cost of "
+                "{max_cost}.".format(cost=estimate.cost, max_cost=self.max_cost),
+            )
+        if self.rate > 0:
+            self._consume(client, estimate.cost)
+
+    def _consume(self, client, cost):
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            tokens, updated = self._buckets.get(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if cost > tokens:
+                self._buckets[client] = (tokens, now)
+                retry_after = (min(cost, self.burst) - tokens) / self.rate
+                _rejected_queries.inc(reason="rate")
+                raise HttpQueryError(
+                    429,
+                    "Too many expensive queries. Please try again later.",
+                    headers={"Retry-After": str(int(retry_after) + 1)},
+                )
+            self._buckets[client] = (tokens - cost, now)
+
+    def _prune(self, now):
+        # the time it takes to refill an empty bucket
+        refill_time = self.burst / self.rate
+        if now - self._last_pruned < refill_time:
+            return
+        self._buckets = {
+            client: (tokens, updated)
+            for client, (tokens, updated) in self._buckets.items()
+            if now - updated < refill_time
+        }
+        self._last_pruned = now
+
+
+class CostMiddleware:
+    """
+    Graphene middleware for measuring the actual cost of a request.
+
+    The actual cost is the number of resolved objects, which corresponds to the
+    estimated cost of :class:`CostEstimate`. It is stored as `g.query_cost`.
+
+    """
+
+    def resolve(self, next, root, info, **args):
+        field_type, is_list = _unwrap(info.return_type)
+        if not _is_composite(field_type):
+            return next(root, info, **args)
+
+        def count(value):
+            if value is not None:
+                cost = len(value) if is_list and hasattr(value, "__len__") else 1
+                g.query_cost = g.get("query_cost", 0) + cost
+            return value
+
+        return next(root, info, **args).then(count)
+
+
+def observe_actual_cost():
+    """Record the actual cost of the current request as a metric."""
+
+    _query_cost.observe(g.get("query_cost", 0), kind="actual")
+
+
+cost_limiter = CostLimiter()
@@ -0,0 +1,215 @@
+import datetime
+import decimal
+import gzip
+import json
+import numpy as np
+from flask import current_app, has_app_context, request
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _default(value):
+    """
+    Convert a value which the JSON encoders don't support.
+
+    NumPy scalars and arrays, dates, times, decimals and sets are supported.
+
+    """
+
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(
+        "Object of type {} is not JSON serializable".format(type(value).__name__)
+    )
+
+
+def _encode_with_json(data, pretty):
+    if pretty:
+        return json.dumps(data, indent=2, separators=(",", ": "), default=_default)
+    return json.dumps(data, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def _encode_with_orjson(data, pretty):
+    option = orjson.OPT_SERIALIZE_NUMPY
+    if pretty:
+        return orjson.dumps(
+            data, default=_default, option=option | orjson.OPT_INDENT_2
+        ).decode("utf-8")
+    return orjson.dumps(data, default=_default, option=option)
+
+
+# the available JSON encoders; an encoder takes the data and whether to
+# pretty-print it
+JSON_ENCODERS = dict(json=_encode_with_json)
+if orjson is not None:
+    JSON_ENCODERS["orjson"] = _encode_with_orjson
+
+
+def encode_json(data, pretty=False):
+    """
+    Encode data as JSON.
+
+    The encoder is chosen with the GRAPHQL_JSON_ENCODER setting (see
+    `JSON_ENCODERS`). The standard library's encoder is used if the chosen encoder
+    is not available. All encoders support NumPy values, dates and times.
+
+    Parameters
+    ----------
+    data : object
+        The data to encode.
+    pretty : bool
+        Whether to pretty-print the JSON.
+
+    Returns
+    -------
+    bytes or str :
+        The encoded data. Pretty-printed JSON is returned as a string, as it may be
+        embedded in the GraphiQL page.
+
+    """
+
+    name = "json"
+    if has_app_context():
+        name = current_app.config.get("GRAPHQL_JSON_ENCODER", "json")
+    encoder = JSON_ENCODERS.get(name, _encode_with_json)
+    return encoder(data, pretty)
+
+
+def decode_json(content):
+    """
+    Decode JSON, using orjson if it is available.
+
+    Parameters
+    ----------
+    content : bytes or str
+        The JSON.
+
+    Returns
+    -------
+    object :
+        The decoded data.
+
+    """
+
+    if orjson is not None:
+        return orjson.loads(content)
+    if isinstance(content, bytes):
+        content = content.decode("utf-8")
+    return json.loads(content)
+
+
+def _compress_with_gzip(body, level):
+    return gzip.compress(body, compresslevel=level)
+
+
+def _compress_with_brotli(body, level):
+    return brotli.compress(body, quality=level)
+
+
+# the available content encodings, in the order of preference, with their
+# compression function and the setting for their compression level
+COMPRESSORS = dict()
+if brotli is not None:
+    COMPRESSORS["br"] = (_compress_with_brotli, "GRAPHQL_BROTLI_QUALITY")
+COMPRESSORS["gzip"] = (_compress_with_gzip, "GRAPHQL_GZIP_LEVEL")
+
+
+def negotiate_encoding(accept_encodings):
+    """
+    Choose the content encoding for a response.
+
+    Parameters
+    ----------
+    accept_encodings : Accept
+        The encodings accepted by the client, as parsed from the Accept-Encoding
+        header.
+
+    Returns
+    -------
+    str or None :
+        The encoding with the highest quality for the client, or None if the client
+        accepts none of the encodings in `COMPRESSORS`. Ties are resolved by the
+        order of preference.
+
+    """
+
+    best, best_quality = None, 0
+    for encoding in COMPRESSORS:
+        quality = accept_encodings.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress_response(response, variants=None):
+    """
+    Compress a response body if the client accepts a compressed response.
+
+    Successful responses whose body has at least GRAPHQL_COMPRESSION_MIN_SIZE bytes
+    are compressed with the encoding chosen by :func:`negotiate_encoding`, unless
+    the GRAPHQL_COMPRESSION setting is false. The compression levels are given by
+    the GRAPHQL_GZIP_LEVEL and GRAPHQL_BROTLI_QUALITY settings. As the compressed
+    body differs from the original one, a strong ETag is made weak.
+
+    Parameters
+    ----------
+    response : Response
+        The response.
+    variants : dict
+        Previously compressed bodies, by content encoding, which are used instead
+        of compressing the body again. A newly compressed body is added to this
+        dictionary.
+
+    Returns
+    -------
+    Response :
+        The (possibly compressed) response.
+
+    """
+
+    config = current_app.config
+    if not config.get("GRAPHQL_COMPRESSION", False):
+        return response
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    if len(body) < config.get("GRAPHQL_COMPRESSION_MIN_SIZE", 1024):
+        return response
+    encoding = negotiate_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    compressed = variants.get(encoding) if variants is not None else None
+    if compressed is None:
+        compress, level_setting = COMPRESSORS[encoding]
+        compressed = compress(body, config[level_setting])
+        if variants is not None:
+            variants[encoding] = compressed
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
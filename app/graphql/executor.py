@@ -0,0 +1,125 @@
+from concurrent import futures
+import threading
+from flask import current_app, g
+from graphql.execution.executors.sync import SyncExecutor
+from promise import Promise
+from promise.promise import async_instance
+
+_thread_pool = None
+_thread_pool_lock = threading.Lock()
+
+
+def _loader_thread_pool(max_workers):
+    global _thread_pool
+    with _thread_pool_lock:
+        if _thread_pool is None:
+            _thread_pool = futures.ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="loader"
+            )
+        return _thread_pool
+
+
+def _drain_promise_queues():
+    if async_instance.is_tick_used:
+        async_instance.drain_queues()
+
+
+class ThreadOffloadingExecutor(SyncExecutor):
+    """
+    A GraphQL executor which runs data loader batches on a thread pool.
+
+    Resolvers are executed synchronously, as with the default executor. But the
+    data loaders offload their database queries (see
+    :func:`~app.dataloader.fetch.load_batch`) to a thread pool, so that independent
+    batches, such as those for proposals and investigators, are loaded
+    concurrently. Each background thread runs in its own app context, and hence with
+    its own database connection.
+
+    The promises for the loaded values are resolved in the thread executing the
+    request, so that the resolvers always have access to the request's app context.
+    As the promise library defers callbacks to a (thread-local) queue, this queue is
+    drained whenever a batch has been loaded, so that the resolvers waiting for the
+    batch are run and dispatch the next batches.
+
+    Parameters
+    ----------
+    thread_pool : ThreadPoolExecutor
+        The thread pool for loading the batches.
+
+    """
+
+    def __init__(self, thread_pool):
+        SyncExecutor.__init__(self)
+        self.thread_pool = thread_pool
+        self._pending = dict()
+
+    def offload(self, fetch, keys):
+        """
+        Run a data loader's fetch function on the thread pool.
+
+        Parameters
+        ----------
+        fetch : function
+            The fetch function, which accepts a list of keys.
+        keys : list
+            The keys.
+
+        Returns
+        -------
+        Promise :
+            A promise for the fetched values.
+
+        """
+
+        app = current_app._get_current_object()
+
+        def run():
+            with app.app_context():
+                return fetch(keys)
+
+        promise = Promise()
+        self._pending[self.thread_pool.submit(run)] = promise
+        return promise
+
+    def wait_until_finished(self):
+        # Resolving a promise may lead to more batches being offloaded, so this has
+        # to continue until nothing is pending any longer.
+        _drain_promise_queues()
+        while self._pending:
+            done, _ = futures.wait(
+                list(self._pending), return_when=futures.FIRST_COMPLETED
+            )
+            for future in done:
+                promise = self._pending.pop(future)
+                try:
+                    promise.do_resolve(future.result())
+                except Exception as e:
+                    promise.do_reject(e)
+            _drain_promise_queues()
+
+
+def request_executor():
+    """
+    Create the GraphQL executor for the current request.
+
+    The executor depends on the GRAPHQL_EXECUTION_MODE setting. For "threaded" a
+    :class:`ThreadOffloadingExecutor` with GRAPHQL_LOADER_THREADS threads is used,
+    and it is stored as `g.graphql_executor` so that the data loaders can find it.
+    For "sync" None is returned, so that the default synchronous executor is used.
+
+    Returns
+    -------
+    ThreadOffloadingExecutor or None :
+        The executor.
+
+    """
+
+    mode = current_app.config.get("GRAPHQL_EXECUTION_MODE", "sync")
+    if mode == "sync":
+        return None
+    if mode != "threaded":
+        raise ValueError("Unknown GraphQL execution mode: {}".format(mode))
+
+    thread_pool = _loader_thread_pool(current_app.config["GRAPHQL_LOADER_THREADS"])
+    g.graphql_executor = ThreadOffloadingExecutor(thread_pool)
+    return g.graphql_executor
@@ -0,0 +1,232 @@
+import hashlib
+import json
+from functools import partial
+from flask import request
+from graphql import parse
+from graphql.backend.base import GraphQLDocument
+from graphql.backend.core import GraphQLCoreBackend, execute_and_validate
+from graphql.execution import ExecutionResult
+from graphql.validation import validate
+from graphql_server import HttpQueryError, load_json_body
+from app.cache import ResultCache
+
+# cache for parsed and validated GraphQL documents and for persisted queries
+document_cache = ResultCache("GRAPHQL_DOCUMENT_CACHE")
+
+
+def query_hash(query):
+    """
+    Get the SHA-256 hash of a query, as used for identifying persisted queries.
+
+    Parameters
+    ----------
+    query : str
+        The query.
+
+    Returns
+    -------
+    str :
+        The hexadecimal hash.
+
+    """
+
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+class PrevalidatingBackend(GraphQLCoreBackend):
+    """
+    A GraphQL backend which parses and validates every document only once.
+
+    The default backend parses a query every time it is requested, and it validates
+    the query every time it is executed. This backend instead keeps the parsed
+    documents, together with the result of their validation, in the document cache
+    (keyed by the query hash). So for a query which has been seen before neither
+    parsing nor validation is necessary.
+
+    Parameters
+    ----------
+    cache : ResultCache
+        The cache for the documents.
+
+    """
+
+    def __init__(self, cache, executor=None):
+        GraphQLCoreBackend.__init__(self, executor=executor)
+        self.cache = cache
+
+    def document_from_string(self, schema, document_string):
+        if not isinstance(document_string, str):
+            return GraphQLCoreBackend.document_from_string(
+                self, schema, document_string
+            )
+
+        key = (id(schema), query_hash(document_string))
+        document = self.cache.get("document", key)
+        if document is None:
+            document = self._create_document(schema, document_string)
+            self.cache.set("document", key, document)
+        return document
+
+    def _create_document(self, schema, document_string):
+        document_ast = parse(document_string)
+        validation_errors = validate(schema, document_ast)
+        if validation_errors:
+
+            def execute(*args, **kwargs):
+                return ExecutionResult(errors=validation_errors, invalid=True)
+
+        else:
+            execute = partial(
+                execute_and_validate,
+                schema,
+                document_ast,
+                validate=False,
+                **self.execute_params
+            )
+        return GraphQLDocument(schema, document_string, document_ast, execute)
+
+
+class PersistedQueries:
+    """
+    Support for persisted queries.
+
+    A client may send the SHA-256 hash of a query instead of the query itself, using
+    the protocol of Apollo's automatic persisted queries. The hash is passed in the
+    request's extensions:
+
+    .. code-block:: json
+
+       {"extensions": {"persistedQuery": {"version": 1, "sha256Hash": "..."}}}
+
+    If the hash is unknown, an error with the message "PersistedQueryNotFound" is
+    returned, and the client should send the request again with both the query and
+    its hash. The query is then stored for later requests.
+
+    Queries may also be persisted in advance, with a JSON file of hashes and queries
+    defined by the PERSISTED_QUERIES_FILE setting. These queries are parsed and
+    validated when the app starts. If the PERSISTED_QUERIES_ONLY setting is true,
+    the queries in this file are the only queries which are allowed.
+
+    Parameters
+    ----------
+    schema : Schema
+        The GraphQL schema.
+    backend : GraphQLBackend
+        The backend for parsing and validating queries.
+    cache : ResultCache
+        The cache for queries persisted at runtime.
+
+    """
+
+    def __init__(self, schema, backend, cache):
+        self.schema = schema
+        self.backend = backend
+        self.cache = cache
+        self.allowed_only = False
+        self._queries = dict()
+
+    def init_app(self, app):
+        """
+        Configure persisted queries from the configuration of a Flask app.
+
+        The queries in the persisted queries file (if there is one) are loaded, and
+        they are parsed and validated.
+
+        Parameters
+        ----------
+        app : Flask
+            The Flask app.
+
+        """
+
+        self.allowed_only = app.config.get("PERSISTED_QUERIES_ONLY", False)
+        self._queries = dict()
+        path = app.config.get("PERSISTED_QUERIES_FILE")
+        if path:
+            with open(path) as f:
+                queries = json.load(f)
+            for sha256_hash, query in queries.items():
+                if query_hash(query) != sha256_hash:
+                    raise ValueError(
+                        "The hash {sha256_hash} in {path} does not match its "
+                        "query.".format(sha256_hash=sha256_hash, path=path)
+                    )
+                self._queries[sha256_hash] = query
+                self.backend.document_from_string(self.schema, query)
+
+    def resolve(self, data):
+        """
+        Add the query for a persisted query hash to request data.
+
+        Parameters
+        ----------
+        data : dict
+            The request data, such as `{"extensions": ..., "variables": ...}`.
+
+        Returns
+        -------
+        dict :
+            The request data, including the query.
+
+        """
+
+        if not hasattr(data, "get"):
+            return data
+
+        extensions = data.get("extensions") or {}
+        if isinstance(extensions, str):
+            extensions = load_json_body(extensions)
+        persisted_query = extensions.get("persistedQuery")
+        query = data.get("query")
+
+        if not persisted_query:
+            if query and self.allowed_only and query_hash(query) not in self._queries:
+                raise HttpQueryError(403, "Only persisted queries are allowed.")
+            return data
+
+        sha256_hash = persisted_query.get("sha256Hash")
+        if persisted_query.get("version") != 1 or not sha256_hash:
+            raise HttpQueryError(400, "Unsupported persisted query.")
+
+        # a query along with its hash is stored for later requests
+        if query:
+            if query_hash(query) != sha256_hash:
+                raise HttpQueryError(400, "The provided hash does not match the query.")
+            if sha256_hash not in self._queries:
+                if self.allowed_only:
+                    raise HttpQueryError(403, "Only persisted queries are allowed.")
+                self.cache.set("query", sha256_hash, query)
+            return data
+
+        query = self._queries.get(sha256_hash) or self.cache.get("query", sha256_hash)
+        if not query:
+            raise HttpQueryError(200, "PersistedQueryNotFound")
+
+        data = dict(data)
+        data["query"] = query
+        return data
+
+    def resolve_request(self, data):
+        """
+        Add the queries for persisted query hashes to the parsed body of a request.
+
+        For GET requests the persisted query hash is taken from the query string.
+
+        Parameters
+        ----------
+        data : dict or list
+            The parsed request body, which may be a list for batched queries.
+
+        Returns
+        -------
+        dict or list :
+            The request body, including the queries.
+
+        """
+
+        if request.method.lower() == "get" and not data:
+            data = self.resolve(request.args.to_dict())
+            return data if data.get("query") else {}
+        if isinstance(data, list):
+            return [self.resolve(entry) for entry in data]
+        return self.resolve(data)
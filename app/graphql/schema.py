@@ -1,8 +1,10 @@
+import base64
+import binascii
 from collections import namedtuple
+import datetime
 import re
-import pandas as pd
-from sqlalchemy import text
-from flask import g, request
+from sqlalchemy import bindparam, text
+from flask import current_app, g, request
 from graphene import (
     Boolean,
     Field,
@@ -16,21 +18,39 @@ from graphene import (
     String,
     Float,
 )
+from graphene import relay
 from graphene.types import Date, DateTime, Scalar
 from graphene_file_upload.scalars import Upload
 from graphql import GraphQLError
 from graphql.language import ast
-from app import db
+from app import loaders, result_cache
 from app.auth import encode
-from app import loaders
+from app.dataloader.block_loader import block_key
+from app.dataloader.fetch import fetch_rows, request_connection
+from app.dataloader.observation_loader import observation_key
+from app.dataloader.proposal_loader import proposal_key
+from app.graphql.selection import selected_fields
+from app.jobs import job_queue
+from app.permissions import (
+    filter_editable_blocks,
+    filter_viewable_proposals,
+    may_edit_proposal,
+    may_view_proposal,
+    viewable_proposals,
+)
+from app.response_cache import record_tag, response_cache
+from app.statistics import semester_statistics
+from app.submission import SubmissionPackage, enqueue_submission
 from app.util import (
     BlockStatus,
     ObservationStatus,
+    ObservationTimeGrouping,
     ObservingWindowType,
     PartnerCode,
     ProposalInactiveReason,
     ProposalStatus,
     ProposalType,
+    SubmissionStatus,
     _SemesterContent,
 )
 
@@ -81,6 +101,11 @@ _PartnerStatObservationContent = namedtuple(
     "PartnerStatObservationContent", ["observation_time", "status"]
 )
 
+_ObservationTimeTotalContent = namedtuple(
+    "ObservationTimeTotalContent",
+    ["status", "night", "partner_code", "observation_time", "observations"],
+)
+
 _TimeBreakdownContent = namedtuple(
     "TimeBreakdownContent", ["science", "engineering", "lost_to_weather", "lost_to_problems", "idle"]
 )
@@ -91,6 +116,100 @@ def _check_auth_token():
         raise GraphQLError("A valid authentication token is required.")
 
 
+# the default and maximum number of proposals in a page of the proposals connection
+DEFAULT_PROPOSALS_PAGE_SIZE = 50
+MAX_PROPOSALS_PAGE_SIZE = 500
+
+_PROPOSAL_CURSOR_PREFIX = "proposal:"
+
+
+def _encode_proposal_cursor(proposal_code):
+    return base64.b64encode(
+        (_PROPOSAL_CURSOR_PREFIX + proposal_code).encode("utf-8")
+    ).decode("ascii")
+
+
+def _decode_proposal_cursor(cursor):
+    try:
+        value = base64.b64decode(cursor.encode("ascii"), validate=True).decode("utf-8")
+    except (binascii.Error, UnicodeError, ValueError):
+        value = ""
+    if not value.startswith(_PROPOSAL_CURSOR_PREFIX):
+        raise GraphQLError("Invalid cursor: {cursor}".format(cursor=cursor))
+    return value[len(_PROPOSAL_CURSOR_PREFIX):]
+
+
+def _proposal_codes(
+    partner_code=None, semester=None, after=None, limit=None, proposal_codes=None
+):
+    """
+    Get the codes of current proposals, irrespective of user permissions.
+
+    The proposal codes are ordered alphabetically, so that they can be paginated
+    with the `after` and `limit` parameters.
+
+    Parameters
+    ----------
+    partner_code : str
+        Only include proposals from this partner.
+    semester : SemesterContent
+        Only include proposals for this semester.
+    after : str
+        Only include proposal codes which come after this one.
+    limit : int
+        The maximum number of proposal codes to return.
+    proposal_codes : iterable of str
+        Only include proposals with one of these codes.
+
+    Returns
+    -------
+    list of str :
+        The proposal codes.
+
+    """
+
+    if proposal_codes is not None and not proposal_codes:
+        return []
+
+    # get the filter conditions
+    params = dict()
+    filters = ["p.Current=1"]
+    if partner_code:
+        filters.append("partner.Partner_Code=:partner_code")
+        params["partner_code"] = partner_code
+    if semester:
+        filters.append("(s.Year=:year AND s.Semester=:semester)")
+        params["year"] = semester.year
+        params["semester"] = semester.semester
+    if after is not None:
+        filters.append("Proposal_Code>:after")
+        params["after"] = after
+    if proposal_codes is not None:
+        filters.append("Proposal_Code IN :proposal_codes")
+        params["proposal_codes"] = proposal_codes
+
+    sql = """
+SELECT DISTINCT Proposal_Code
+       FROM ProposalCode AS pc
+       JOIN Proposal AS p ON pc.ProposalCode_Id = p.ProposalCode_Id
+       JOIN Semester AS s ON p.Semester_Id = s.Semester_Id
+       JOIN ProposalInvestigator AS pi ON pc.ProposalCode_Id = pi.ProposalCode_Id
+       JOIN Investigator AS i ON pi.Investigator_Id = i.Investigator_Id
+       JOIN Institute AS institute ON i.Institute_Id = institute.Institute_Id
+       JOIN Partner AS partner ON institute.Partner_Id = partner.Partner_Id
+       JOIN P1ObservingConditions AS p1o ON p1o.ProposalCode_Id = p.ProposalCode_Id
+       WHERE {where}
+       ORDER BY Proposal_Code
+""".format(
+        where=" AND ".join(filters)
+    )
+    if limit is not None:
+        sql += "       LIMIT :limit\n"
+        params["limit"] = limit
+
+    return [row.Proposal_Code for row in fetch_rows(sql, params)]
+
+
 class Query(ObjectType):
     auth_token = Field(
         lambda: AuthToken,
@@ -112,6 +231,29 @@ class Query(ObjectType):
         ),
     )
 
+    proposals_connection = Field(
+        lambda: ProposalConnection,
+        description="A page of SALT proposals, ordered by proposal code. Use the "
+        "end cursor of a page as the after argument to request the next page.",
+        partner_code=PartnerCode(
+            description="The partner whose proposals are returned.",
+            required=False,
+        ),
+        semester=Semester(
+            description="The semester whose proposals are returned.",
+            required=False,
+        ),
+        first=Int(
+            description="The maximum number of proposals to return (at most "
+            "{max_size}).".format(max_size=MAX_PROPOSALS_PAGE_SIZE),
+            required=False,
+        ),
+        after=String(
+            description="Only return proposals after the one with this cursor.",
+            required=False,
+        ),
+    )
+
     proposal = Field(
         lambda: Proposal,
         description="A SALT proposal.",
@@ -140,6 +282,20 @@ class Query(ObjectType):
         ),
     )
 
+    partner_stat_observation_totals = Field(
+        lambda: List(ObservationTimeTotal),
+        description="The total observation times, in seconds, grouped by "
+        "observation status and, optionally, by night or partner.",
+        semester=Semester(
+            description="The semester whose observation times are returned.",
+            required=True,
+        ),
+        group_by=ObservationTimeGrouping(
+            description="Group the observation times by night or partner as well.",
+            required=False,
+        ),
+    )
+
     time_breakdown = Field(
         lambda: TimeBreakdown,
         description="The weather down time",
@@ -149,85 +305,145 @@ class Query(ObjectType):
         ),
     )
 
+    submission_status = Field(
+        lambda: Submission,
+        description="The status of a proposal or block submission.",
+        job_id=NonNull(
+            ID, description="The job id returned by the submission mutation."
+        ),
+    )
+
     def resolve_auth_token(self, info, username, password):
         # query for the user with the given credentials
         sql = """SELECT PiptUser_Id
                         FROM PiptUser
-                        WHERE Username=%(username)s AND Password=MD5(%(password)s)"""
-        df = pd.read_sql(
-            sql, con=db.engine, params=dict(username=username, password=password)
-        )
+                        WHERE Username=:username AND Password=MD5(:password)"""
+        rows = list(fetch_rows(sql, dict(username=username, password=password)))
 
         # check whether a user was found
-        if len(df) == 0:
+        if len(rows) == 0:
             raise GraphQLError("username or password wrong")
 
         # encode and return the user id
-        token = encode({"user_id": df["PiptUser_Id"][0].item()})
+        token = encode({"user_id": rows[0].PiptUser_Id})
         return _TokenContent(token=token)
 
     def resolve_proposals(self, info, partner_code=None, semester=None):
-        # get the filter conditions
-        params = dict()
-        filters = ["p.Current=1"]
-        if partner_code:
-            filters.append("partner.Partner_Code=%(partner_code)s")
-            params["partner_code"] = partner_code
-        if semester:
-            filters.append("(s.Year=%(year)s AND s.Semester=%(semester)s)")
-            params["year"] = semester.year
-            params["semester"] = semester.semester
+        _check_auth_token()
+
+        # the list of proposals changes whenever a proposal is submitted
+        record_tag("proposals", "list")
 
         # get all proposals (irrespective of user permissions)
-        sql = """
-SELECT DISTINCT Proposal_Code
-       FROM ProposalCode AS pc
-       JOIN Proposal AS p ON pc.ProposalCode_Id = p.ProposalCode_Id
-       JOIN Semester AS s ON p.Semester_Id = s.Semester_Id
-       JOIN ProposalInvestigator AS pi ON pc.ProposalCode_Id = pi.ProposalCode_Id
-       JOIN Investigator AS i ON pi.Investigator_Id = i.Investigator_Id
-       JOIN Institute AS institute ON i.Institute_Id = institute.Institute_Id
-       JOIN Partner AS partner ON institute.Partner_Id = partner.Partner_Id
-       JOIN P1ObservingConditions AS p1o ON p1o.ProposalCode_Id = p.ProposalCode_Id
-       WHERE {where}
-""".format(
-            where=" AND ".join(filters)
+        all_proposal_codes = _proposal_codes(
+            partner_code=partner_code, semester=semester
         )
-        df = pd.read_sql(sql, con=db.engine, params=params)
-
-        all_proposal_codes = df["Proposal_Code"].tolist()
 
         # only retain proposals the user actually may view
-        proposal_codes = [
-            proposal_code
-            for proposal_code in all_proposal_codes
-            if g.user.may_view_proposal(proposal_code)
-        ]
+        proposal_codes = filter_viewable_proposals(all_proposal_codes)
 
-        return loaders["proposal_loader"].load_many(proposal_codes)
+        fields = selected_fields(info)
+        return loaders["proposal_loader"].load_many(
+            [proposal_key(proposal_code, fields) for proposal_code in proposal_codes]
+        )
+
+    def resolve_proposals_connection(
+        self, info, partner_code=None, semester=None, first=None, after=None
+    ):
+        _check_auth_token()
+
+        if first is None:
+            first = DEFAULT_PROPOSALS_PAGE_SIZE
+        if first < 0 or first > MAX_PROPOSALS_PAGE_SIZE:
+            raise GraphQLError(
+                "The value of first must be between 0 and {max_size}.".format(
+                    max_size=MAX_PROPOSALS_PAGE_SIZE
+                )
+            )
+        last_code = _decode_proposal_cursor(after) if after else None
+
+        # the list of proposals changes whenever a proposal is submitted
+        record_tag("proposals", "list")
+
+        # Query for one more proposal than requested, to find out whether there is a
+        # next page. Only proposals the user may view are included by the query.
+        proposal_codes = _proposal_codes(
+            partner_code=partner_code,
+            semester=semester,
+            after=last_code,
+            limit=first + 1,
+            proposal_codes=viewable_proposals(),
+        )
+
+        has_next_page = len(proposal_codes) > first
+        proposal_codes = proposal_codes[:first]
+        fields = selected_fields(info, ("edges", "node"))
+        edges = [
+            ProposalConnection.Edge(
+                node=loaders["proposal_loader"].load(
+                    proposal_key(proposal_code, fields)
+                ),
+                cursor=_encode_proposal_cursor(proposal_code),
+            )
+            for proposal_code in proposal_codes
+        ]
+        return ProposalConnection(
+            edges=edges,
+            page_info=relay.PageInfo(
+                has_next_page=has_next_page,
+                has_previous_page=after is not None,
+                start_cursor=edges[0].cursor if edges else None,
+                end_cursor=edges[-1].cursor if edges else None,
+            ),
+        )
 
     def resolve_proposal(self, info, proposal_code):
         # sanity check: may the user view the proposal?
         _check_auth_token()
-        if not g.user.may_view_proposal(proposal_code=proposal_code):
+        if not may_view_proposal(proposal_code):
             raise GraphQLError(
                 "You are not allowed to view the proposal {proposal_code}".format(
                     proposal_code=proposal_code
                 )
             )
 
-        return loaders["proposal_loader"].load(proposal_code)
+        return loaders["proposal_loader"].load(
+            proposal_key(proposal_code, selected_fields(info))
+        )
+
+    def resolve_submission_status(self, info, job_id):
+        # sanity check: may the user view the submission?
+        _check_auth_token()
+        job = job_queue.get(job_id)
+        if job is None or (job.user_id != g.user_id and not g.user.is_admin()):
+            raise GraphQLError(
+                "There exists no submission with the job id {job_id}.".format(
+                    job_id=job_id
+                )
+            )
+
+        result = job.result or dict()
+        return Submission(
+            job_id=job.id,
+            status=job.status,
+            progress=job.progress,
+            proposal_code=result.get("proposal_code"),
+            block_id=result.get("block_id"),
+            error=job.error,
+            created=datetime.datetime.fromtimestamp(job.created, datetime.timezone.utc),
+            updated=datetime.datetime.fromtimestamp(job.updated, datetime.timezone.utc),
+        )
 
     def resolve_partner_share_times(self, info, partner_code=None, semester=None):
         # get the filter conditions
         params = dict()
         filters = []
         if partner_code:
-            filters.append("partner.Partner_Code=%(partner_code)s")
+            filters.append("partner.Partner_Code=:partner_code")
             params["partner_code"] = partner_code
 
         if semester:
-            filters.append("(s.Year=%(year)s AND s.Semester=%(semester)s)")
+            filters.append("(s.Year=:year AND s.Semester=:semester)")
             params["year"] = semester.year
             params["semester"] = semester.semester
 
@@ -248,76 +464,38 @@ SELECT DISTINCT Proposal_Code
            JOIN Partner using(Partner_Id)
            """
 
-        df = pd.read_sql(sql, con=db.engine, params=params)
-
         partner_time_shares = []
-        for _, row in df.iterrows():
+        for row in fetch_rows(sql, params):
             partner_time_shares.append(_PartnerTimeShareContent(
-                semester=_SemesterContent(year=row["Year"], semester=row["Semester"]),
-                partner_code=row["Partner_Code"],
-                share_percent=row["SharePercent"],
+                semester=_SemesterContent(year=row.Year, semester=row.Semester),
+                partner_code=row.Partner_Code,
+                share_percent=row.SharePercent,
             ))
 
         return partner_time_shares
 
     def resolve_partner_stat_observations(self, info, semester):
-        # get the filter conditions
-        params = dict()
-        filters = ["(s.Year=%(year)s AND s.Semester=%(semester)s)"]
-        params["year"] = semester.year
-        params["semester"] = semester.semester
-
-        # query for the observation times
-        sql = """SELECT ObsTime, BlockVisitStatus FROM Proposal AS p
-        JOIN Block AS b ON b.Proposal_Id = p.Proposal_Id
-        JOIN BlockVisit AS bv ON bv.Block_Id = b.Block_Id
-        JOIN Semester AS s ON s.Semester_Id = p.Semester_Id
-        JOIN BlockVisitStatus AS bvs ON bvs.BlockVisitStatus_Id = bv.BlockVisitStatus_Id
-        WHERE {where}
-        """.format(
-            where=" AND ".join(filters)
-        )
-
-        df = pd.read_sql(sql, con=db.engine, params=params)
-
-        partner_stat_observations = []
-        for _, row in df.iterrows():
-            partner_stat_observations.append(_PartnerStatObservationContent(
-                observation_time=row["ObsTime"],
-                status=row["BlockVisitStatus"]
-            ))
+        return [
+            _PartnerStatObservationContent(observation_time=obs_time, status=status)
+            for obs_time, status in semester_statistics.observations(semester)
+        ]
 
-        return partner_stat_observations
+    def resolve_partner_stat_observation_totals(self, info, semester, group_by=None):
+        return [
+            _ObservationTimeTotalContent(
+                status=total["status"],
+                night=datetime.datetime.strptime(total["night"], "%Y-%m-%d").date()
+                if total["night"]
+                else None,
+                partner_code=total["partner_code"],
+                observation_time=total["observation_time"],
+                observations=total["observations"],
+            )
+            for total in semester_statistics.observation_totals(semester, group_by)
+        ]
 
     def resolve_time_breakdown(self, info, semester):
-        # get the filter conditions
-        params = dict()
-        filters = ["(s.Year=%(year)s AND s.Semester=%(semester)s)"]
-        params["year"] = semester.year
-        params["semester"] = semester.semester
-
-        # query for the time breakdown
-        sql = """SELECT SUM(ScienceTime) AS ScienceTime, SUM(EngineeringTime) AS EngineeringTime, 
-        SUM(TimeLostToWeather) AS TimeLostToWeather, SUM(TimeLostToProblems) AS TimeLostToProblems, 
-        SUM(IdleTime) AS IdleTime   
-        FROM NightInfo AS ni
-        JOIN Semester AS s ON (ni.Date >= s.StartSemester AND ni.Date <= s.EndSemester)
-        WHERE {where}
-        """.format(
-            where=" AND ".join(filters)
-        )
-
-        df = pd.read_sql(sql, con=db.engine, params=params)
-
-        time_breakdown = _TimeBreakdownContent(
-            science=0 if pd.isnull(df["ScienceTime"][0]) else df["ScienceTime"][0],
-            engineering=0 if pd.isnull(df["EngineeringTime"][0]) else df["EngineeringTime"][0],
-            lost_to_weather=0 if pd.isnull(df["TimeLostToWeather"][0]) else df["TimeLostToWeather"][0],
-            lost_to_problems=0 if pd.isnull(df["TimeLostToProblems"][0]) else df["TimeLostToProblems"][0],
-            idle=0 if pd.isnull(df["IdleTime"][0]) else df["IdleTime"][0],
-        )
-
-        return time_breakdown
+        return _TimeBreakdownContent(**semester_statistics.time_breakdown(semester))
 
 
 # authentication token
@@ -406,10 +584,26 @@ class Proposal(ObjectType):
         return loaders["investigator_loader"].load(self.liaison_astronomer)
 
     def resolve_blocks(self, info):
-        return loaders["block_loader"].load_many(self.blocks)
+        fields = selected_fields(info)
+        return loaders["block_loader"].load_many(
+            [block_key(block_id, fields) for block_id in self.blocks]
+        )
 
     def resolve_observations(self, info):
-        return loaders["observation_loader"].load_many(self.observations)
+        fields = selected_fields(info)
+        return loaders["observation_loader"].load_many(
+            [
+                observation_key(observation_id, fields)
+                for observation_id in self.observations
+            ]
+        )
+
+
+# proposal connection
+
+class ProposalConnection(relay.Connection):
+    class Meta:
+        node = Proposal
 
 
 # block
@@ -461,10 +655,15 @@ class Block(ObjectType):
         return self.id
 
     def resolve_proposal(self, info):
-        return loaders["proposal_loader"].load(self.proposal)
+        return loaders["proposal_loader"].load(
+            proposal_key(self.proposal, selected_fields(info))
+        )
 
     def resolve_visits(self, info):
-        return loaders["observation_loader"].load_many(self.visits)
+        fields = selected_fields(info)
+        return loaders["observation_loader"].load_many(
+            [observation_key(observation_id, fields) for observation_id in self.visits]
+        )
 
     def resolve_observing_windows(self, info, window_type):
         return loaders["observing_window_loader"].load((self.id, window_type))
@@ -535,7 +734,9 @@ class ProposalObservation(ObjectType):
     )
 
     def resolve_block(self, info):
-        return loaders["block_loader"].load(self.block)
+        return loaders["block_loader"].load(
+            block_key(self.block, selected_fields(info))
+        )
 
 
 # time allocation
@@ -598,6 +799,26 @@ class PartnerStatObservation(ObjectType):
         return self.observation_time
 
 
+# observation time totals
+
+class ObservationTimeTotal(ObjectType):
+    status = NonNull(
+        lambda: ObservationStatus, description="The status of the observations."
+    )
+    night = Date(
+        description="The night of the observations, if the totals are grouped by "
+        "night."
+    )
+    partner_code = String(
+        description="The partner of the Principal Investigator, if the totals are "
+        "grouped by partner."
+    )
+    observation_time = NonNull(
+        Float, description="The total observation time, in seconds."
+    )
+    observations = NonNull(Int, description="The number of observations.")
+
+
 # time breakdown
 
 class TimeBreakdown(ObjectType):
@@ -629,55 +850,213 @@ class TimeBreakdown(ObjectType):
 
 # mutations
 
-class PutBlockOnHold(Mutation):
-    class Arguments:
-        block_id = NonNull(Int, description="The unique block id.")
+class BlockStatusChange(ObjectType):
+    block_id = NonNull(Int, description="The unique block id.")
 
-        reason = String(description="The reason for putting the block on hold.")
+    ok = NonNull(Boolean, description="Whether the block status has been changed.")
 
-    ok = Boolean(description="Whether the block has been put on hold successfully.")
+    error = String(description="The reason why the block status has not been changed.")
 
-    def mutate(self, info, block_id, reason=None):
+
+def _block_status_errors(block_ids, editable, statuses, old_status, status_error):
+    """
+    Get the reasons why the status of blocks can't be changed.
+
+    Parameters
+    ----------
+    block_ids : list of int
+        The block ids.
+    editable : set of int
+        The ids of the blocks the user may edit.
+    statuses : dict
+        The current status of the existing blocks the user may edit, by block id.
+    old_status : str
+        The status the blocks must have, such as "Active".
+    status_error : str
+        The error message for blocks which don't have the required status.
+
+    Returns
+    -------
+    dict :
+        The error messages, by block id, for the blocks whose status can't be
+        changed.
+
+    """
+
+    errors = dict()
+    for block_id in block_ids:
         # sanity check: is the user allowed to do this?
-        _check_auth_token()
-        if not g.user.may_edit_block(block_id=block_id):
-            raise GraphQLError(
+        if block_id not in editable:
+            errors[block_id] = (
                 "You are not allowed to modify the block with id {block_id}.".format(
                     block_id=block_id
                 )
             )
-
-        # get the block status
-        sql = """
-SELECT BlockStatus
+        # sanity check: does the block exist?
+        elif block_id not in statuses:
+            errors[block_id] = "There exists no block with id {id}.".format(
+                id=block_id
+            )
+        # sanity check: does the block have the required status?
+        elif statuses[block_id] != old_status:
+            errors[block_id] = status_error
+    return errors
+
+
+def _update_block_statuses(connection, block_ids, old_status, new_status, reason):
+    """
+    Change the status of those blocks which still have a given status.
+
+    Parameters
+    ----------
+    connection : Connection
+        The database connection.
+    block_ids : list of int
+        The block ids.
+    old_status : str
+        The status the blocks must have, such as "Active".
+    new_status : str
+        The new status, such as "On Hold".
+    reason : str
+        The reason for the status change.
+
+    Returns
+    -------
+    int :
+        The number of blocks whose status has been changed.
+
+    """
+
+    sql = """
+UPDATE Block SET BlockStatus_Id=
+               (SELECT BlockStatus_Id FROM BlockStatus WHERE BlockStatus=:new_status),
+                 BlockStatusReason=:reason
+       WHERE Block_Id IN :block_ids
+         AND BlockStatus_Id=
+               (SELECT BlockStatus_Id FROM BlockStatus WHERE BlockStatus=:old_status)
+    """
+    result = connection.execute(
+        text(sql).bindparams(bindparam("block_ids", expanding=True)),
+        block_ids=block_ids,
+        new_status=new_status,
+        old_status=old_status,
+        reason=reason,
+    )
+    return result.rowcount
+
+
+def _change_block_statuses(block_ids, old_status, new_status, reason, status_error):
+    """
+    Change the status of blocks which have a given status.
+
+    The permissions are checked for all blocks at once, and the statuses are
+    changed in a single transaction. The blocks are locked while their status is
+    checked, and they are updated with a single UPDATE statement, which only
+    changes blocks which still have the required status. If a block has been
+    changed nonetheless, the transaction is rolled back.
+
+    Parameters
+    ----------
+    block_ids : list of int
+        The block ids.
+    old_status : str
+        The status the blocks must have, such as "Active".
+    new_status : str
+        The new status, such as "On Hold".
+    reason : str
+        The reason for the status change.
+    status_error : str
+        The error message for blocks which don't have the required status.
+
+    Returns
+    -------
+    list of BlockStatusChange :
+        The outcome for every block, in the order of the block ids.
+
+    """
+
+    # sanity check: is the user allowed to do this?
+    _check_auth_token()
+    block_ids = list(dict.fromkeys(block_ids))
+    editable = set(filter_editable_blocks(block_ids))
+
+    statuses = dict()
+    changed = []
+    if editable:
+        connection = request_connection()
+        with connection.begin():
+            # get (and lock) the current block statuses
+            sql = """
+SELECT Block_Id, BlockStatus
        FROM Block AS b
        JOIN BlockStatus AS bs ON b.BlockStatus_Id = bs.BlockStatus_Id
-       WHERE Block_Id=%(block_id)s
-         """
-        df = pd.read_sql(sql, con=db.engine, params=dict(block_id=block_id))
-
-        # sanity check: does the block exist?
-        if len(df) == 0:
-            raise GraphQLError(
-                "There exists no block with id {block_id}.".format(block_id=block_id)
+       WHERE Block_Id IN :block_ids
+       FOR UPDATE
+            """
+            statuses = {
+                row.Block_Id: row.BlockStatus
+                for row in fetch_rows(
+                    sql, dict(block_ids=list(editable)), con=connection
+                )
+            }
+            errors = _block_status_errors(
+                block_ids, editable, statuses, old_status, status_error
             )
+            changed = [block_id for block_id in block_ids if block_id not in errors]
 
-        # sanity check: is the block active?
-        block_status = df["BlockStatus"][0]
-        if block_status != "Active":
-            raise GraphQLError("Only active blocks can be put on hold.")
+            # update the block statuses
+            if changed:
+                updated = _update_block_statuses(
+                    connection, changed, old_status, new_status, reason
+                )
+                if updated != len(changed):
+                    raise GraphQLError(
+                        "The status of a block has been changed meanwhile. Please "
+                        "try again."
+                    )
+    else:
+        errors = _block_status_errors(
+            block_ids, editable, statuses, old_status, status_error
+        )
 
-        # update the block status
-        sql = """
-UPDATE Block SET BlockStatus_Id=
-               (SELECT BlockStatus_Id FROM BlockStatus WHERE BlockStatus='On Hold'),
-                 BlockStatusReason=:reason
-       WHERE Block_Id=:block_id
-        """
-        db.engine.execute(text(sql), block_id=block_id, reason=reason)
+    # the cached block content is outdated now
+    for block_id in changed:
+        result_cache.invalidate("block", block_id)
+        response_cache.invalidate("block", block_id)
+
+    return [
+        BlockStatusChange(
+            block_id=block_id, ok=block_id not in errors, error=errors.get(block_id)
+        )
+        for block_id in block_ids
+    ]
 
-        # success!
-        ok = True
+
+def _change_block_status(block_id, old_status, new_status, reason, status_error):
+    outcome = _change_block_statuses(
+        [block_id], old_status, new_status, reason, status_error
+    )[0]
+    if not outcome.ok:
+        raise GraphQLError(outcome.error)
+    return True
+
+
+class PutBlockOnHold(Mutation):
+    class Arguments:
+        block_id = NonNull(Int, description="The unique block id.")
+
+        reason = String(description="The reason for putting the block on hold.")
+
+    ok = Boolean(description="Whether the block has been put on hold successfully.")
+
+    def mutate(self, info, block_id, reason=None):
+        ok = _change_block_status(
+            block_id,
+            "Active",
+            "On Hold",
+            reason,
+            "Only active blocks can be put on hold.",
+        )
 
         return PutBlockOnHold(ok=ok)
 
@@ -691,48 +1070,104 @@ class PutBlockOffHold(Mutation):
     ok = Boolean(description="Whether the block has been put off hold successfully.")
 
     def mutate(self, info, block_id, reason=None):
-        # sanity check: is the user allowed to do this?
-        _check_auth_token()
-        if not g.user.may_edit_block(block_id=block_id):
-            raise GraphQLError(
-                "You are not allowed to modify the block with id {block_id}.".format(
-                    block_id=block_id
-                )
-            )
+        ok = _change_block_status(
+            block_id,
+            "On Hold",
+            "Active",
+            reason,
+            "Only blocks on hold can be put off hold.",
+        )
 
-        # get the block status
-        sql = """
-SELECT BlockStatus
-       FROM Block AS b
-       JOIN BlockStatus AS bs ON b.BlockStatus_Id = bs.BlockStatus_Id
-       WHERE Block_Id=%(block_id)s
-        """
-        df = pd.read_sql(sql, con=db.engine, params=dict(block_id=block_id))
+        return PutBlockOffHold(ok=ok)
 
-        # sanity check: does the block exist?
-        if len(df) == 0:
-            raise GraphQLError(
-                "There exists no block with id {block_id}.".format(block_id=block_id)
-            )
 
-        # sanity check: is the block on hold?
-        block_status = df["BlockStatus"][0]
-        if block_status != "On Hold":
-            raise GraphQLError("Only blocks on hold can be put off hold.")
+class PutBlocksOnHold(Mutation):
+    class Arguments:
+        block_ids = NonNull(
+            List(NonNull(Int)), description="The unique ids of the blocks."
+        )
 
-        # update the block status
-        sql = """
-UPDATE Block SET BlockStatus_Id=
-               (SELECT BlockStatus_Id FROM BlockStatus WHERE BlockStatus='Active'),
-                 BlockStatusReason=:reason
-       WHERE Block_Id=:block_id
-        """
-        db.engine.execute(text(sql), block_id=block_id, reason=reason)
+        reason = String(description="The reason for putting the blocks on hold.")
 
-        # success!
-        ok = True
+    results = NonNull(
+        List(NonNull(BlockStatusChange)),
+        description="The outcome for every block, in the order of the block ids.",
+    )
 
-        return PutBlockOnHold(ok=ok)
+    def mutate(self, info, block_ids, reason=None):
+        results = _change_block_statuses(
+            block_ids,
+            "Active",
+            "On Hold",
+            reason,
+            "Only active blocks can be put on hold.",
+        )
+
+        return PutBlocksOnHold(results=results)
+
+
+class PutBlocksOffHold(Mutation):
+    class Arguments:
+        block_ids = NonNull(
+            List(NonNull(Int)), description="The unique ids of the blocks."
+        )
+
+        reason = String(description="The reason for putting the blocks off hold.")
+
+    results = NonNull(
+        List(NonNull(BlockStatusChange)),
+        description="The outcome for every block, in the order of the block ids.",
+    )
+
+    def mutate(self, info, block_ids, reason=None):
+        results = _change_block_statuses(
+            block_ids,
+            "On Hold",
+            "Active",
+            reason,
+            "Only blocks on hold can be put off hold.",
+        )
+
+        return PutBlocksOffHold(results=results)
+
+
+class Submission(ObjectType):
+    job_id = NonNull(ID, description="The id of the job processing the submission.")
+
+    status = NonNull(
+        lambda: SubmissionStatus, description="The status of the submission."
+    )
+
+    progress = String(description="A description of the processing progress.")
+
+    proposal_code = String(
+        description="The proposal code, once the submission has succeeded."
+    )
+
+    block_id = Int(
+        description="The id of the submitted block, once a block submission has "
+        "succeeded."
+    )
+
+    error = String(description="The reason why the submission has failed.")
+
+    created = NonNull(DateTime, description="The time of the submission.")
+
+    updated = NonNull(DateTime, description="The time of the last status change.")
+
+
+def _check_submission_allowed(proposal_code):
+    # sanity check: are submissions supported?
+    if not current_app.config.get("SUBMISSION_SERVICE_URL") or not job_queue.started:
+        raise GraphQLError("Submissions are not supported by this server.")
+
+    # sanity check: may the user change the proposal?
+    if proposal_code is not None and not may_edit_proposal(proposal_code):
+        raise GraphQLError(
+            "You are not allowed to modify the proposal {proposal_code}.".format(
+                proposal_code=proposal_code
+            )
+        )
 
 
 class SubmitProposal(Mutation):
@@ -741,10 +1176,25 @@ class SubmitProposal(Mutation):
 
         zip = NonNull(Upload, description="A zip file with the proposal content.")
 
-    proposal = NonNull(lambda: Proposal, description="The submitted proposal.")
+    job_id = NonNull(
+        ID,
+        description="The id of the job processing the submission, which can be "
+        "passed to the submissionStatus query.",
+    )
+
+    def mutate(self, info, zip, proposal_code=None):
+        _check_auth_token()
+        _check_submission_allowed(proposal_code)
+        package = SubmissionPackage(
+            zip.stream,
+            "Proposal.xml",
+            current_app.config.get("SUBMISSION_MAX_UNCOMPRESSED_SIZE"),
+        )
+        job_id = enqueue_submission(
+            "proposal", package, g.user_id, proposal_code=proposal_code
+        )
 
-    def mutate(self, info):
-        raise NotImplementedError("Not implemented yet.")
+        return SubmitProposal(job_id=job_id)
 
 
 class SubmitBlock(Mutation):
@@ -757,10 +1207,29 @@ class SubmitBlock(Mutation):
 
         zip = NonNull(Upload, description="A zip file with the block content.")
 
-    block = NonNull(lambda: Block, description="The submitted block.")
+    job_id = NonNull(
+        ID,
+        description="The id of the job processing the submission, which can be "
+        "passed to the submissionStatus query.",
+    )
 
-    def mutate(self, info):
-        raise NotImplementedError("Not implemented yet.")
+    def mutate(self, info, proposal_code, zip, block_code=None):
+        _check_auth_token()
+        _check_submission_allowed(proposal_code)
+        package = SubmissionPackage(
+            zip.stream,
+            "Block.xml",
+            current_app.config.get("SUBMISSION_MAX_UNCOMPRESSED_SIZE"),
+        )
+        job_id = enqueue_submission(
+            "block",
+            package,
+            g.user_id,
+            proposal_code=proposal_code,
+            block_code=block_code,
+        )
+
+        return SubmitBlock(job_id=job_id)
 
 
 class Mutation(ObjectType):
@@ -768,6 +1237,10 @@ class Mutation(ObjectType):
 
     putBlockOffHold = PutBlockOffHold.Field(description="Put a block off hold.")
 
+    putBlocksOnHold = PutBlocksOnHold.Field(description="Put blocks on hold.")
+
+    putBlocksOffHold = PutBlocksOffHold.Field(description="Put blocks off hold.")
+
     submitProposal = SubmitProposal.Field(description="Submit a proposal.")
 
     submitBlock = SubmitBlock.Field(description="Submit a block.")
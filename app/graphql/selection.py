@@ -0,0 +1,68 @@
+from graphene.utils.str_converters import to_snake_case
+from graphql.language import ast
+
+
+def _collect_fields(selection_set, fragments, fields):
+    if selection_set is None:
+        return
+    for selection in selection_set.selections:
+        if isinstance(selection, ast.Field):
+            fields.setdefault(to_snake_case(selection.name.value), []).append(
+                selection
+            )
+        elif isinstance(selection, ast.FragmentSpread):
+            fragment = fragments.get(selection.name.value)
+            if fragment is not None:
+                _collect_fields(fragment.selection_set, fragments, fields)
+        elif isinstance(selection, ast.InlineFragment):
+            _collect_fields(selection.selection_set, fragments, fields)
+
+
+def selected_fields(info, path=()):
+    """
+    Get the names of the fields selected for the field being resolved.
+
+    Fragments and inline fragments are taken into account, and the field names are
+    converted to snake case, so that they match the attribute names of the graphene
+    types. For example, for the query
+
+        proposal(proposalCode: "2019-1-SCI-042") {
+            proposalCode
+            ...blocks
+        }
+
+        fragment blocks on Proposal {
+            blocks { id }
+        }
+
+    the selected fields of the proposal field are "proposal_code" and "blocks".
+
+    A path of (snake case) field names may be given to get the fields selected for a
+    nested field instead. For example, the proposals selected in a connection are
+    found with the path ("edges", "node").
+
+    Parameters
+    ----------
+    info : ResolveInfo
+        The resolve info passed to the resolver.
+    path : iterable of str
+        The path of the nested field.
+
+    Returns
+    -------
+    set of str :
+        The selected field names.
+
+    """
+
+    nodes = list(info.field_asts)
+    for name in path:
+        fields = dict()
+        for node in nodes:
+            _collect_fields(node.selection_set, info.fragments, fields)
+        nodes = fields.get(name, [])
+
+    fields = dict()
+    for node in nodes:
+        _collect_fields(node.selection_set, info.fragments, fields)
+    return set(fields.keys())
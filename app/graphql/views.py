@@ -1,6 +1,35 @@
+from collections import namedtuple
+import hashlib
+import json
+from flask import Response, current_app, g, request
 from graphene_file_upload.flask import FileUploadGraphQLView
 from graphene import Schema
+from graphql.language.printer import print_ast
+from graphql.language.visitor import Visitor, visit
+from graphql_server import (
+    HttpQueryError,
+    encode_execution_results,
+    execute_graphql_request,
+    get_graphql_params,
+)
+from promise import Promise
 from app import log_exception
+from app.graphql.cost import (
+    CostEstimate,
+    CostMiddleware,
+    cost_limiter,
+    observe_actual_cost,
+)
+from app.graphql.encoding import compress_response, decode_json, encode_json
+from app.graphql.executor import request_executor
+from app.graphql.persisted_queries import (
+    PersistedQueries,
+    PrevalidatingBackend,
+    document_cache,
+    query_hash,
+)
+from app.response_cache import response_cache
+from app.tracing import TracingMiddleware, tracer
 from app.graphql.schema import Mutation, Query
 from . import graphql
 
@@ -19,9 +48,316 @@ class LoggingMiddleware:
         return next(root, info, **args).catch(self.on_error)
 
 
+_Operation = namedtuple("Operation", ["document", "operation_name", "variables"])
+
+
+class GraphQLView(FileUploadGraphQLView):
+    """
+    GraphQL view with support for persisted queries, cost limits and response
+    caching.
+
+    The cost of every operation is estimated before it is executed, and operations
+    exceeding the cost limits are rejected (see :class:`~app.graphql.cost.CostLimiter`).
+    The estimated and actual costs are returned in the X-Query-Cost-Estimated and
+    X-Query-Cost-Actual headers.
+
+    The responses of authenticated read-only queries without errors are cached in
+    the response cache (see :class:`~app.response_cache.ResponseCache`), unless the
+    query includes one of the `uncacheable_fields`, such as the status of a
+    submission, which changes without the cache being notified. Cached responses
+    include an ETag and a Cache-Control header, and a request with a matching
+    If-None-Match header gets a 304 (Not Modified) response.
+
+    If the client requests a trace (see :class:`~app.tracing.Tracer`), the timings
+    of the resolvers, data loader batches and SQL statements are returned as
+    `extensions.tracing`, and the response is not cached.
+
+    The executor is chosen with the GRAPHQL_EXECUTION_MODE setting (see
+    :func:`~app.graphql.executor.request_executor`).
+
+    A request may contain a JSON array of operations, which are executed together
+    (see :meth:`_dispatch_batch`) and whose results are returned as an array.
+
+    Responses are encoded with the JSON encoder chosen by the GRAPHQL_JSON_ENCODER
+    setting (see :func:`~app.graphql.encoding.encode_json`), and large responses
+    are compressed if the client accepts it (see
+    :func:`~app.graphql.encoding.compress_response`).
+
+    """
+
+    persisted_queries = None
+
+    # fields whose values don't come from data which can be invalidated in the
+    # response cache, so that queries including them must not be cached
+    uncacheable_fields = frozenset(["submissionStatus"])
+
+    encode = staticmethod(encode_json)
+
+    def get_executor(self):
+        return request_executor()
+
+    def parse_body(self):
+        data = FileUploadGraphQLView.parse_body(self)
+        return self.persisted_queries.resolve_request(data)
+
+    def dispatch_request(self):
+        return compress_response(self._dispatch())
+
+    def _dispatch(self):
+        try:
+            operations, is_batch = self._operations()
+            tracing = tracer.tracing_requested()
+
+            key = None
+            if not is_batch and len(operations) == 1 and not tracing:
+                key = self._response_cache_key(operations[0])
+            if key is not None:
+                cached = response_cache.get(key)
+                if cached is not None:
+                    variants = dict(cached.get("variants", {}))
+                    response = self._cached_response(
+                        cached["body"], cached["etag"], variants
+                    )
+                    if variants != cached.get("variants"):
+                        response_cache.set_variants(key, cached, variants)
+                    return response
+
+            estimated_cost = 0
+            for operation in operations:
+                estimate = CostEstimate(
+                    self.schema,
+                    operation.document.document_ast,
+                    operation.operation_name,
+                    operation.variables,
+                )
+                cost_limiter.check(estimate, self._client())
+                estimated_cost += estimate.cost
+        except HttpQueryError as e:
+            return self._error_response(e)
+
+        g.query_cost = 0
+        if key is not None:
+            response_cache.start_recording()
+        trace = tracer.start_trace() if tracing else None
+        if is_batch:
+            response = self._dispatch_batch()
+        else:
+            response = FileUploadGraphQLView.dispatch_request(self)
+        observe_actual_cost()
+        response.headers["X-Query-Cost-Estimated"] = str(estimated_cost)
+        response.headers["X-Query-Cost-Actual"] = str(g.query_cost)
+        if trace is not None:
+            self._add_trace(response, trace)
+
+        if key is None:
+            return response
+        if response.status_code != 200 or response.mimetype != "application/json":
+            return response
+        body = response.get_data()
+        if "errors" in decode_json(body):
+            return response
+        etag = hashlib.sha256(body).hexdigest()
+        variants = dict()
+        response = self._cached_response(body, etag, variants)
+        response_cache.set(key, body, etag, variants)
+        return response
+
+    def _dispatch_batch(self):
+        """
+        Execute the operations of a batch request.
+
+        The operations share the request, and hence the authenticated user and the
+        data loaders. They are executed together rather than one after the other,
+        so that the data loaders collect the keys of all operations into common
+        batches. The number of operations is limited by the GRAPHQL_MAX_BATCH_SIZE
+        setting.
+
+        """
+
+        try:
+            data = self.parse_body()
+            if not data:
+                raise HttpQueryError(
+                    400, "Received an empty list in the batch request."
+                )
+            if not all(isinstance(entry, dict) for entry in data):
+                raise HttpQueryError(
+                    400, "The operations in a batch request must be objects."
+                )
+            max_size = current_app.config.get("GRAPHQL_MAX_BATCH_SIZE")
+            if max_size and len(data) > max_size:
+                raise HttpQueryError(
+                    400,
+                    "A batch request may contain at most {max_size} "
+                    "operations.".format(max_size=max_size),
+                )
+
+            execute_options = dict(
+                backend=self.get_backend(),
+                root=self.get_root_value(),
+                context=self.get_context(),
+                middleware=self.get_middleware(),
+                return_promise=True,
+            )
+            executor = self.get_executor()
+            if executor is not None:
+                execute_options["executor"] = executor
+            results = [
+                execute_graphql_request(
+                    self.schema, get_graphql_params(entry, {}), **execute_options
+                )
+                for entry in data
+            ]
+        except HttpQueryError as e:
+            return self._error_response(e)
+
+        if executor is not None:
+            executor.wait_until_finished()
+        results = Promise.all([Promise.resolve(result) for result in results]).get()
+        body, status_code = encode_execution_results(
+            results, format_error=self.format_error, is_batch=True, encode=self.encode
+        )
+        return Response(body, status=status_code, content_type="application/json")
+
+    def _error_response(self, e):
+        return Response(
+            self.encode({"errors": [self.format_error(e)]}),
+            status=e.status_code,
+            headers=e.headers,
+            content_type="application/json",
+        )
+
+    def _operations(self):
+        """
+        Get the parsed operations of the request.
+
+        Requests which can't be parsed are ignored, as the error is reported when the
+        request is executed.
+
+        """
+
+        if request.method not in ("GET", "POST"):
+            return [], False
+        try:
+            data = self.parse_body()
+        except HttpQueryError:
+            return [], False
+
+        is_batch = isinstance(data, list)
+        operations = []
+        for entry in data if is_batch else [data]:
+            if not hasattr(entry, "get") or not isinstance(entry.get("query"), str):
+                continue
+            try:
+                document = self.backend.document_from_string(
+                    self.schema, entry["query"]
+                )
+                variables = entry.get("variables")
+                if isinstance(variables, str):
+                    variables = json.loads(variables)
+            except Exception:
+                continue
+            if variables is not None and not isinstance(variables, dict):
+                continue
+            operations.append(
+                _Operation(document, entry.get("operationName"), variables)
+            )
+        return operations, is_batch
+
+    def _add_trace(self, response, trace):
+        if response.mimetype != "application/json":
+            return
+        content = decode_json(response.get_data())
+        results = content if isinstance(content, list) else [content]
+        for result in results:
+            if isinstance(result, dict):
+                result.setdefault("extensions", {})["tracing"] = trace.as_dict()
+        response.set_data(self.encode(content))
+
+    def _client(self):
+        if g.get("user_id") is not None:
+            return "user:{user_id}".format(user_id=g.user_id)
+        return request.remote_addr
+
+    def _response_cache_key(self, operation):
+        # only read-only queries can be cached
+        if not response_cache.enabled:
+            return None
+        if request.method == "GET" and self.should_display_graphiql():
+            return None
+        # anonymous requests aren't cached, as they may request an authentication
+        # token
+        if not g.user:
+            return None
+        document = operation.document
+        if document.get_operation_type(operation.operation_name) != "query":
+            return None
+        if not self.uncacheable_fields.isdisjoint(_field_names(document.document_ast)):
+            return None
+
+        # the query is normalized, so that formatting differences don't matter
+        sha256_hash = query_hash(document.document_string)
+        query = document_cache.get("normalized", sha256_hash)
+        if query is None:
+            query = print_ast(document.document_ast)
+            document_cache.set("normalized", sha256_hash, query)
+
+        if g.user.is_admin():
+            scope = "admin"
+        else:
+            scope = "user:{user_id}".format(user_id=g.user_id)
+
+        return response_cache.key(
+            query, operation.operation_name, operation.variables, scope
+        )
+
+    def _cached_response(self, body, etag, variants):
+        # the compressed body is taken from (or added to) the compressed variants,
+        # so that a cached response isn't compressed again for every request
+        headers = {
+            "Cache-Control": "private, max-age={max_age}".format(
+                max_age=int(response_cache.ttl or 0)
+            )
+        }
+        # the ETag is weak if the response has been compressed
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304, headers=headers)
+        else:
+            response = Response(
+                body, status=200, headers=headers, content_type="application/json"
+            )
+        response.set_etag(etag)
+        return compress_response(response, variants)
+
+
+class _FieldNameCollector(Visitor):
+    def __init__(self):
+        self.names = set()
+
+    def enter_Field(self, node, *args):
+        self.names.add(node.name.value)
+
+
+def _field_names(document_ast):
+    # the names of all the fields in a document, including those in fragments
+    collector = _FieldNameCollector()
+    visit(document_ast, collector)
+    return collector.names
+
+
 schema = Schema(query=Query, mutation=Mutation)
 
-view_func = FileUploadGraphQLView.as_view(
-    "graphql", schema=schema, middleware=[LoggingMiddleware()], graphiql=True
+backend = PrevalidatingBackend(document_cache)
+
+persisted_queries = PersistedQueries(schema, backend, document_cache)
+
+view_func = GraphQLView.as_view(
+    "graphql",
+    schema=schema,
+    backend=backend,
+    persisted_queries=persisted_queries,
+    middleware=[LoggingMiddleware(), CostMiddleware(), TracingMiddleware()],
+    graphiql=True,
+    batch=True,
 )
 graphql.add_url_rule("/graphql-api", view_func=view_func)
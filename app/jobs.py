@@ -0,0 +1,344 @@
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from app import log_exception
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS job (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    user_id INTEGER,
+    payload TEXT NOT NULL,
+    file_path TEXT,
+    status TEXT NOT NULL,
+    progress TEXT,
+    result TEXT,
+    error TEXT,
+    pid INTEGER,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+)
+"""
+
+
+class JobError(Exception):
+    """An error whose message may be shown to the user who submitted a job."""
+
+
+class Job:
+    """
+    A background job.
+
+    Parameters
+    ----------
+    row : sqlite3.Row
+        The database row for the job.
+
+    """
+
+    def __init__(self, row):
+        self.id = row["id"]
+        self.kind = row["kind"]
+        self.user_id = row["user_id"]
+        self.payload = json.loads(row["payload"])
+        self.file_path = row["file_path"]
+        self.status = row["status"]
+        self.progress = row["progress"]
+        self.result = json.loads(row["result"]) if row["result"] else None
+        self.error = row["error"]
+        self.created = row["created"]
+        self.updated = row["updated"]
+
+
+class JobQueue:
+    """
+    A persistent queue of background jobs, such as processing a submission.
+
+    The jobs are stored in an SQLite database in the directory given by the
+    JOB_QUEUE_DIR setting (by default a directory in the system's directory for
+    temporary files), so that they survive a restart of the server, and they are
+    run on a pool of JOB_WORKERS threads. In testing mode the queue is only started
+    if the JOB_QUEUE_DIR setting is given, so that tests don't share (and restart)
+    the jobs in the default directory. Each job is run in an app context. A file
+    can be attached to a job; it is moved into the queue directory and deleted before
+    the job is marked as finished.
+
+    The function for running a job is registered for the job's kind with
+    :meth:`handler`. It is passed the job and a function for reporting progress
+    (as a message), and its return value must be serializable as JSON. If it raises
+    a :class:`JobError`, the error message is stored with the job.
+
+    As the queue may be shared by several server processes, a job is claimed by a
+    process before it is run. When the queue is initialised, queued jobs and the
+    running jobs of processes which don't exist any longer are (re)started. Jobs
+    which have finished more than JOB_RETENTION seconds ago are removed.
+
+    """
+
+    def __init__(self):
+        self.directory = None
+        self.retention = 7 * 24 * 3600
+        self._app = None
+        self._handlers = dict()
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Configure the queue from the configuration of a Flask app, and start any
+        pending jobs.
+
+        Parameters
+        ----------
+        app : Flask
+            The Flask app.
+
+        """
+
+        self.directory = app.config.get("JOB_QUEUE_DIR")
+        if not self.directory and not app.config.get("TESTING"):
+            self.directory = os.path.join(tempfile.gettempdir(), "salt-api-jobs")
+        self.retention = app.config.get("JOB_RETENTION", 7 * 24 * 3600)
+        self._app = app
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            if not self.directory:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self._executor = ThreadPoolExecutor(
+                max_workers=app.config.get("JOB_WORKERS", 2),
+                thread_name_prefix="job",
+            )
+        with self._connect() as connection:
+            connection.execute(_SCHEMA)
+
+        self._restart_pending_jobs()
+
+    @property
+    def started(self):
+        """Whether the queue has been started."""
+
+        return self._executor is not None
+
+    def handler(self, kind):
+        """
+        Decorator for registering the function which runs jobs of a kind.
+
+        Parameters
+        ----------
+        kind : str
+            The job kind, such as "submit_proposal".
+
+        """
+
+        def decorator(f):
+            self._handlers[kind] = f
+            return f
+
+        return decorator
+
+    def enqueue(self, kind, payload, user_id=None, file=None):
+        """
+        Add a job to the queue.
+
+        Parameters
+        ----------
+        kind : str
+            The job kind, such as "submit_proposal".
+        payload : dict
+            The job parameters, which must be serializable as JSON.
+        user_id : int
+            The id of the user submitting the job.
+        file : file-like
+            A file to attach to the job. If it is a named file, it is hard-linked
+            into the queue directory if possible, and otherwise it is copied there.
+
+        Returns
+        -------
+        str :
+            The job id.
+
+        """
+
+        if not self.started:
+            raise RuntimeError("The job queue has not been started.")
+
+        job_id = uuid.uuid4().hex
+        file_path = None
+        if file is not None:
+            file_path = os.path.join(self.directory, job_id)
+            _store_file(file, file_path)
+
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO job (id, kind, user_id, payload, file_path, status, "
+                "progress, created, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job_id,
+                    kind,
+                    user_id,
+                    json.dumps(payload),
+                    file_path,
+                    QUEUED,
+                    "Waiting to be processed",
+                    now,
+                    now,
+                ),
+            )
+        self._remove_old_jobs()
+
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def get(self, job_id):
+        """
+        Get a job.
+
+        Parameters
+        ----------
+        job_id : str
+            The job id.
+
+        Returns
+        -------
+        Job or None :
+            The job, or None if there is no job with the id.
+
+        """
+
+        if not self.started:
+            return None
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT * FROM job WHERE id = ?", (job_id,)
+            ).fetchone()
+        return Job(row) if row is not None else None
+
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(
+            os.path.join(self.directory, "jobs.sqlite3"), timeout=30
+        )
+        connection.row_factory = sqlite3.Row
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def _update(self, job_id, **values):
+        values["updated"] = time.time()
+        assignments = ", ".join("{} = ?".format(column) for column in values)
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE job SET {} WHERE id = ?".format(assignments),
+                list(values.values()) + [job_id],
+            )
+
+    def _claim(self, job_id):
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE job SET status = ?, pid = ?, updated = ? "
+                "WHERE id = ? AND status = ?",
+                (RUNNING, os.getpid(), time.time(), job_id, QUEUED),
+            )
+            return cursor.rowcount == 1
+
+    def _run(self, job_id):
+        if not self._claim(job_id):
+            # another process or thread has taken the job
+            return
+
+        job = self.get(job_id)
+        with self._app.app_context():
+            try:
+                handler = self._handlers[job.kind]
+                self._update(job_id, progress="Processing")
+                result = handler(
+                    job, lambda message: self._update(job_id, progress=message)
+                )
+                outcome = dict(
+                    status=SUCCEEDED, progress="Done", result=json.dumps(result)
+                )
+            except JobError as e:
+                outcome = dict(status=FAILED, progress="Failed", error=str(e))
+            except Exception as e:
+                log_exception(e)
+                outcome = dict(
+                    status=FAILED,
+                    progress="Failed",
+                    error="The job could not be processed.",
+                )
+
+            # the attached file is removed before the job is marked as finished, so
+            # that a finished job never has a file
+            if job.file_path and os.path.exists(job.file_path):
+                os.remove(job.file_path)
+            self._update(job_id, **outcome)
+
+    def _restart_pending_jobs(self):
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT id, status, pid FROM job WHERE status IN (?, ?)",
+                (QUEUED, RUNNING),
+            ).fetchall()
+        for row in rows:
+            if row["status"] == RUNNING:
+                if _process_exists(row["pid"]):
+                    continue
+                self._update(row["id"], status=QUEUED, pid=None)
+            self._executor.submit(self._run, row["id"])
+
+    def _remove_old_jobs(self):
+        if self.retention is None:
+            return
+        with self._connect() as connection:
+            connection.execute(
+                "DELETE FROM job WHERE status IN (?, ?) AND updated < ?",
+                (SUCCEEDED, FAILED, time.time() - self.retention),
+            )
+
+
+def _store_file(file, path):
+    file.flush()
+    name = getattr(file, "name", None)
+    if isinstance(name, str) and os.path.exists(name):
+        try:
+            os.link(name, path)
+            return
+        except OSError:
+            # the file is on another file system, for example
+            pass
+    file.seek(0)
+    with open(path, "wb") as f:
+        shutil.copyfileobj(file, f)
+
+
+def _process_exists(pid):
+    if pid is None:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+job_queue = JobQueue()
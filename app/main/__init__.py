@@ -2,4 +2,4 @@ from flask import Blueprint
 
 main = Blueprint("main", __name__)
 
-from . import errors  # noqa E402, F401
+from . import errors, views  # noqa E402, F401
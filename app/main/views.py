@@ -0,0 +1,94 @@
+from flask import Response, current_app, g, jsonify, request
+from app.events import TooManySubscribers, change_detector, format_event
+from app.metrics import registry
+from app.permissions import may_view_proposal, viewable_proposals
+from app.profiling import statement_profiler
+from . import main
+from .errors import error
+
+
+@main.route("/metrics")
+def metrics():
+    """
+    Expose the server metrics in the Prometheus text exposition format.
+
+    """
+
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+@main.route("/sql-profile")
+def sql_profile():
+    """
+    Get the SQL statements with the largest total execution time.
+
+    Only administrators may access this endpoint. The number of statements is given
+    by the `top` query parameter (10 by default). If the `reset` query parameter is
+    "true", the statistics are reset after the summary has been created.
+
+    """
+
+    if not g.user or not g.user.is_admin():
+        return jsonify(error("You are not allowed to view the SQL profile.")), 403
+
+    top = request.args.get("top", 10, type=int)
+    summary = statement_profiler.summary(top)
+    if request.args.get("reset", "").lower() == "true":
+        statement_profiler.reset()
+    return jsonify(dict(enabled=statement_profiler.enabled, statements=summary))
+
+
+@main.route("/events")
+def events():
+    """
+    Stream block status changes and new observations as server-sent events.
+
+    The events for the proposals given by the `proposal_code` query parameter (which
+    may be repeated) are sent, ignoring any proposals the user may not view. If no
+    proposal code is given, the events for all the proposals the user may view (as
+    given by :func:`~app.permissions.viewable_proposals`) are sent. See
+    :class:`~app.events.ChangeDetector` for the available events. A "reload" event
+    tells the client that events have been lost, so that it should query the data it
+    displays again.
+
+    A comment is sent every EVENTS_HEARTBEAT_INTERVAL seconds if there is no event,
+    so that proxies don't close the connection.
+
+    """
+
+    if not g.user:
+        return jsonify(error("A valid authentication token is required.")), 401
+
+    proposal_codes = request.args.getlist("proposal_code")
+    if proposal_codes:
+        proposal_codes = [
+            proposal_code
+            for proposal_code in proposal_codes
+            if may_view_proposal(proposal_code)
+        ]
+    else:
+        proposal_codes = viewable_proposals()
+
+    try:
+        subscription = change_detector.subscribe(proposal_codes)
+    except TooManySubscribers:
+        return jsonify(error("There are too many open event streams.")), 503
+    heartbeat_interval = current_app.config.get("EVENTS_HEARTBEAT_INTERVAL", 30)
+
+    def stream():
+        try:
+            yield "retry: 10000\n\n"
+            while True:
+                event = subscription.next_event(heartbeat_interval)
+                if event is not None:
+                    yield format_event(event)
+                else:
+                    yield ": heartbeat\n\n"
+        finally:
+            change_detector.unsubscribe(subscription)
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,296 @@
+import bisect
+import threading
+
+
+class _Metric:
+    """
+    Base class for metrics.
+
+    Parameters
+    ----------
+    name : str
+        The metric name, such as "db_pool_checkout_seconds".
+    description : str
+        A description of the metric.
+    labels : tuple of str
+        The label names.
+
+    """
+
+    metric_type = None
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels):
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def _format_labels(self, label_values, extra=()):
+        pairs = list(zip(self.labels, label_values)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(
+            '{name}="{value}"'.format(
+                name=name, value=value.replace("\\", "\\\\").replace('"', '\\"')
+            )
+            for name, value in pairs
+        ) + "}"
+
+    def samples(self):
+        """
+        Get the samples of the metric.
+
+        Returns
+        -------
+        list of tuple :
+            The samples, as (name suffix, label values, extra labels, value) tuples.
+
+        """
+
+        raise NotImplementedError
+
+    def render(self):
+        """
+        Render the metric in the Prometheus text exposition format.
+
+        Returns
+        -------
+        str :
+            The rendered metric.
+
+        """
+
+        lines = [
+            "# HELP {name} {description}".format(
+                name=self.name, description=self.description
+            ),
+            "# TYPE {name} {type}".format(name=self.name, type=self.metric_type),
+        ]
+        for suffix, label_values, extra, value in self.samples():
+            lines.append(
+                "{name}{suffix}{labels} {value}".format(
+                    name=self.name,
+                    suffix=suffix,
+                    labels=self._format_labels(label_values, extra),
+                    value=repr(float(value)),
+                )
+            )
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """
+    A counter, which can only increase.
+
+    """
+
+    metric_type = "counter"
+
+    def __init__(self, name, description, labels=()):
+        _Metric.__init__(self, name, description, labels)
+        self._values = dict()
+
+    def inc(self, amount=1, **labels):
+        """
+        Increase the counter.
+
+        Parameters
+        ----------
+        amount : float
+            The amount by which to increase the counter.
+        **labels
+            The label values.
+
+        """
+
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [("", key, (), value) for key, value in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    """
+    A gauge, whose values are collected by calling a function.
+
+    Parameters
+    ----------
+    name : str
+        The metric name.
+    description : str
+        A description of the metric.
+    labels : tuple of str
+        The label names.
+    collect : function
+        A function without arguments which returns the current value or, if there
+        are labels, a dictionary of label value tuples and values.
+
+    """
+
+    metric_type = "gauge"
+
+    def __init__(self, name, description, labels=(), collect=None):
+        _Metric.__init__(self, name, description, labels)
+        self.collect = collect
+
+    def samples(self):
+        values = self.collect()
+        if not self.labels:
+            values = {(): values}
+        return [
+            ("", tuple(str(v) for v in key), (), value)
+            for key, value in sorted(values.items())
+        ]
+
+
+class Histogram(_Metric):
+    """
+    A histogram of observed values.
+
+    Parameters
+    ----------
+    name : str
+        The metric name.
+    description : str
+        A description of the metric.
+    labels : tuple of str
+        The label names.
+    buckets : tuple of float
+        The upper bounds of the histogram buckets.
+
+    """
+
+    metric_type = "histogram"
+
+    DEFAULT_BUCKETS = (
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1,
+        2.5,
+        5,
+        10,
+    )
+
+    def __init__(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        _Metric.__init__(self, name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = dict()
+
+    def observe(self, value, **labels):
+        """
+        Record an observed value.
+
+        Parameters
+        ----------
+        value : float
+            The value.
+        **labels
+            The label values.
+
+        """
+
+        key = self._label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = dict(counts=[0] * len(self.buckets), sum=0, count=0)
+            values = self._values[key]
+            if index < len(self.buckets):
+                values["counts"][index] += 1
+            values["sum"] += value
+            values["count"] += 1
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, values in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, values["counts"]):
+                    cumulative += bucket_count
+                    samples.append(
+                        ("_bucket", key, (("le", repr(float(bound))),), cumulative)
+                    )
+                samples.append(("_bucket", key, (("le", "+Inf"),), values["count"]))
+                samples.append(("_sum", key, (), values["sum"]))
+                samples.append(("_count", key, (), values["count"]))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    A registry of metrics.
+
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """
+        Add a metric to the registry.
+
+        Parameters
+        ----------
+        metric : Counter or Gauge or Histogram
+            The metric.
+
+        Returns
+        -------
+        Counter or Gauge or Histogram :
+            The metric.
+
+        """
+
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, description, labels=()):
+        """Create and register a counter."""
+
+        return self.register(Counter(name, description, labels))
+
+    def gauge(self, name, description, labels=(), collect=None):
+        """Create and register a gauge."""
+
+        return self.register(Gauge(name, description, labels, collect))
+
+    def histogram(
+        self, name, description, labels=(), buckets=Histogram.DEFAULT_BUCKETS
+    ):
+        """Create and register a histogram."""
+
+        return self.register(Histogram(name, description, labels, buckets))
+
+    def render(self):
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Returns
+        -------
+        str :
+            The rendered metrics.
+
+        """
+
+        with self._lock:
+            metrics = list(self._metrics)
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+# the registry for all the metrics of the server
+registry = MetricsRegistry()
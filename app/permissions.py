@@ -0,0 +1,271 @@
+from flask import g
+from app.auth import user_cache
+from app.dataloader.fetch import fetch_rows
+
+
+def viewable_proposal_codes(user_id):
+    """
+    Get the codes of the proposals a (non-administrator) user may view by being
+    associated with them.
+
+    These are the proposals on which the user is an investigator, those for which
+    they are the liaison astronomer, and those requesting time from a partner whose
+    TAC they are a member of. All these proposals are found with a single query.
+    The permissions themselves are defined by the user's `may_view_proposal` method
+    (see :func:`viewable_proposals`).
+
+    Administrators may view all proposals, and this function should not be used for
+    them.
+
+    Parameters
+    ----------
+    user_id : int
+        The user id.
+
+    Returns
+    -------
+    frozenset :
+        The proposal codes.
+
+    """
+
+    sql = """
+SELECT Proposal_Code
+       FROM ProposalCode AS pc
+       JOIN ProposalInvestigator AS pi ON pc.ProposalCode_Id = pi.ProposalCode_Id
+       JOIN Investigator AS i ON pi.Investigator_Id = i.Investigator_Id
+       WHERE i.PiptUser_Id = :user_id
+UNION
+SELECT Proposal_Code
+       FROM ProposalCode AS pc
+       JOIN ProposalContact AS contact ON pc.ProposalCode_Id = contact.ProposalCode_Id
+       JOIN Investigator AS i ON contact.Astronomer_Id = i.Investigator_Id
+       WHERE i.PiptUser_Id = :user_id
+UNION
+SELECT Proposal_Code
+       FROM ProposalCode AS pc
+       JOIN MultiPartner AS mp ON pc.ProposalCode_Id = mp.ProposalCode_Id
+       JOIN PiptUserTAC AS tac ON mp.Partner_Id = tac.Partner_Id
+       WHERE tac.PiptUser_Id = :user_id
+"""
+
+    return frozenset(
+        row.Proposal_Code for row in fetch_rows(sql, dict(user_id=user_id))
+    )
+
+
+def viewable_proposals():
+    """
+    Get the codes of all the proposals the current user may view.
+
+    The proposals found by :func:`viewable_proposal_codes` are checked with the
+    user's `may_view_proposal` method, so that no proposal is included which the
+    user may not view. Proposals the user may view without being associated with
+    them (for example, by another role) are not included. The current user is taken
+    from Flask's `g` object. The set of proposals the user may view is kept in the
+    user cache.
+
+    Returns
+    -------
+    frozenset or None :
+        The proposal codes, or None if the user is an administrator and hence may
+        view all proposals.
+
+    """
+
+    if g.user.is_admin():
+        return None
+
+    user = g.user
+
+    def fetch(user_ids):
+        return [
+            frozenset(
+                proposal_code
+                for proposal_code in viewable_proposal_codes(user_id)
+                if user.may_view_proposal(proposal_code)
+            )
+            for user_id in user_ids
+        ]
+
+    return user_cache.get_or_fetch("viewable_proposals", [g.user_id], fetch)[0]
+
+
+def may_view_proposal(proposal_code):
+    """
+    Check whether the current user may view a proposal.
+
+    The check is done with the user's `may_view_proposal` method. The current user
+    is taken from Flask's `g` object.
+
+    Parameters
+    ----------
+    proposal_code : str
+        The proposal code.
+
+    Returns
+    -------
+    bool :
+        Whether the user may view the proposal.
+
+    """
+
+    return g.user.may_view_proposal(proposal_code)
+
+
+def filter_viewable_proposals(proposal_codes):
+    """
+    Filter a list of proposal codes, keeping only those the current user may view.
+
+    The check is done in bulk rather than proposal by proposal, so that its cost does
+    not grow with the number of proposals. Only the proposals included by
+    :func:`viewable_proposals` are kept. The current user is taken from Flask's `g`
+    object.
+
+    Parameters
+    ----------
+    proposal_codes : list of str
+        The proposal codes.
+
+    Returns
+    -------
+    list of str :
+        The proposal codes the user may view, in the original order.
+
+    """
+
+    if not proposal_codes:
+        return []
+    viewable = viewable_proposals()
+    if viewable is None:
+        return list(proposal_codes)
+
+    return [
+        proposal_code for proposal_code in proposal_codes if proposal_code in viewable
+    ]
+
+
+# joins for the users who may edit a proposal and its blocks, namely the proposal's
+# Principal Investigator, Principal Contact and liaison astronomer; {table} must be
+# a table with a ProposalCode_Id column
+_PROPOSAL_EDITORS_JOIN = """
+       JOIN ProposalContact AS contact
+            ON {table}.ProposalCode_Id = contact.ProposalCode_Id
+       JOIN Investigator AS i ON i.Investigator_Id IN (contact.Leader_Id,
+                                                       contact.Contact_Id,
+                                                       contact.Astronomer_Id)
+"""
+
+
+def filter_editable_proposals(proposal_codes):
+    """
+    Filter a list of proposal codes, keeping only those the current user may edit.
+
+    A user may edit a proposal if they are its Principal Investigator, Principal
+    Contact or liaison astronomer. Administrators may edit all proposals. The check
+    is done with a single query for all the proposals. The current user is taken
+    from Flask's `g` object.
+
+    Parameters
+    ----------
+    proposal_codes : list of str
+        The proposal codes.
+
+    Returns
+    -------
+    list of str :
+        The codes of the proposals the user may edit, in the original order.
+
+    """
+
+    if not proposal_codes:
+        return []
+    if g.user.is_admin():
+        return list(proposal_codes)
+
+    sql = """
+SELECT DISTINCT Proposal_Code
+       FROM ProposalCode AS pc
+       {editors}
+       WHERE pc.Proposal_Code IN :proposal_codes AND i.PiptUser_Id = :user_id
+""".format(
+        editors=_PROPOSAL_EDITORS_JOIN.format(table="pc").strip()
+    )
+
+    editable = set(
+        row.Proposal_Code
+        for row in fetch_rows(
+            sql, dict(proposal_codes=proposal_codes, user_id=g.user_id)
+        )
+    )
+    return [
+        proposal_code for proposal_code in proposal_codes if proposal_code in editable
+    ]
+
+
+def may_edit_proposal(proposal_code):
+    """
+    Check whether the current user may edit a proposal.
+
+    The same permission rules as for :func:`filter_editable_proposals` are used.
+
+    Parameters
+    ----------
+    proposal_code : str
+        The proposal code.
+
+    Returns
+    -------
+    bool :
+        Whether the user may edit the proposal.
+
+    """
+
+    return bool(filter_editable_proposals([proposal_code]))
+
+
+def filter_editable_blocks(block_ids):
+    """
+    Filter a list of block ids, keeping only those the current user may edit.
+
+    The blocks whose proposal may be edited by the user (see
+    :func:`filter_editable_proposals`) are found with a single query for all the
+    blocks. Only these blocks are checked with the user's `may_edit_block` method,
+    so that no block is kept which the user may not edit, and blocks of other
+    proposals are rejected without a check. Administrators may edit all blocks. The
+    current user is taken from Flask's `g` object.
+
+    Parameters
+    ----------
+    block_ids : list of int
+        The block ids.
+
+    Returns
+    -------
+    list of int :
+        The ids of the blocks the user may edit, in the original order.
+
+    """
+
+    if not block_ids:
+        return []
+    if g.user.is_admin():
+        return list(block_ids)
+
+    sql = """
+SELECT DISTINCT Block_Id
+       FROM Block AS b
+       {editors}
+       WHERE b.Block_Id IN :block_ids AND i.PiptUser_Id = :user_id
+""".format(
+        editors=_PROPOSAL_EDITORS_JOIN.format(table="b").strip()
+    )
+
+    candidates = set(
+        row.Block_Id
+        for row in fetch_rows(sql, dict(block_ids=block_ids, user_id=g.user_id))
+    )
+    editable = set(
+        block_id for block_id in candidates if g.user.may_edit_block(block_id=block_id)
+    )
+    return [block_id for block_id in block_ids if block_id in editable]
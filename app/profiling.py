@@ -0,0 +1,223 @@
+import re
+import threading
+import time
+from functools import lru_cache
+from flask import current_app, has_app_context
+from app.tracing import add_statement_listener, current_loader
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|%\(\w+\)s|(?<!:):\w+|\?")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def normalize_statement(statement):
+    """
+    Normalize an SQL statement, so that statements differing only in their
+    parameter values are the same.
+
+    Whitespace is collapsed, literals and placeholders are replaced with a question
+    mark, and lists of placeholders (as used for IN clauses) with a single one.
+
+    Parameters
+    ----------
+    statement : str
+        The SQL statement.
+
+    Returns
+    -------
+    str :
+        The normalized statement.
+
+    """
+
+    statement = _STRING_LITERAL.sub("?", statement)
+    statement = _NUMBER_LITERAL.sub("?", statement)
+    statement = _PLACEHOLDER.sub("?", statement)
+    statement = _PLACEHOLDER_LIST.sub("(?)", statement)
+    return _WHITESPACE.sub(" ", statement).strip()
+
+
+class StatementProfiler:
+    """
+    A profiler for all SQL statements executed by the server.
+
+    For every statement the normalized statement text (see
+    :func:`normalize_statement`), the duration, the number of rows and the calling
+    data loader are recorded. Statements taking longer than the
+    SQL_SLOW_QUERY_THRESHOLD setting (in seconds) are logged as warnings to the
+    app's log. A threshold of None disables the slow query log.
+
+    The statistics per normalized statement are kept for a rolling window of
+    between one and two times the SQL_PROFILE_WINDOW setting (in seconds), and the
+    statements with the largest total duration are available from
+    :meth:`summary`. At most SQL_PROFILE_MAX_STATEMENTS distinct statements are
+    kept per window. Profiling is disabled if the SQL_PROFILE setting is false.
+
+    The statements are timed by the same engine event listeners as for tracing (see
+    :func:`~app.tracing.add_statement_listener`).
+
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.slow_query_threshold = None
+        self.window = 3600
+        self.max_statements = 1000
+        self._logger = None
+        self._current = dict()
+        self._previous = dict()
+        self._window_start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Configure the profiler from the configuration of a Flask app.
+
+        Parameters
+        ----------
+        app : Flask
+            The Flask app.
+
+        """
+
+        self.enabled = app.config.get("SQL_PROFILE", False)
+        self.slow_query_threshold = app.config.get("SQL_SLOW_QUERY_THRESHOLD")
+        self.window = app.config.get("SQL_PROFILE_WINDOW", 3600)
+        self.max_statements = app.config.get("SQL_PROFILE_MAX_STATEMENTS", 1000)
+        self._logger = app.logger
+        self.reset()
+        add_statement_listener(self._statement_executed)
+
+    def reset(self):
+        """Remove all collected statistics."""
+
+        with self._lock:
+            self._current = dict()
+            self._previous = dict()
+            self._window_start = time.monotonic()
+
+    def record(self, statement, duration, rows, loader=None):
+        """
+        Record the execution of an SQL statement.
+
+        Parameters
+        ----------
+        statement : str
+            The SQL statement.
+        duration : float
+            The execution time, in seconds.
+        rows : int
+            The number of rows returned or affected, or -1 if unknown.
+        loader : str
+            The name of the data loader executing the statement, if any.
+
+        """
+
+        normalized = normalize_statement(statement)
+        if (
+            self.slow_query_threshold is not None
+            and duration >= self.slow_query_threshold
+        ):
+            self._log_slow_statement(normalized, duration, rows, loader)
+
+        caller = loader or "-"
+        with self._lock:
+            self._rotate()
+            stats = self._current.get(normalized)
+            if stats is None:
+                if len(self._current) >= self.max_statements:
+                    return
+                stats = _new_stats()
+                self._current[normalized] = stats
+            _add_stats(stats, 1, duration, duration, max(rows, 0), {caller: 1})
+
+    def summary(self, top=10):
+        """
+        Get the statements with the largest total duration in the rolling window.
+
+        Parameters
+        ----------
+        top : int
+            The maximum number of statements.
+
+        Returns
+        -------
+        list of dict :
+            The statements with their count, total, mean and maximum duration (in
+            seconds), total number of rows and calling data loaders, in descending
+            order of total duration.
+
+        """
+
+        with self._lock:
+            self._rotate()
+            merged = dict()
+            for window in (self._previous, self._current):
+                for statement, stats in window.items():
+                    _add_stats(
+                        merged.setdefault(statement, _new_stats()),
+                        stats["count"],
+                        stats["total"],
+                        stats["max"],
+                        stats["rows"],
+                        stats["callers"],
+                    )
+
+        ranked = sorted(merged.items(), key=lambda item: item[1]["total"], reverse=True)
+        return [
+            dict(
+                statement=statement,
+                count=stats["count"],
+                total_seconds=stats["total"],
+                mean_seconds=stats["total"] / stats["count"],
+                max_seconds=stats["max"],
+                rows=stats["rows"],
+                callers=stats["callers"],
+            )
+            for statement, stats in ranked[:top]
+        ]
+
+    def _rotate(self):
+        now = time.monotonic()
+        if now - self._window_start < self.window:
+            return
+        if now - self._window_start < 2 * self.window:
+            self._previous = self._current
+        else:
+            self._previous = dict()
+        self._current = dict()
+        self._window_start = now
+
+    def _log_slow_statement(self, statement, duration, rows, loader):
+        logger = current_app.logger if has_app_context() else self._logger
+        if logger is not None:
+            logger.warning(
+                "Slow SQL statement (%.3f s, %d rows, loader: %s): %s",
+                duration,
+                rows,
+                loader or "-",
+                statement,
+            )
+
+    def _statement_executed(self, statement, start, duration, rows):
+        if self.enabled:
+            self.record(statement, duration, rows, current_loader())
+
+
+def _new_stats():
+    return dict(count=0, total=0, max=0, rows=0, callers=dict())
+
+
+def _add_stats(stats, count, total, maximum, rows, callers):
+    stats["count"] += count
+    stats["total"] += total
+    stats["max"] = max(stats["max"], maximum)
+    stats["rows"] += rows
+    for caller, caller_count in callers.items():
+        stats["callers"][caller] = stats["callers"].get(caller, 0) + caller_count
+
+
+statement_profiler = StatementProfiler()
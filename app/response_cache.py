@@ -0,0 +1,355 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+from flask import g
+from app.cache import ResultCache
+
+
+def _tag(namespace, key):
+    return "{namespace}:{key}".format(namespace=namespace, key=key)
+
+
+def record_tag(namespace, key):
+    """
+    Record that the response of the current request depends on some data.
+
+    A cached response is invalidated when one of its tags is invalidated with
+    :meth:`ResponseCache.invalidate`. This function should be called by the data
+    loaders for everything they load. It does nothing if the response of the
+    current request isn't cached.
+
+    Parameters
+    ----------
+    namespace : str
+        The namespace, such as "block".
+    key : hashable
+        The key, such as a block id.
+
+    """
+
+    tags = g.get("response_cache_tags")
+    if tags is not None:
+        tags.add(_tag(namespace, key))
+
+
+class MemoryBackend:
+    """
+    Response cache backend storing the responses in an in-memory LRU cache.
+
+    The responses are only available in the current process. The maximum number of
+    responses and their time to live are configured with the RESPONSE_CACHE_MAX_SIZE
+    and RESPONSE_CACHE_TTL settings.
+
+    The version of an invalidated tag is the generation of its invalidation, so that
+    versions never are reused. A tag invalidated more than the time to live ago can
+    be forgotten, as all responses cached before its invalidation have expired. If
+    there still are more than `MAX_TAGS_PER_RESPONSE` times the maximum number of
+    responses, all responses and tags are removed.
+
+    """
+
+    MAX_TAGS_PER_RESPONSE = 10
+
+    def __init__(self, app):
+        self.cache = ResultCache("RESPONSE_CACHE")
+        self.cache.init_app(app)
+        self.max_tags = max(self.MAX_TAGS_PER_RESPONSE * self.cache.max_size, 1)
+        self._tag_versions = dict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self.cache.get("response", key)
+
+    def set(self, key, entry):
+        self.cache.set("response", key, entry)
+
+    def tag_versions(self, tags):
+        with self._lock:
+            return {tag: self._tag_versions.get(tag, (0, None))[0] for tag in tags}
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def invalidate_tag(self, tag):
+        now = time.monotonic()
+        with self._lock:
+            self._generation += 1
+            self._tag_versions[tag] = (self._generation, now)
+            if len(self._tag_versions) > self.max_tags:
+                self._prune(now)
+
+    def _prune(self, now):
+        ttl = self.cache.ttl
+        if ttl is not None:
+            self._tag_versions = {
+                tag: (version, invalidated)
+                for tag, (version, invalidated) in self._tag_versions.items()
+                if invalidated > now - ttl
+            }
+        if len(self._tag_versions) > self.max_tags:
+            self.cache.clear()
+            self._tag_versions = dict()
+
+
+class FileBackend:
+    """
+    Response cache backend storing the responses as files in a directory.
+
+    The directory is given by the RESPONSE_CACHE_DIR setting, and it may be shared
+    by several server processes. Expired files are ignored, but they are not
+    removed.
+
+    """
+
+    def __init__(self, app):
+        self.directory = app.config["RESPONSE_CACHE_DIR"]
+        self.ttl = app.config.get("RESPONSE_CACHE_TTL")
+        os.makedirs(os.path.join(self.directory, "tags"), exist_ok=True)
+
+    def _path(self, *parts):
+        name = hashlib.sha256(parts[-1].encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, *(parts[:-1] + (name,)))
+
+    def _write(self, path, content):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                expires, entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires is not None and expires <= time.time():
+            return None
+        return entry
+
+    def set(self, key, entry):
+        expires = time.time() + self.ttl if self.ttl is not None else None
+        self._write(self._path(key), pickle.dumps((expires, entry)))
+
+    def tag_versions(self, tags):
+        versions = dict()
+        for tag in tags:
+            try:
+                with open(self._path("tags", tag)) as f:
+                    versions[tag] = int(f.read())
+            except (OSError, ValueError):
+                versions[tag] = 0
+        return versions
+
+    def generation(self):
+        try:
+            with open(os.path.join(self.directory, "generation")) as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def invalidate_tag(self, tag):
+        version = self.tag_versions([tag])[tag] + 1
+        self._write(self._path("tags", tag), str(version).encode("ascii"))
+        self._write(
+            os.path.join(self.directory, "generation"),
+            "{}-{}".format(time.time(), os.getpid()).encode("ascii"),
+        )
+
+
+class ResponseCache:
+    """
+    A cache for the responses of read-only GraphQL queries.
+
+    Responses are cached by the normalized query, the operation name, the variables
+    and the permission scope of the user (i.e. whether the user is an administrator
+    and, if not, the user id). Requests without an authenticated user are not
+    cached, as their responses may contain credentials (such as an authentication
+    token). The data loaders record which blocks, proposals etc. a response depends
+    on (see :func:`record_tag`), and mutations invalidate all responses depending on
+    the data they change (see :meth:`invalidate`). Responses which don't depend on
+    any such data can't be invalidated, and hence they aren't cached.
+
+    The backend is chosen with the RESPONSE_CACHE_BACKEND setting, which may be
+    "memory" (see :class:`MemoryBackend`), "file" (see :class:`FileBackend`) or
+    "none", which disables the cache.
+
+    """
+
+    BACKENDS = dict(memory=MemoryBackend, file=FileBackend)
+
+    def __init__(self):
+        self.backend = None
+        self.ttl = None
+
+    def init_app(self, app):
+        """
+        Configure the cache from the configuration of a Flask app.
+
+        Parameters
+        ----------
+        app : Flask
+            The Flask app.
+
+        """
+
+        backend = app.config.get("RESPONSE_CACHE_BACKEND", "none")
+        self.ttl = app.config.get("RESPONSE_CACHE_TTL")
+        if backend == "none":
+            self.backend = None
+        elif backend in self.BACKENDS:
+            self.backend = self.BACKENDS[backend](app)
+        else:
+            raise ValueError("Unknown response cache backend: {}".format(backend))
+
+    @property
+    def enabled(self):
+        """Whether the cache is enabled."""
+
+        return self.backend is not None
+
+    @staticmethod
+    def key(query, operation_name, variables, scope):
+        """
+        Get the cache key for a query.
+
+        Parameters
+        ----------
+        query : str
+            The normalized query.
+        operation_name : str
+            The operation name, if any.
+        variables : dict
+            The variables, if any.
+        scope : str
+            The permission scope of the user.
+
+        Returns
+        -------
+        str :
+            The key.
+
+        """
+
+        content = json.dumps(
+            [query, operation_name, variables or {}, scope],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Get a cached response.
+
+        Parameters
+        ----------
+        key : str
+            The cache key.
+
+        Returns
+        -------
+        dict or None :
+            The response body ("body"), its compressed variants by content encoding
+            ("variants") and the ETag ("etag"), or None if there is no valid cached
+            response.
+
+        """
+
+        entry = self.backend.get(key)
+        if entry is None:
+            return None
+        expires = entry.get("expires")
+        if expires is not None and expires <= time.time():
+            return None
+        if self.backend.tag_versions(entry["tags"]) != entry["tags"]:
+            return None
+        return entry
+
+    def start_recording(self):
+        """Start recording the tags for the response of the current request."""
+
+        g.response_cache_tags = set()
+        g.response_cache_generation = self.backend.generation()
+
+    def set(self, key, body, etag, variants=None):
+        """
+        Cache the response for the current request, together with its tags.
+
+        A response without any tags isn't cached, as there would be nothing to
+        invalidate it.
+
+        Parameters
+        ----------
+        key : str
+            The cache key.
+        body : bytes
+            The response body.
+        etag : str
+            The ETag.
+        variants : dict
+            Compressed variants of the body, by content encoding.
+
+        """
+
+        tags = g.pop("response_cache_tags", set())
+        if not tags:
+            g.pop("response_cache_generation", None)
+            return
+
+        # the response might be outdated if something has been invalidated meanwhile
+        if g.pop("response_cache_generation", None) != self.backend.generation():
+            return
+
+        entry = dict(
+            body=body,
+            variants=dict(variants or {}),
+            etag=etag,
+            tags=self.backend.tag_versions(tags),
+            expires=time.time() + self.ttl if self.ttl is not None else None,
+        )
+        self.backend.set(key, entry)
+
+    def set_variants(self, key, entry, variants):
+        """
+        Update the compressed variants of a cached response.
+
+        The response keeps its tags and expiry time, so that it is invalidated as
+        before.
+
+        Parameters
+        ----------
+        key : str
+            The cache key.
+        entry : dict
+            The cached response, as returned by :meth:`get`.
+        variants : dict
+            The compressed variants of the body, by content encoding.
+
+        """
+
+        self.backend.set(key, dict(entry, variants=dict(variants)))
+
+    def invalidate(self, namespace, key):
+        """
+        Invalidate all cached responses which depend on some data.
+
+        Parameters
+        ----------
+        namespace : str
+            The namespace, such as "block".
+        key : hashable
+            The key, such as a block id.
+
+        """
+
+        if self.enabled:
+            self.backend.invalidate_tag(_tag(namespace, key))
+
+
+response_cache = ResponseCache()
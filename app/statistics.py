@@ -0,0 +1,378 @@
+import datetime
+from functools import partial
+import json
+import os
+import tempfile
+import threading
+import time
+import click
+from flask.cli import with_appcontext
+from app.dataloader.fetch import fetch_rows
+from app.util import _SemesterContent
+
+
+def _semester_key(semester):
+    return "{year}-{semester}".format(year=semester.year, semester=semester.semester)
+
+
+def compute_time_breakdown(semester):
+    """
+    Compute the time breakdown for a semester from the nightly totals.
+
+    Parameters
+    ----------
+    semester : SemesterContent
+        The semester.
+
+    Returns
+    -------
+    dict :
+        The times used for science and engineering, lost to weather and problems,
+        and spent idle, in seconds.
+
+    """
+
+    sql = """SELECT SUM(ScienceTime) AS ScienceTime, SUM(EngineeringTime) AS EngineeringTime,
+        SUM(TimeLostToWeather) AS TimeLostToWeather, SUM(TimeLostToProblems) AS TimeLostToProblems,
+        SUM(IdleTime) AS IdleTime
+        FROM NightInfo AS ni
+        JOIN Semester AS s ON (ni.Date >= s.StartSemester AND ni.Date <= s.EndSemester)
+        WHERE (s.Year=:year AND s.Semester=:semester)
+        """  # noqa
+
+    row = list(fetch_rows(sql, dict(year=semester.year, semester=semester.semester)))[0]
+
+    return dict(
+        science=float(row.ScienceTime or 0),
+        engineering=float(row.EngineeringTime or 0),
+        lost_to_weather=float(row.TimeLostToWeather or 0),
+        lost_to_problems=float(row.TimeLostToProblems or 0),
+        idle=float(row.IdleTime or 0),
+    )
+
+
+def compute_observations(semester):
+    """
+    Get the observation time and status of all the observations (i.e. block visits)
+    in a semester.
+
+    Parameters
+    ----------
+    semester : SemesterContent
+        The semester.
+
+    Returns
+    -------
+    list of list :
+        The observation time (in seconds) and status of the observations.
+
+    """
+
+    sql = """SELECT ObsTime, BlockVisitStatus FROM Proposal AS p
+        JOIN Block AS b ON b.Proposal_Id = p.Proposal_Id
+        JOIN BlockVisit AS bv ON bv.Block_Id = b.Block_Id
+        JOIN Semester AS s ON s.Semester_Id = p.Semester_Id
+        JOIN BlockVisitStatus AS bvs ON bvs.BlockVisitStatus_Id = bv.BlockVisitStatus_Id
+        WHERE (s.Year=:year AND s.Semester=:semester)
+        """
+
+    return [
+        [float(row.ObsTime or 0), row.BlockVisitStatus]
+        for row in fetch_rows(sql, dict(year=semester.year, semester=semester.semester))
+    ]
+
+
+def compute_observation_totals(semester, group_by=None):
+    """
+    Compute the total observation time and the number of observations (i.e. block
+    visits) per observation status in a semester.
+
+    The totals are computed with a GROUP BY query, so that only a handful of rows are
+    returned by the database. They may additionally be grouped by night or by the
+    partner of the proposal's Principal Investigator.
+
+    Parameters
+    ----------
+    semester : SemesterContent
+        The semester.
+    group_by : str
+        Additional grouping, either "Night" or "Partner". If None, the observations
+        are grouped by their status only.
+
+    Returns
+    -------
+    list of dict :
+        The totals, with the status, night (as an ISO date string, or None), partner
+        code (or None), total observation time (in seconds) and number of
+        observations.
+
+    """
+
+    columns = dict(Night="ni.Date", Partner="partner.Partner_Code")
+    joins = dict(
+        Night="JOIN NightInfo AS ni ON bv.NightInfo_Id = ni.NightInfo_Id",
+        Partner="""JOIN ProposalContact AS contact ON p.ProposalCode_Id = contact.ProposalCode_Id
+        JOIN Investigator AS i ON contact.Leader_Id = i.Investigator_Id
+        JOIN Institute AS institute ON i.Institute_Id = institute.Institute_Id
+        JOIN Partner AS partner ON institute.Partner_Id = partner.Partner_Id""",  # noqa
+    )
+    if group_by is not None and group_by not in columns:
+        raise ValueError("Unsupported grouping: {}".format(group_by))
+
+    group_column = ", {} AS GroupValue".format(columns[group_by]) if group_by else ""
+    sql = """SELECT BlockVisitStatus, SUM(ObsTime) AS ObsTime, COUNT(*) AS Observations{group_column}
+        FROM Proposal AS p
+        JOIN Block AS b ON b.Proposal_Id = p.Proposal_Id
+        JOIN BlockVisit AS bv ON bv.Block_Id = b.Block_Id
+        JOIN Semester AS s ON s.Semester_Id = p.Semester_Id
+        JOIN BlockVisitStatus AS bvs ON bvs.BlockVisitStatus_Id = bv.BlockVisitStatus_Id
+        {join}
+        WHERE (s.Year=:year AND s.Semester=:semester)
+        GROUP BY BlockVisitStatus{group_by}
+        """.format(  # noqa
+        group_column=group_column,
+        join=joins[group_by] if group_by else "",
+        group_by=", GroupValue" if group_by else "",
+    )
+
+    totals = []
+    params = dict(year=semester.year, semester=semester.semester)
+    for row in fetch_rows(sql, params):
+        group_value = row.GroupValue if group_by else None
+        totals.append(
+            dict(
+                status=row.BlockVisitStatus,
+                night=str(group_value) if group_by == "Night" else None,
+                partner_code=group_value if group_by == "Partner" else None,
+                observation_time=float(row.ObsTime or 0),
+                observations=int(row.Observations),
+            )
+        )
+    return totals
+
+
+def is_closed_semester(semester):
+    """
+    Check whether a semester has ended.
+
+    Parameters
+    ----------
+    semester : SemesterContent
+        The semester.
+
+    Returns
+    -------
+    bool :
+        Whether the semester has ended.
+
+    """
+
+    sql = """SELECT EndSemester FROM Semester
+        WHERE Year=:year AND Semester=:semester
+        """
+
+    rows = list(fetch_rows(sql, dict(year=semester.year, semester=semester.semester)))
+    if not rows:
+        return False
+    end = rows[0].EndSemester
+    if isinstance(end, datetime.datetime):
+        end = end.date()
+    return end < datetime.date.today()
+
+
+class SemesterStatisticsStore:
+    """
+    A store of precomputed semester statistics.
+
+    The statistics of a closed semester never change, so they are computed once and
+    then served from the store. They are also saved to the JSON file given by the
+    SEMESTER_STATISTICS_FILE setting (if it is defined), so that they survive server
+    restarts. The statistics of the current (or a future) semester are recomputed
+    in full once they are older than SEMESTER_STATISTICS_TTL seconds (600 by
+    default), as the times and statuses of past observations may still change.
+
+    The statistics for all semesters can be recomputed with the
+    `refresh-semester-statistics` Flask command.
+
+    """
+
+    COMPUTE = dict(
+        time_breakdown=compute_time_breakdown,
+        observations=compute_observations,
+        observation_totals=compute_observation_totals,
+        observation_totals_by_night=partial(
+            compute_observation_totals, group_by="Night"
+        ),
+        observation_totals_by_partner=partial(
+            compute_observation_totals, group_by="Partner"
+        ),
+    )
+
+    def __init__(self):
+        self.path = None
+        self.ttl = 600
+        self._statistics = dict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Configure the store from the configuration of a Flask app.
+
+        The statistics saved in the statistics file are loaded.
+
+        Parameters
+        ----------
+        app : Flask
+            The Flask app.
+
+        """
+
+        self.path = app.config.get("SEMESTER_STATISTICS_FILE")
+        self.ttl = app.config.get("SEMESTER_STATISTICS_TTL", 600)
+        with self._lock:
+            self._statistics = dict()
+            if self.path and os.path.exists(self.path):
+                with open(self.path) as f:
+                    self._statistics = json.load(f)
+
+    def time_breakdown(self, semester):
+        """
+        Get the time breakdown for a semester.
+
+        Parameters
+        ----------
+        semester : SemesterContent
+            The semester.
+
+        Returns
+        -------
+        dict :
+            The time breakdown, as returned by :func:`compute_time_breakdown`.
+
+        """
+
+        return self._get(semester, "time_breakdown")
+
+    def observations(self, semester):
+        """
+        Get the observation times and statuses for a semester.
+
+        Parameters
+        ----------
+        semester : SemesterContent
+            The semester.
+
+        Returns
+        -------
+        list of list :
+            The observation times and statuses, as returned by
+            :func:`compute_observations`.
+
+        """
+
+        return self._get(semester, "observations")
+
+    def observation_totals(self, semester, group_by=None):
+        """
+        Get the total observation times per observation status for a semester.
+
+        Parameters
+        ----------
+        semester : SemesterContent
+            The semester.
+        group_by : str
+            Additional grouping, either "Night" or "Partner".
+
+        Returns
+        -------
+        list of dict :
+            The totals, as returned by :func:`compute_observation_totals`.
+
+        """
+
+        kind = "observation_totals"
+        if group_by:
+            kind += "_by_" + group_by.lower()
+        return self._get(semester, kind)
+
+    def refresh(self, semester):
+        """
+        Recompute and store the statistics for a semester.
+
+        Parameters
+        ----------
+        semester : SemesterContent
+            The semester.
+
+        """
+
+        for kind in self.COMPUTE:
+            self._compute(semester, kind)
+        self._save()
+
+    def _get(self, semester, kind):
+        with self._lock:
+            entry = self._statistics.get(_semester_key(semester), {}).get(kind)
+        if entry is not None and (
+            entry["closed"] or time.time() - entry["computed_at"] < self.ttl
+        ):
+            return entry["value"]
+
+        entry = self._compute(semester, kind)
+        if entry["closed"]:
+            self._save()
+        return entry["value"]
+
+    def _compute(self, semester, kind):
+        entry = dict(
+            closed=is_closed_semester(semester),
+            computed_at=time.time(),
+            value=self.COMPUTE[kind](semester),
+        )
+        with self._lock:
+            self._statistics.setdefault(_semester_key(semester), {})[kind] = entry
+        return entry
+
+    def _save(self):
+        if not self.path:
+            return
+
+        with self._lock:
+            content = json.dumps(self._statistics)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        os.replace(tmp_path, self.path)
+
+
+semester_statistics = SemesterStatisticsStore()
+
+
+@click.command("refresh-semester-statistics")
+@click.option(
+    "--semester",
+    "semesters",
+    multiple=True,
+    help='Semester to refresh, such as "2019-1". May be given more than once. '
+    "By default all semesters which have started are refreshed.",
+)
+@with_appcontext
+def refresh_semester_statistics_command(semesters):
+    """Recompute the precomputed semester statistics."""
+
+    if semesters:
+        semesters = [_SemesterContent(*s.split("-")) for s in semesters]
+    else:
+        sql = """SELECT Year, Semester FROM Semester
+        WHERE StartSemester <= NOW()
+        ORDER BY Year, Semester
+        """
+        semesters = [
+            _SemesterContent(year=str(row.Year), semester=str(row.Semester))
+            for row in fetch_rows(sql)
+        ]
+
+    for semester in semesters:
+        semester_statistics.refresh(semester)
+        click.echo("Refreshed the statistics for {}".format(_semester_key(semester)))
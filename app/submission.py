@@ -0,0 +1,340 @@
+import hashlib
+import tempfile
+import zipfile
+import requests
+from flask import Request, current_app
+from graphql import GraphQLError
+from werkzeug.exceptions import RequestEntityTooLarge
+from app import result_cache
+from app.auth import invalidate_user
+from app.dataloader.proposal_loader import PROPOSAL_PARTS, ProposalLoader
+from app.jobs import JobError, job_queue
+from app.response_cache import response_cache
+
+# size of the chunks in which a submission is sent to the submission service
+CHUNK_SIZE = 64 * 1024
+
+
+class SpooledUpload:
+    """
+    A temporary file for an uploaded file, which keeps track of the file's size and
+    SHA-256 hash while it is written.
+
+    Werkzeug's form parser writes the uploaded file to this file in chunks, so that
+    the upload never is held in memory as a whole. If the file grows larger than the
+    maximum size, a RequestEntityTooLarge error (and hence a 413 response) is raised.
+    The temporary file is deleted when it is closed.
+
+    All other file methods (such as `read` or `seek`) are passed on to the temporary
+    file.
+
+    Parameters
+    ----------
+    directory : str
+        The directory for the temporary file. The system's default directory for
+        temporary files is used if this is None.
+    max_size : int
+        The maximum file size, in bytes, or None for no limit.
+
+    """
+
+    def __init__(self, directory=None, max_size=None):
+        self._file = tempfile.NamedTemporaryFile(
+            prefix="upload-", suffix=".tmp", dir=directory
+        )
+        self._hash = hashlib.sha256()
+        self.max_size = max_size
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_size is not None and self.size > self.max_size:
+            self._file.close()
+            raise RequestEntityTooLarge(
+                "Uploaded files must not be larger than {} bytes.".format(
+                    self.max_size
+                )
+            )
+        self._hash.update(data)
+        return self._file.write(data)
+
+    @property
+    def sha256(self):
+        """The SHA-256 hash of the file content written so far, as a hex string."""
+
+        return self._hash.hexdigest()
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class SpoolingRequest(Request):
+    """
+    Flask request which spools uploaded files to disk.
+
+    Every uploaded file is written to a :class:`SpooledUpload` in the directory
+    given by the UPLOAD_DIR setting, and its size is limited by the
+    MAX_UPLOAD_SIZE setting (in bytes).
+
+    """
+
+    def _get_file_stream(
+        self, total_content_length, content_type, filename=None, content_length=None
+    ):
+        return SpooledUpload(
+            directory=current_app.config.get("UPLOAD_DIR"),
+            max_size=current_app.config.get("MAX_UPLOAD_SIZE"),
+        )
+
+
+class SubmissionPackage:
+    """
+    A zip file with the content of a proposal or block submission.
+
+    Only the zip file's central directory is read when the package is created, and
+    the entries are read lazily with :meth:`open`. The declared uncompressed size
+    of all entries is limited, so that a small zip file cannot expand to an
+    arbitrarily large amount of data.
+
+    Parameters
+    ----------
+    file : file-like
+        The zip file, such as the stream of an uploaded file.
+    required_entry : str
+        The name of the entry which the zip file must contain, such as
+        "Proposal.xml".
+    max_uncompressed_size : int
+        The maximum total uncompressed size of the entries, in bytes, or None for no
+        limit.
+
+    """
+
+    def __init__(self, file, required_entry, max_uncompressed_size=None):
+        self.file = file
+        self.file.seek(0)
+        try:
+            self._zip = zipfile.ZipFile(self.file)
+        except zipfile.BadZipFile:
+            raise GraphQLError("The uploaded file is not a valid zip file.")
+
+        entries = self._zip.infolist()
+        if required_entry not in (entry.filename for entry in entries):
+            raise GraphQLError(
+                "The zip file must contain a file {entry}.".format(entry=required_entry)
+            )
+        uncompressed_size = sum(entry.file_size for entry in entries)
+        if (
+            max_uncompressed_size is not None
+            and uncompressed_size > max_uncompressed_size
+        ):
+            raise GraphQLError(
+                "The uncompressed content of the zip file must not be larger than "
+                "{} bytes.".format(max_uncompressed_size)
+            )
+
+        self.size = getattr(self.file, "size", None)
+        self.sha256 = getattr(self.file, "sha256", None)
+        if self.size is None or self.sha256 is None:
+            # the file has not been spooled by a SpoolingRequest
+            self.size, self.sha256 = _size_and_hash(self.file)
+
+    def names(self):
+        """The names of the entries in the zip file."""
+
+        return self._zip.namelist()
+
+    def open(self, name):
+        """
+        Open an entry of the zip file for reading.
+
+        The entry is decompressed while it is read.
+
+        Parameters
+        ----------
+        name : str
+            The entry name.
+
+        Returns
+        -------
+        file-like :
+            The entry content, as a binary file object.
+
+        """
+
+        return self._zip.open(name)
+
+
+def _chunks(f):
+    f.seek(0)
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+def _size_and_hash(f):
+    h = hashlib.sha256()
+    size = 0
+    for chunk in _chunks(f):
+        size += len(chunk)
+        h.update(chunk)
+    return size, h.hexdigest()
+
+
+def enqueue_submission(kind, package, user_id, proposal_code=None, block_code=None):
+    """
+    Queue a submission for processing in the background.
+
+    The zip file of the submission is attached to the job, which is processed by
+    :func:`submit_package`.
+
+    Parameters
+    ----------
+    kind : str
+        The kind of submission, "proposal" or "block".
+    package : SubmissionPackage
+        The submission package.
+    user_id : int
+        The id of the submitting user.
+    proposal_code : str
+        The proposal code, for a resubmission or a block submission.
+    block_code : str
+        The block code, for a block resubmission.
+
+    Returns
+    -------
+    str :
+        The job id.
+
+    """
+
+    return job_queue.enqueue(
+        "submit_" + kind,
+        dict(
+            proposal_code=proposal_code,
+            block_code=block_code,
+            size=package.size,
+            sha256=package.sha256,
+        ),
+        user_id=user_id,
+        file=package.file,
+    )
+
+
+def submit_package(f, size, sha256, user_id, proposal_code=None, block_code=None):
+    """
+    Send a submission's zip file to the submission service.
+
+    The zip file is streamed from disk in chunks to the URL given by the
+    SUBMISSION_SERVICE_URL setting, along with its size and SHA-256 hash. The
+    service must respond with a JSON object containing the proposal code
+    ("proposal_code") and, for block submissions, the block id ("block_id"). If the
+    submission is rejected, the service should respond with a 4xx status code and a
+    JSON object with an error message ("error"), which is passed on to the user.
+
+    Parameters
+    ----------
+    f : file-like
+        The zip file.
+    size : int
+        The size of the zip file, in bytes.
+    sha256 : str
+        The SHA-256 hash of the zip file, as a hex string.
+    user_id : int
+        The id of the submitting user.
+    proposal_code : str
+        The proposal code, for a resubmission or a block submission.
+    block_code : str
+        The block code, for a block resubmission.
+
+    Returns
+    -------
+    dict :
+        The response of the submission service.
+
+    """
+
+    url = current_app.config.get("SUBMISSION_SERVICE_URL")
+    if not url:
+        raise JobError("Submissions are not supported by this server.")
+
+    params = dict(user_id=user_id)
+    if proposal_code:
+        params["proposal_code"] = proposal_code
+    if block_code:
+        params["block_code"] = block_code
+    try:
+        response = requests.post(
+            url,
+            params=params,
+            data=_chunks(f),
+            headers={
+                "Content-Type": "application/zip",
+                "Content-Length": str(size),
+                "X-Content-SHA256": sha256,
+            },
+            timeout=current_app.config.get("SUBMISSION_SERVICE_TIMEOUT"),
+        )
+        if 400 <= response.status_code < 500:
+            message = response.json().get("error")
+            if message:
+                raise JobError(message)
+        response.raise_for_status()
+        return response.json()
+    except (requests.RequestException, ValueError) as e:
+        current_app.logger.exception(e)
+        raise JobError("The submission could not be processed.")
+
+
+def _invalidate_proposal(proposal_code):
+    for part in ["exists"] + list(PROPOSAL_PARTS):
+        result_cache.invalidate(ProposalLoader._namespace(part), proposal_code)
+    response_cache.invalidate("proposal", proposal_code)
+    # the proposal may be a new one
+    response_cache.invalidate("proposals", "list")
+
+
+@job_queue.handler("submit_proposal")
+def _submit_proposal(job, report_progress):
+    report_progress("Sending the proposal to the submission service")
+    with open(job.file_path, "rb") as f:
+        result = submit_package(
+            f,
+            job.payload["size"],
+            job.payload["sha256"],
+            job.user_id,
+            proposal_code=job.payload["proposal_code"],
+        )
+
+    # the cached proposal content is outdated now, and the user may view a new
+    # proposal
+    proposal_code = result["proposal_code"]
+    _invalidate_proposal(proposal_code)
+    invalidate_user(job.user_id)
+
+    return dict(proposal_code=proposal_code)
+
+
+@job_queue.handler("submit_block")
+def _submit_block(job, report_progress):
+    report_progress("Sending the block to the submission service")
+    with open(job.file_path, "rb") as f:
+        result = submit_package(
+            f,
+            job.payload["size"],
+            job.payload["sha256"],
+            job.user_id,
+            proposal_code=job.payload["proposal_code"],
+            block_code=job.payload["block_code"],
+        )
+
+    # the cached proposal and block content is outdated now
+    proposal_code = job.payload["proposal_code"]
+    block_id = result["block_id"]
+    _invalidate_proposal(proposal_code)
+    for namespace in ("block", "block_visits"):
+        result_cache.invalidate(namespace, block_id)
+    response_cache.invalidate("block", block_id)
+
+    return dict(proposal_code=proposal_code, block_id=block_id)
@@ -0,0 +1,414 @@
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from flask import g, has_app_context, request
+from graphql.type.definition import get_named_type, is_leaf_type
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.metrics import registry
+
+_resolver_seconds = registry.histogram(
+    "graphql_resolver_seconds",
+    "Wall time of GraphQL resolvers returning objects, until their value is resolved.",
+    labels=("field",),
+)
+
+_batch_seconds = registry.histogram(
+    "dataloader_batch_seconds",
+    "Time spent loading a data loader batch.",
+    labels=("loader",),
+)
+
+_batch_size = registry.histogram(
+    "dataloader_batch_size",
+    "Number of keys in a data loader batch.",
+    labels=("loader",),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000),
+)
+
+_statement_seconds = registry.histogram(
+    "db_statement_seconds",
+    "Execution time of SQL statements, by their type (such as SELECT).",
+    labels=("operation",),
+)
+
+_local = threading.local()
+
+
+def _nanoseconds(seconds):
+    return int(seconds * 1e9)
+
+
+class Trace:
+    """
+    The timings of the resolvers, data loader batches and SQL statements of a
+    request.
+
+    The trace is formatted in the Apollo tracing format (see
+    https://github.com/apollographql/apollo-tracing), with two additional lists,
+    "batches" and "statements", for the data loader batches and the SQL statements.
+    All offsets and durations are in nanoseconds.
+
+    """
+
+    def __init__(self):
+        self.start_time = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self.resolvers = []
+        self.batches = []
+        self.statements = []
+
+    def offset(self, t):
+        """
+        Get the time since the start of the trace.
+
+        Parameters
+        ----------
+        t : float
+            A time, as returned by `time.perf_counter`.
+
+        Returns
+        -------
+        int :
+            The time since the start of the trace, in nanoseconds.
+
+        """
+
+        return _nanoseconds(t - self._start)
+
+    def as_dict(self):
+        """
+        Get the trace as a dictionary, which can be included in the extensions of a
+        GraphQL response.
+
+        Returns
+        -------
+        dict :
+            The trace.
+
+        """
+
+        end_time = datetime.now(timezone.utc)
+        return {
+            "version": 1,
+            "startTime": self.start_time.isoformat(),
+            "endTime": end_time.isoformat(),
+            "duration": self.offset(time.perf_counter()),
+            "execution": {"resolvers": list(self.resolvers)},
+            "batches": list(self.batches),
+            "statements": list(self.statements),
+        }
+
+
+class Tracer:
+    """
+    Timing instrumentation for resolvers, data loader batches and SQL statements.
+
+    The timings are always recorded as histograms, which are exposed on the
+    /metrics endpoint. Only resolvers returning objects (or lists of objects) are
+    included, as resolving a scalar field is just an attribute lookup.
+
+    If the GRAPHQL_TRACING setting is true, a client may request a trace of all
+    timings for a request by including the header `X-GraphQL-Tracing: true`. The
+    trace (see :class:`Trace`) is then returned as `extensions.tracing` in the
+    GraphQL response. As the trace includes the SQL statements, this setting should
+    not be enabled in production.
+
+    """
+
+    def __init__(self):
+        self.tracing_enabled = False
+
+    def init_app(self, app):
+        """
+        Configure tracing from the configuration of a Flask app.
+
+        Parameters
+        ----------
+        app : Flask
+            The Flask app.
+
+        """
+
+        self.tracing_enabled = app.config.get("GRAPHQL_TRACING", False)
+        add_statement_listener(_record_statement)
+
+    def tracing_requested(self):
+        """Whether the current request asks for a trace."""
+
+        return (
+            self.tracing_enabled
+            and request.headers.get("X-GraphQL-Tracing", "").lower() == "true"
+        )
+
+    @staticmethod
+    def start_trace():
+        """
+        Start a trace for the current request.
+
+        Returns
+        -------
+        Trace :
+            The trace.
+
+        """
+
+        g.trace = Trace()
+        return g.trace
+
+
+def current_trace():
+    """
+    Get the trace of the current request, if there is one.
+
+    In threads without the request's app context the trace set with
+    :func:`use_trace` is returned.
+
+    Returns
+    -------
+    Trace or None :
+        The trace.
+
+    """
+
+    if has_app_context():
+        trace = g.get("trace")
+        if trace is not None:
+            return trace
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def use_trace(trace):
+    """
+    Context manager for recording to a trace in a background thread.
+
+    Parameters
+    ----------
+    trace : Trace
+        The trace, as returned by :func:`current_trace` in the request's thread.
+
+    """
+
+    previous = getattr(_local, "trace", None)
+    _local.trace = trace
+    try:
+        yield
+    finally:
+        _local.trace = previous
+
+
+def current_loader():
+    """
+    Get the name of the data loader whose batch is being loaded in the current
+    thread, if any.
+
+    Returns
+    -------
+    str or None :
+        The name of the data loader, such as "proposal".
+
+    """
+
+    return getattr(_local, "loader", None)
+
+
+@contextmanager
+def use_loader(loader):
+    """
+    Context manager for marking the current thread as loading a data loader batch.
+
+    Parameters
+    ----------
+    loader : str
+        The name of the data loader, such as "proposal".
+
+    """
+
+    previous = getattr(_local, "loader", None)
+    _local.loader = loader
+    try:
+        yield
+    finally:
+        _local.loader = previous
+
+
+def timed_batch(loader, fetch):
+    """
+    Wrap a data loader's fetch function so that its batches are timed.
+
+    The returned function may be run in any thread.
+
+    Parameters
+    ----------
+    loader : str
+        The name of the data loader, such as "proposal".
+    fetch : function
+        The fetch function, which accepts a list of keys.
+
+    Returns
+    -------
+    function :
+        The wrapped fetch function.
+
+    """
+
+    trace = current_trace()
+
+    def timed_fetch(keys):
+        start = time.perf_counter()
+        try:
+            with use_trace(trace), use_loader(loader):
+                return fetch(keys)
+        finally:
+            duration = time.perf_counter() - start
+            _batch_seconds.observe(duration, loader=loader)
+            _batch_size.observe(len(keys), loader=loader)
+            if trace is not None:
+                trace.batches.append(
+                    dict(
+                        loader=loader,
+                        size=len(keys),
+                        startOffset=trace.offset(start),
+                        duration=_nanoseconds(duration),
+                    )
+                )
+
+    return timed_fetch
+
+
+class TracingMiddleware:
+    """
+    Graphene middleware for timing resolvers.
+
+    See :class:`Tracer`.
+
+    """
+
+    def resolve(self, next, root, info, **args):
+        trace = g.get("trace")
+        is_leaf = is_leaf_type(get_named_type(info.return_type))
+        if is_leaf and trace is None:
+            return next(root, info, **args)
+
+        start = time.perf_counter()
+
+        def record(value):
+            duration = time.perf_counter() - start
+            if not is_leaf:
+                _resolver_seconds.observe(
+                    duration,
+                    field="{type}.{field}".format(
+                        type=info.parent_type.name, field=info.field_name
+                    ),
+                )
+            if trace is not None:
+                trace.resolvers.append(
+                    dict(
+                        path=list(info.path),
+                        parentType=str(info.parent_type),
+                        fieldName=info.field_name,
+                        returnType=str(info.return_type),
+                        startOffset=trace.offset(start),
+                        duration=_nanoseconds(duration),
+                    )
+                )
+            return value
+
+        def record_error(e):
+            record(None)
+            raise e
+
+        return next(root, info, **args).then(record, record_error)
+
+
+# functions called after every SQL statement, and whether the engine events for
+# timing the statements are listened to
+_statement_listeners = []
+_listening = False
+_listeners_lock = threading.Lock()
+
+
+def add_statement_listener(listener):
+    """
+    Register a function to be called after every SQL statement executed by any
+    database engine.
+
+    All listeners share the same timing of the statements. The listener is passed
+    the statement, its start time (as returned by `time.perf_counter`), its duration
+    in seconds and the number of rows returned or affected (or -1 if unknown). A
+    listener is only registered once.
+
+    Parameters
+    ----------
+    listener : function
+        The listener.
+
+    """
+
+    global _listening
+    with _listeners_lock:
+        if listener not in _statement_listeners:
+            _statement_listeners.append(listener)
+        if not _listening:
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+            event.listen(Engine, "handle_error", _handle_error)
+            _listening = True
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("statement_start_times", []).append(
+        (context, time.perf_counter())
+    )
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get("statement_start_times")
+    if not start_times:
+        return
+    _, start = start_times.pop()
+    duration = time.perf_counter() - start
+    for listener in _statement_listeners:
+        listener(statement, start, duration, cursor.rowcount)
+
+
+def _handle_error(exception_context):
+    # The start time of a failed statement must be removed, as the list of start
+    # times is kept with the pooled DBAPI connection.
+    connection = exception_context.connection
+    context = exception_context.execution_context
+    if (
+        connection is None
+        or context is None
+        or connection.closed
+        or connection.invalidated
+    ):
+        return
+    start_times = connection.info.get("statement_start_times")
+    if start_times:
+        start_times[:] = [
+            (statement_context, start)
+            for statement_context, start in start_times
+            if statement_context is not context
+        ]
+
+
+def _record_statement(statement, start, duration, rows):
+    words = statement.split(None, 1)
+    operation = words[0].upper() if words else ""
+    _statement_seconds.observe(duration, operation=operation)
+
+    trace = current_trace()
+    if trace is not None:
+        trace.statements.append(
+            dict(
+                statement=statement,
+                startOffset=trace.offset(start),
+                duration=_nanoseconds(duration),
+            )
+        )
+
+
+tracer = Tracer()
@@ -273,3 +273,42 @@ class ObservingWindowType(Enum):
         if self == ObservingWindowType.STRICT_EXTENDED:
             return "A strict and extended observing window. The Moon has the requested brightness in part of the " \
                    "window, but is brighter in another part. "
+
+
+# observation time grouping
+
+class ObservationTimeGrouping(Enum):
+    NIGHT = "Night"
+    PARTNER = "Partner"
+
+    @property
+    def description(self):
+        if self == ObservationTimeGrouping.NIGHT:
+            return "Group the observation times by night."
+        if self == ObservationTimeGrouping.PARTNER:
+            return "Group the observation times by the partner of the Principal " \
+                   "Investigator."
+
+        return "This is an undocumented grouping."
+
+
+# submission status
+
+class SubmissionStatus(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    @property
+    def description(self):
+        if self == SubmissionStatus.QUEUED:
+            return "The submission is waiting to be processed."
+        if self == SubmissionStatus.RUNNING:
+            return "The submission is being processed."
+        if self == SubmissionStatus.SUCCEEDED:
+            return "The submission has been processed successfully."
+        if self == SubmissionStatus.FAILED:
+            return "The submission has failed."
+
+        return "This is an undocumented submission status."
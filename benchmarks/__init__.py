@@ -0,0 +1,24 @@
+"""
+Benchmarks for the SALT API Server.
+
+The benchmarks are run as modules from the root directory of the repository, for
+example:
+
+.. code-block:: bash
+
+   python -m benchmarks.fetch_rows
+
+Importing the app requires the environment variables read by `config.py`. Dummy
+values are used for those which are not defined, as the benchmarks don't need them.
+
+"""
+
+import os
+import tempfile
+
+for _name in ["JWT_SECRET_KEY", "DEV_DATABASE_URI", "TEST_DATABASE_URI"]:
+    os.environ.setdefault(_name, "benchmark")
+os.environ.setdefault("DATABASE_URI", "benchmark")
+os.environ.setdefault(
+    "LOG_FILE_PATH", os.path.join(tempfile.gettempdir(), "salt-api-benchmark.log")
+)
@@ -0,0 +1,156 @@
+"""
+Compare the throughput and latency of the GraphQL execution modes.
+
+A query resolving proposals with their investigators and blocks is run by a number
+of concurrent clients, once with the "sync" and once with the "threaded" execution
+mode (see the GRAPHQL_EXECUTION_MODE setting). The database is simulated by data
+loaders which sleep for a fixed latency, so that no database is needed. With the
+threaded mode the investigator and block batches are loaded concurrently.
+
+"""
+
+import argparse
+import threading
+import time
+import graphene
+from flask import Flask
+from flask_graphql import GraphQLView
+from promise.dataloader import DataLoader
+from app.dataloader.fetch import load_batch
+from app.graphql.executor import request_executor
+
+QUERY = """
+{
+    proposals {
+        code
+        investigators { name }
+        blocks { name }
+    }
+}
+"""
+
+
+class SleepingLoader(DataLoader):
+    latency = 0
+
+    def batch_load_fn(self, keys):
+        return load_batch("sleeping", self.fetch, keys)
+
+    def fetch(self, keys):
+        time.sleep(self.latency)
+        return ["{}".format(key) for key in keys]
+
+
+class Investigator(graphene.ObjectType):
+    name = graphene.String()
+
+
+class Block(graphene.ObjectType):
+    name = graphene.String()
+
+
+class Proposal(graphene.ObjectType):
+    code = graphene.String()
+    investigators = graphene.List(Investigator)
+    blocks = graphene.List(Block)
+
+    def resolve_investigators(self, info):
+        return info.context["investigators"].load(self.code).then(
+            lambda name: [Investigator(name=name)]
+        )
+
+    def resolve_blocks(self, info):
+        return info.context["blocks"].load(self.code).then(
+            lambda name: [Block(name=name)]
+        )
+
+
+class Query(graphene.ObjectType):
+    proposals = graphene.List(Proposal)
+
+    def resolve_proposals(self, info):
+        codes = ["2019-1-SCI-{:03d}".format(i) for i in range(20)]
+        return info.context["proposals"].load_many(codes).then(
+            lambda codes: [Proposal(code=code) for code in codes]
+        )
+
+
+class BenchmarkView(GraphQLView):
+    def get_context(self):
+        return dict(
+            proposals=SleepingLoader(),
+            investigators=SleepingLoader(),
+            blocks=SleepingLoader(),
+        )
+
+    def get_executor(self):
+        return request_executor()
+
+
+def create_app(mode, threads):
+    app = Flask(__name__)
+    app.config["GRAPHQL_EXECUTION_MODE"] = mode
+    app.config["GRAPHQL_LOADER_THREADS"] = threads
+    app.add_url_rule(
+        "/graphql",
+        view_func=BenchmarkView.as_view(
+            "graphql", schema=graphene.Schema(query=Query)
+        ),
+    )
+    return app
+
+
+def run(app, clients, requests_per_client):
+    latencies = []
+    lock = threading.Lock()
+
+    def client():
+        test_client = app.test_client()
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            response = test_client.post("/graphql", json=dict(query=QUERY))
+            elapsed = time.perf_counter() - start
+            assert response.status_code == 200, response.get_data(as_text=True)
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = time.perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+    return len(latencies) / total, p99
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=25, help="requests per client")
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=5,
+        help="simulated database latency per batch, in milliseconds",
+    )
+    parser.add_argument("--threads", type=int, default=4, help="loader threads")
+    args = parser.parse_args()
+
+    SleepingLoader.latency = args.latency / 1000
+    print("{:>10} {:>12} {:>12}".format("mode", "requests/s", "p99"))
+    for mode in ["sync", "threaded"]:
+        app = create_app(mode, args.threads)
+        throughput, p99 = run(app, args.clients, args.requests)
+        print(
+            "{:>10} {:>12.1f} {:>12}".format(
+                mode, throughput, "{:.1f} ms".format(1000 * p99)
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
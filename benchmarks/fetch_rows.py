@@ -0,0 +1,105 @@
+"""
+Compare turning SQL rows into named tuples with pandas and with
+:func:`app.dataloader.fetch.fetch_rows`.
+
+The rows are read from an in-memory SQLite database, so that the benchmark measures
+the row handling rather than the database.
+
+"""
+
+import argparse
+import datetime
+import timeit
+from collections import namedtuple
+import pandas as pd
+from sqlalchemy import create_engine
+from app.dataloader.fetch import fetch_rows
+
+ObservationContent = namedtuple(
+    "ObservationContent", ["block", "night", "status", "rejection_reason"]
+)
+
+SQL = """
+SELECT BlockVisit_Id, Block_Id, Date, BlockVisitStatus, RejectedReason
+       FROM BlockVisit
+"""
+
+
+def create_database(row_count):
+    engine = create_engine("sqlite://")
+    engine.execute(
+        """
+CREATE TABLE BlockVisit (
+       BlockVisit_Id INTEGER PRIMARY KEY,
+       Block_Id INTEGER,
+       Date DATE,
+       BlockVisitStatus VARCHAR(20),
+       RejectedReason VARCHAR(100)
+)
+"""
+    )
+    night = datetime.date(2019, 1, 1)
+    engine.execute(
+        "INSERT INTO BlockVisit VALUES (?, ?, ?, ?, ?)",
+        [
+            (
+                i,
+                i // 10,
+                night + datetime.timedelta(days=i % 365),
+                "Accepted" if i % 3 else "Rejected",
+                None if i % 3 else "Poor seeing",
+            )
+            for i in range(row_count)
+        ],
+    )
+    return engine
+
+
+def with_pandas(engine):
+    df = pd.read_sql(SQL, con=engine)
+    values = dict()
+    for _, row in df.iterrows():
+        values[row["BlockVisit_Id"]] = ObservationContent(
+            block=int(row["Block_Id"]),
+            night=row["Date"],
+            status=row["BlockVisitStatus"],
+            rejection_reason=row["RejectedReason"],
+        )
+    return values
+
+
+def with_fetch_rows(engine):
+    values = dict()
+    with engine.connect() as connection:
+        for row in fetch_rows(SQL, con=connection):
+            values[row.BlockVisit_Id] = ObservationContent(
+                block=row.Block_Id,
+                night=row.Date,
+                status=row.BlockVisitStatus,
+                rejection_reason=row.RejectedReason,
+            )
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10000, help="number of rows")
+    parser.add_argument("--repeat", type=int, default=5, help="number of runs")
+    args = parser.parse_args()
+
+    engine = create_database(args.rows)
+    paths = [("pandas + iterrows", with_pandas), ("fetch_rows", with_fetch_rows)]
+    for name, fn in paths:
+        times = timeit.repeat(lambda: fn(engine), number=1, repeat=args.repeat)
+        print(
+            "{name:20} best {best:8.1f} ms, mean {mean:8.1f} ms ({rows} rows)".format(
+                name=name,
+                best=1000 * min(times),
+                mean=1000 * sum(times) / len(times),
+                rows=args.rows,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,648 @@
+"""
+A local fixture database with a synthetic version of the SALT schema.
+
+Only the tables and columns used by the server are created, and they are filled
+with random (but reproducible) data whose size is set by the number of proposals.
+The database may be SQLite or MySQL. For SQLite the MySQL functions used by the
+server's queries (UNIX_TIMESTAMP, NOW and MD5) are added to every connection, and
+dates and datetimes are parsed when they are read (see :func:`sqlite_url`).
+
+The database can be created from the command line:
+
+.. code-block:: bash
+
+   python -m benchmarks.fixture_db sqlite:////tmp/salt.db --proposals 500
+
+"""
+
+import argparse
+import calendar
+import hashlib
+import random
+import sqlite3
+from datetime import date, datetime, timedelta
+from sqlalchemy import (
+    Column,
+    Date,
+    DateTime,
+    Float,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    create_engine,
+    event,
+)
+from sqlalchemy.engine import Engine
+
+metadata = MetaData()
+
+
+def _id(name):
+    return Column(name, Integer, primary_key=True, autoincrement=False)
+
+
+def _ref(name):
+    return Column(name, Integer, index=True)
+
+
+def _lookup_table(name):
+    return Table(name, metadata, _id(name + "_Id"), Column(name, String(100)))
+
+
+Semester = Table(
+    "Semester",
+    metadata,
+    _id("Semester_Id"),
+    Column("Year", Integer),
+    Column("Semester", Integer),
+    Column("StartSemester", DateTime),
+    Column("EndSemester", DateTime),
+)
+Partner = Table(
+    "Partner", metadata, _id("Partner_Id"), Column("Partner_Code", String(10))
+)
+Institute = Table("Institute", metadata, _id("Institute_Id"), _ref("Partner_Id"))
+PiptUser = Table(
+    "PiptUser",
+    metadata,
+    _id("PiptUser_Id"),
+    Column("Username", String(50)),
+    Column("Password", String(32)),
+)
+PiptUserTAC = Table("PiptUserTAC", metadata, _ref("PiptUser_Id"), _ref("Partner_Id"))
+Investigator = Table(
+    "Investigator",
+    metadata,
+    _id("Investigator_Id"),
+    Column("FirstName", String(50)),
+    Column("Surname", String(50)),
+    Column("Email", String(100)),
+    _ref("Institute_Id"),
+    _ref("PiptUser_Id"),
+)
+ProposalCode = Table(
+    "ProposalCode",
+    metadata,
+    _id("ProposalCode_Id"),
+    Column("Proposal_Code", String(20), unique=True),
+)
+Proposal = Table(
+    "Proposal",
+    metadata,
+    _id("Proposal_Id"),
+    _ref("ProposalCode_Id"),
+    _ref("Semester_Id"),
+    Column("Current", Integer),
+)
+ProposalText = Table(
+    "ProposalText",
+    metadata,
+    _ref("ProposalCode_Id"),
+    _ref("Semester_Id"),
+    Column("Title", String(255)),
+    Column("CompletionComment", Text),
+)
+ProposalStatus = Table(
+    "ProposalStatus",
+    metadata,
+    _id("ProposalStatus_Id"),
+    Column("Status", String(50)),
+)
+ProposalType = _lookup_table("ProposalType")
+ProposalInactiveReason = Table(
+    "ProposalInactiveReason",
+    metadata,
+    _id("ProposalInactiveReason_Id"),
+    Column("InactiveReason", String(100)),
+)
+ProposalGeneralInfo = Table(
+    "ProposalGeneralInfo",
+    metadata,
+    _ref("ProposalCode_Id"),
+    _ref("ProposalStatus_Id"),
+    _ref("ProposalType_Id"),
+    _ref("ProposalInactiveReason_Id"),
+    Column("StatusComment", Text),
+)
+ProposalContact = Table(
+    "ProposalContact",
+    metadata,
+    _ref("ProposalCode_Id"),
+    _ref("Leader_Id"),
+    _ref("Contact_Id"),
+    _ref("Astronomer_Id"),
+)
+ProposalInvestigator = Table(
+    "ProposalInvestigator", metadata, _ref("ProposalCode_Id"), _ref("Investigator_Id")
+)
+P1ObservingConditions = Table(
+    "P1ObservingConditions", metadata, _ref("ProposalCode_Id")
+)
+MultiPartner = Table(
+    "MultiPartner",
+    metadata,
+    _id("MultiPartner_Id"),
+    _ref("ProposalCode_Id"),
+    _ref("Partner_Id"),
+    _ref("Semester_Id"),
+)
+PriorityAlloc = Table(
+    "PriorityAlloc",
+    metadata,
+    _ref("MultiPartner_Id"),
+    Column("Priority", Integer),
+    Column("TimeAlloc", Integer),
+)
+PartnerShareTimeDist = Table(
+    "PartnerShareTimeDist",
+    metadata,
+    _ref("Semester_Id"),
+    _ref("Partner_Id"),
+    Column("SharePercent", Float),
+)
+BlockCode = Table(
+    "BlockCode", metadata, _id("BlockCode_Id"), Column("BlockCode", String(50))
+)
+BlockStatus = _lookup_table("BlockStatus")
+Block = Table(
+    "Block",
+    metadata,
+    _id("Block_Id"),
+    _ref("BlockCode_Id"),
+    _ref("BlockStatus_Id"),
+    Column("BlockStatusReason", String(255)),
+    _ref("ProposalCode_Id"),
+    _ref("Proposal_Id"),
+    Column("Block_Name", String(100)),
+    Column("ObsTime", Integer),
+    Column("Priority", Integer),
+)
+NightInfo = Table(
+    "NightInfo",
+    metadata,
+    _id("NightInfo_Id"),
+    Column("Date", Date, index=True),
+    Column("ScienceTime", Integer),
+    Column("EngineeringTime", Integer),
+    Column("TimeLostToWeather", Integer),
+    Column("TimeLostToProblems", Integer),
+    Column("IdleTime", Integer),
+)
+BlockVisitStatus = _lookup_table("BlockVisitStatus")
+BlockRejectedReason = Table(
+    "BlockRejectedReason",
+    metadata,
+    _id("BlockRejectedReason_Id"),
+    Column("RejectedReason", String(100)),
+)
+BlockVisit = Table(
+    "BlockVisit",
+    metadata,
+    _id("BlockVisit_Id"),
+    _ref("Block_Id"),
+    _ref("NightInfo_Id"),
+    _ref("BlockVisitStatus_Id"),
+    _ref("BlockRejectedReason_Id"),
+)
+FileData = Table(
+    "FileData",
+    metadata,
+    _id("FileData_Id"),
+    _ref("BlockVisit_Id"),
+    Column("UTStart", DateTime),
+)
+BlockVisibilityWindowType = _lookup_table("BlockVisibilityWindowType")
+BlockVisibilityWindow = Table(
+    "BlockVisibilityWindow",
+    metadata,
+    _id("BlockVisibilityWindow_Id"),
+    _ref("Block_Id"),
+    Column("VisibilityStart", DateTime),
+    Column("VisibilityEnd", DateTime),
+    _ref("BlockVisibilityWindowType_Id"),
+)
+
+PARTNERS = ["AMNH", "DC", "DUR", "IUCAA", "POL", "RSA", "RU", "UKSC", "UNC", "UW"]
+PROPOSAL_STATUSES = ["Active", "Completed", "Expired", "Inactive", "Accepted"]
+PROPOSAL_TYPES = ["Science", "Science - Long Term", "Key Science Program"]
+INACTIVE_REASONS = ["Other", "Undoable", "Waiting for feedback"]
+BLOCK_STATUSES = ["Active", "Completed", "On Hold", "Expired", "Deleted"]
+VISIT_STATUSES = ["Accepted", "Rejected", "In queue", "Deleted"]
+REJECTED_REASONS = ["Weather", "Technical problems", "Observing conditions"]
+WINDOW_TYPES = ["Strict", "Extended", "Strict+Extended"]
+
+# the semesters in the database, the last of which is the current one
+SEMESTERS = [(2019, 1), (2019, 2), (2020, 1), (2020, 2)]
+
+# the password of every user in the database
+PASSWORD = "secret"
+
+
+def _parse_datetime(value):
+    for fmt in ("%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    raise ValueError("Invalid datetime: {}".format(value))
+
+
+def _sqlite_datetime(value):
+    return _parse_datetime(value.decode("ascii"))
+
+
+def _unix_timestamp(value):
+    if value is None:
+        return None
+    return calendar.timegm(_parse_datetime(value).timetuple())
+
+
+def _md5(value):
+    return hashlib.md5(str(value).encode("utf-8")).hexdigest()
+
+
+def _now():
+    return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+
+
+sqlite3.register_converter("DATETIME", _sqlite_datetime)
+
+
+@event.listens_for(Engine, "connect")
+def _add_sqlite_functions(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function("UNIX_TIMESTAMP", 1, _unix_timestamp)
+        dbapi_connection.create_function("MD5", 1, _md5)
+        dbapi_connection.create_function("NOW", 0, _now)
+
+
+def sqlite_url(path):
+    """
+    Get the database URL for an SQLite database file.
+
+    The URL makes SQLite parse the values of DATE and DATETIME columns, and it
+    allows the connections to be used by more than one thread.
+
+    Parameters
+    ----------
+    path : str
+        The path of the database file.
+
+    Returns
+    -------
+    str :
+        The database URL.
+
+    """
+
+    return "sqlite:///{path}?detect_types={types}&check_same_thread=false".format(
+        path=path, types=sqlite3.PARSE_DECLTYPES
+    )
+
+
+def _insert(connection, table, rows, chunk_size=5000):
+    for i in range(0, len(rows), chunk_size):
+        connection.execute(table.insert(), rows[i : i + chunk_size])
+
+
+def _lookup_rows(table, values):
+    name = table.name if table.name in table.c else list(table.c)[1].name
+    return [{table.name + "_Id": i + 1, name: value} for i, value in enumerate(values)]
+
+
+def seed(
+    engine,
+    proposals=200,
+    blocks_per_proposal=10,
+    visits_per_block=5,
+    windows_per_block=20,
+    seed_value=42,
+):
+    """
+    Create the fixture tables and fill them with synthetic data.
+
+    Existing fixture tables are dropped first. All proposals belong to the
+    current (i.e. last) semester, and the number of nights is such that every
+    proposal has about visits_per_block * blocks_per_proposal observations.
+
+    Parameters
+    ----------
+    engine : Engine
+        The database engine.
+    proposals : int
+        The number of proposals.
+    blocks_per_proposal : int
+        The number of blocks per proposal.
+    visits_per_block : int
+        The number of observations (block visits) per block.
+    windows_per_block : int
+        The number of observing windows per block.
+    seed_value : int
+        The seed for the random number generator.
+
+    """
+
+    rng = random.Random(seed_value)
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+
+    with engine.begin() as connection:
+        _insert(
+            connection, ProposalStatus, _lookup_rows(ProposalStatus, PROPOSAL_STATUSES)
+        )
+        _insert(connection, ProposalType, _lookup_rows(ProposalType, PROPOSAL_TYPES))
+        _insert(
+            connection,
+            ProposalInactiveReason,
+            _lookup_rows(ProposalInactiveReason, INACTIVE_REASONS),
+        )
+        _insert(connection, BlockStatus, _lookup_rows(BlockStatus, BLOCK_STATUSES))
+        _insert(
+            connection, BlockVisitStatus, _lookup_rows(BlockVisitStatus, VISIT_STATUSES)
+        )
+        _insert(
+            connection,
+            BlockRejectedReason,
+            _lookup_rows(BlockRejectedReason, REJECTED_REASONS),
+        )
+        _insert(
+            connection,
+            BlockVisibilityWindowType,
+            _lookup_rows(BlockVisibilityWindowType, WINDOW_TYPES),
+        )
+
+        semesters = []
+        for i, (year, semester) in enumerate(SEMESTERS):
+            start = datetime(year, 5 if semester == 1 else 11, 1, 12)
+            end = datetime(
+                year if semester == 1 else year + 1, 10 if semester == 1 else 4, 30, 12
+            )
+            semesters.append(
+                dict(
+                    Semester_Id=i + 1,
+                    Year=year,
+                    Semester=semester,
+                    StartSemester=start,
+                    EndSemester=end,
+                )
+            )
+        _insert(connection, Semester, semesters)
+        current_semester = semesters[-1]
+
+        _insert(
+            connection,
+            Partner,
+            [
+                dict(Partner_Id=i + 1, Partner_Code=code)
+                for i, code in enumerate(PARTNERS)
+            ],
+        )
+        _insert(
+            connection,
+            Institute,
+            [dict(Institute_Id=i + 1, Partner_Id=i + 1) for i in range(len(PARTNERS))],
+        )
+        _insert(
+            connection,
+            PartnerShareTimeDist,
+            [
+                dict(
+                    Semester_Id=semester["Semester_Id"],
+                    Partner_Id=i + 1,
+                    SharePercent=100 / len(PARTNERS),
+                )
+                for semester in semesters
+                for i in range(len(PARTNERS))
+            ],
+        )
+
+        # investigators (and users); user 1 is a TAC member for the first partner
+        investigator_count = max(10, proposals // 2)
+        _insert(
+            connection,
+            PiptUser,
+            [
+                dict(
+                    PiptUser_Id=i + 1,
+                    Username="user{}".format(i + 1),
+                    Password=_md5(PASSWORD),
+                )
+                for i in range(investigator_count)
+            ],
+        )
+        _insert(connection, PiptUserTAC, [dict(PiptUser_Id=1, Partner_Id=1)])
+        _insert(
+            connection,
+            Investigator,
+            [
+                dict(
+                    Investigator_Id=i + 1,
+                    FirstName="Given{}".format(i + 1),
+                    Surname="Family{}".format(i + 1),
+                    Email="user{}@example.org".format(i + 1),
+                    Institute_Id=rng.randint(1, len(PARTNERS)),
+                    PiptUser_Id=i + 1,
+                )
+                for i in range(investigator_count)
+            ],
+        )
+
+        # nights of the current semester
+        first_night = current_semester["StartSemester"].date()
+        night_count = (current_semester["EndSemester"].date() - first_night).days
+        _insert(
+            connection,
+            NightInfo,
+            [
+                dict(
+                    NightInfo_Id=i + 1,
+                    Date=first_night + timedelta(days=i),
+                    ScienceTime=rng.randint(10000, 30000),
+                    EngineeringTime=rng.randint(0, 3600),
+                    TimeLostToWeather=rng.randint(0, 20000),
+                    TimeLostToProblems=rng.randint(0, 3600),
+                    IdleTime=rng.randint(0, 3600),
+                )
+                for i in range(night_count)
+            ],
+        )
+
+        # proposals
+        rows = {
+            table: []
+            for table in [
+                ProposalCode,
+                Proposal,
+                ProposalText,
+                ProposalGeneralInfo,
+                ProposalContact,
+                ProposalInvestigator,
+                P1ObservingConditions,
+                MultiPartner,
+                PriorityAlloc,
+                BlockCode,
+                Block,
+                BlockVisit,
+                FileData,
+                BlockVisibilityWindow,
+            ]
+        }
+        block_id = visit_id = window_id = 0
+        today = datetime.combine(date.today(), datetime.min.time())
+        for p in range(1, proposals + 1):
+            code = "{year}-{semester}-SCI-{number:03d}".format(
+                year=current_semester["Year"],
+                semester=current_semester["Semester"],
+                number=p,
+            )
+            investigators = rng.sample(range(1, investigator_count + 1), 3)
+            rows[ProposalCode].append(dict(ProposalCode_Id=p, Proposal_Code=code))
+            rows[Proposal].append(
+                dict(
+                    Proposal_Id=p,
+                    ProposalCode_Id=p,
+                    Semester_Id=current_semester["Semester_Id"],
+                    Current=1,
+                )
+            )
+            rows[ProposalText].append(
+                dict(
+                    ProposalCode_Id=p,
+                    Semester_Id=current_semester["Semester_Id"],
+                    Title="Synthetic proposal {}".format(p),
+                    CompletionComment="Comment for proposal {}".format(p),
+                )
+            )
+            rows[ProposalGeneralInfo].append(
+                dict(
+                    ProposalCode_Id=p,
+                    ProposalStatus_Id=rng.randint(1, len(PROPOSAL_STATUSES)),
+                    ProposalType_Id=rng.randint(1, len(PROPOSAL_TYPES)),
+                    ProposalInactiveReason_Id=None,
+                    StatusComment=None,
+                )
+            )
+            rows[ProposalContact].append(
+                dict(
+                    ProposalCode_Id=p,
+                    Leader_Id=investigators[0],
+                    Contact_Id=investigators[1],
+                    Astronomer_Id=investigators[2],
+                )
+            )
+            rows[ProposalInvestigator].extend(
+                dict(ProposalCode_Id=p, Investigator_Id=i) for i in investigators
+            )
+            rows[P1ObservingConditions].append(dict(ProposalCode_Id=p))
+            rows[MultiPartner].append(
+                dict(
+                    MultiPartner_Id=p,
+                    ProposalCode_Id=p,
+                    Partner_Id=rng.randint(1, len(PARTNERS)),
+                    Semester_Id=current_semester["Semester_Id"],
+                )
+            )
+            rows[PriorityAlloc].extend(
+                dict(
+                    MultiPartner_Id=p,
+                    Priority=priority,
+                    TimeAlloc=rng.randint(0, 36000),
+                )
+                for priority in range(4)
+            )
+
+            for b in range(blocks_per_proposal):
+                block_id += 1
+                rows[BlockCode].append(
+                    dict(BlockCode_Id=block_id, BlockCode="block-{}".format(block_id))
+                )
+                rows[Block].append(
+                    dict(
+                        Block_Id=block_id,
+                        BlockCode_Id=block_id,
+                        BlockStatus_Id=rng.randint(1, len(BLOCK_STATUSES)),
+                        BlockStatusReason=None,
+                        ProposalCode_Id=p,
+                        Proposal_Id=p,
+                        Block_Name="Block {}".format(b + 1),
+                        ObsTime=rng.randint(600, 7200),
+                        Priority=rng.randint(0, 4),
+                    )
+                )
+                for _ in range(visits_per_block):
+                    visit_id += 1
+                    status = rng.randint(1, len(VISIT_STATUSES))
+                    night = rng.randint(1, night_count)
+                    rows[BlockVisit].append(
+                        dict(
+                            BlockVisit_Id=visit_id,
+                            Block_Id=block_id,
+                            NightInfo_Id=night,
+                            BlockVisitStatus_Id=status,
+                            BlockRejectedReason_Id=(
+                                rng.randint(1, len(REJECTED_REASONS))
+                                if status == 2
+                                else None
+                            ),
+                        )
+                    )
+                    rows[FileData].append(
+                        dict(
+                            FileData_Id=visit_id,
+                            BlockVisit_Id=visit_id,
+                            UTStart=datetime.combine(
+                                first_night + timedelta(days=night - 1),
+                                datetime.min.time(),
+                            )
+                            + timedelta(hours=20),
+                        )
+                    )
+                for w in range(windows_per_block):
+                    window_id += 1
+                    start = today + timedelta(
+                        days=w - windows_per_block // 2, hours=rng.randint(17, 23)
+                    )
+                    rows[BlockVisibilityWindow].append(
+                        dict(
+                            BlockVisibilityWindow_Id=window_id,
+                            Block_Id=block_id,
+                            VisibilityStart=start,
+                            VisibilityEnd=start
+                            + timedelta(minutes=rng.randint(30, 240)),
+                            BlockVisibilityWindowType_Id=rng.randint(
+                                1, len(WINDOW_TYPES)
+                            ),
+                        )
+                    )
+
+        for table, table_rows in rows.items():
+            _insert(connection, table, table_rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Create a fixture database with synthetic SALT data."
+    )
+    parser.add_argument("url", help="database URL or path of an SQLite file")
+    parser.add_argument(
+        "--proposals", type=int, default=200, help="number of proposals"
+    )
+    parser.add_argument("--blocks", type=int, default=10, help="blocks per proposal")
+    parser.add_argument("--visits", type=int, default=5, help="observations per block")
+    parser.add_argument("--windows", type=int, default=20, help="windows per block")
+    args = parser.parse_args()
+
+    url = args.url if "://" in args.url else sqlite_url(args.url)
+    seed(
+        create_engine(url),
+        proposals=args.proposals,
+        blocks_per_proposal=args.blocks,
+        visits_per_block=args.visits,
+        windows_per_block=args.windows,
+    )
+
+
+if __name__ == "__main__":
+    main()
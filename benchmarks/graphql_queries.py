@@ -0,0 +1,345 @@
+"""
+Measure the throughput and latency of representative GraphQL queries.
+
+A fixture database with synthetic SALT data (see :mod:`benchmarks.fixture_db`) is
+created, and every query is run repeatedly through the Flask test client by a
+number of concurrent clients, with the app in test mode. The throughput and the
+latency percentiles are reported for every query.
+
+The results are saved as a JSON file (by default in benchmarks/results, named
+after the current git commit), and the results of a previous run can be passed
+with --compare to show the relative changes:
+
+.. code-block:: bash
+
+   python -m benchmarks.graphql_queries --proposals 500
+   git checkout other-branch
+   python -m benchmarks.graphql_queries --proposals 500 \\
+       --compare benchmarks/results/<commit>.json
+
+The requests are made as an administrator. As the user roles are maintained by the
+saltuser package, whose tables are not part of the fixture database, the
+administrator is put into the user cache rather than being loaded from the
+database.
+
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+QUERIES = dict(
+    proposals=dict(
+        query="""
+query Proposals($semester: Semester) {
+    proposals(semester: $semester) {
+        proposalCode
+        title
+        status
+        proposalType
+    }
+}
+""",
+        variables=dict(semester="2020-2"),
+    ),
+    proposals_page=dict(
+        query="""
+query ProposalsPage($first: Int) {
+    proposalsConnection(first: $first) {
+        edges {
+            node {
+                proposalCode
+                title
+                principalInvestigator { givenName familyName email }
+                timeAllocations { priority partnerCode amount }
+            }
+        }
+        pageInfo { hasNextPage endCursor }
+    }
+}
+""",
+        variables=dict(first=50),
+    ),
+    proposal=dict(
+        query="""
+query Proposal($proposalCode: String!) {
+    proposal(proposalCode: $proposalCode) {
+        proposalCode
+        title
+        status
+        principalInvestigator { givenName familyName email }
+        principalContact { givenName familyName email }
+        blocks {
+            id
+            name
+            status
+            length
+            visits { night status rejectionReason }
+            observingWindows(windowType: STRICT) {
+                pastWindows { visibilityStart visibilityEnd duration }
+                tonightsWindows { visibilityStart visibilityEnd duration }
+                futureWindows { visibilityStart visibilityEnd duration }
+            }
+        }
+        observations { night status block { name } }
+    }
+}
+""",
+        variables=dict(proposalCode="2020-2-SCI-001"),
+    ),
+    dashboard=dict(
+        query="""
+query Dashboard($semester: Semester!) {
+    partnerShareTimes(semester: $semester) { partnerCode sharePercent }
+    timeBreakdown(semester: $semester) {
+        science
+        engineering
+        lostToWeather
+        lostToProblems
+        idle
+    }
+    partnerStatObservations(semester: $semester) { observationTime status }
+}
+""",
+        variables=dict(semester="2020-2"),
+    ),
+)
+
+
+class BenchmarkAdministrator:
+    """An administrator, who may view and edit everything."""
+
+    def is_admin(self):
+        return True
+
+    def may_view_proposal(self, proposal_code):
+        return True
+
+    def may_edit_block(self, block_id):
+        return True
+
+
+def _git_commit():
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+            )
+            .decode("ascii")
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _percentile(values, percentile):
+    index = min(len(values) - 1, int(round(percentile / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def create_app(database_url, args):
+    # the test configuration reads the database URL when it is imported
+    os.environ["TEST_DATABASE_URI"] = database_url
+    from app import create_app as create_flask_app
+    from app.auth import encode, user_cache
+
+    app = create_flask_app("testing")
+    app.config.update(
+        DATABASE_QUERY_THREADS=args.threads,
+        GRAPHQL_EXECUTION_MODE=args.execution_mode,
+        USER_CACHE_MAX_SIZE=10,
+        USER_CACHE_TTL=None,
+    )
+    if database_url.startswith("sqlite"):
+        # SQLite does not use a connection pool with a size
+        app.config.update(
+            SQLALCHEMY_POOL_SIZE=None,
+            SQLALCHEMY_MAX_OVERFLOW=None,
+            SQLALCHEMY_POOL_TIMEOUT=None,
+            SQLALCHEMY_POOL_RECYCLE=None,
+        )
+    user_cache.init_app(app)
+
+    token = encode({"user_id": 1})
+    user_cache.set("user", (1, token), BenchmarkAdministrator())
+    return app, token
+
+
+def run_query(app, token, query, requests, clients):
+    headers = {"Authorization": "Token {token}".format(token=token)}
+    body = dict(query=query["query"], variables=query["variables"])
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def client(count):
+        test_client = app.test_client()
+        for _ in range(count):
+            start = time.perf_counter()
+            response = test_client.post("/graphql-api", json=body, headers=headers)
+            elapsed = time.perf_counter() - start
+            content = response.get_json()
+            with lock:
+                latencies.append(elapsed)
+                if response.status_code != 200 or "errors" in content:
+                    errors.append(content)
+
+    counts = [requests // clients + (i < requests % clients) for i in range(clients)]
+    threads = [threading.Thread(target=client, args=(count,)) for count in counts]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = time.perf_counter() - start
+
+    if errors:
+        raise Exception("The query failed: {}".format(errors[0]))
+    latencies.sort()
+    return dict(
+        requests=len(latencies),
+        throughput=len(latencies) / total,
+        mean=sum(latencies) / len(latencies),
+        p50=_percentile(latencies, 50),
+        p90=_percentile(latencies, 90),
+        p99=_percentile(latencies, 99),
+    )
+
+
+def _change(new, old):
+    if not old:
+        return ""
+    return "{:+.1f}%".format(100 * (new - old) / old)
+
+
+def print_results(results, previous=None):
+    previous = previous or {}
+    print(
+        "{:>16} {:>10} {:>10} {:>10} {:>10} {:>10}".format(
+            "query", "req/s", "mean", "p50", "p90", "p99"
+        )
+    )
+    for name, result in results.items():
+        print(
+            "{:>16} {:>10.1f} {:>10} {:>10} {:>10} {:>10}".format(
+                name,
+                result["throughput"],
+                *[
+                    "{:.1f} ms".format(1000 * result[key])
+                    for key in ("mean", "p50", "p90", "p99")
+                ]
+            )
+        )
+        if name in previous:
+            old = previous[name]
+            print(
+                "{:>16} {:>10} {:>10} {:>10} {:>10} {:>10}".format(
+                    "",
+                    _change(result["throughput"], old["throughput"]),
+                    *[
+                        _change(result[key], old[key])
+                        for key in ("mean", "p50", "p90", "p99")
+                    ]
+                )
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--database",
+        help="database URL or path of an SQLite file (by default a temporary SQLite "
+        "file)",
+    )
+    parser.add_argument(
+        "--no-seed",
+        action="store_true",
+        help="use the existing data in the database rather than creating it",
+    )
+    parser.add_argument("--proposals", type=int, default=200, help="proposals")
+    parser.add_argument("--blocks", type=int, default=10, help="blocks per proposal")
+    parser.add_argument("--visits", type=int, default=5, help="visits per block")
+    parser.add_argument("--windows", type=int, default=20, help="windows per block")
+    parser.add_argument(
+        "--queries", nargs="+", choices=sorted(QUERIES), help="queries to run"
+    )
+    parser.add_argument("--requests", type=int, default=50, help="requests per query")
+    parser.add_argument("--clients", type=int, default=4, help="concurrent clients")
+    parser.add_argument("--warmup", type=int, default=3, help="warmup requests")
+    parser.add_argument(
+        "--threads", type=int, default=0, help="DATABASE_QUERY_THREADS setting"
+    )
+    parser.add_argument(
+        "--execution-mode",
+        choices=["sync", "threaded"],
+        default="sync",
+        help="GRAPHQL_EXECUTION_MODE setting",
+    )
+    parser.add_argument("--output", help="file for the results")
+    parser.add_argument("--compare", help="results file of a previous run")
+    args = parser.parse_args()
+
+    from benchmarks.fixture_db import seed, sqlite_url
+    from sqlalchemy import create_engine
+
+    database = args.database or os.path.join(
+        tempfile.gettempdir(), "salt-api-benchmark.db"
+    )
+    database_url = database if "://" in database else sqlite_url(database)
+    if not args.no_seed:
+        start = time.perf_counter()
+        seed(
+            create_engine(database_url),
+            proposals=args.proposals,
+            blocks_per_proposal=args.blocks,
+            visits_per_block=args.visits,
+            windows_per_block=args.windows,
+        )
+        print("Seeded the database in {:.1f} s".format(time.perf_counter() - start))
+
+    app, token = create_app(database_url, args)
+    results = dict()
+    for name in args.queries or sorted(QUERIES):
+        run_query(app, token, QUERIES[name], args.warmup, 1)
+        results[name] = run_query(
+            app, token, QUERIES[name], args.requests, args.clients
+        )
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)["results"]
+    print_results(results, previous)
+
+    commit = _git_commit()
+    output = args.output or os.path.join(
+        os.path.dirname(__file__), "results", "{commit}.json".format(commit=commit)
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(
+            dict(
+                commit=commit,
+                created=datetime.utcnow().isoformat(),
+                settings={
+                    key: value
+                    for key, value in vars(args).items()
+                    if key not in ("output", "compare")
+                },
+                results=results,
+            ),
+            f,
+            indent=2,
+        )
+    print("Saved the results in {}".format(output))
+
+
+if __name__ == "__main__":
+    main()
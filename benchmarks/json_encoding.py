@@ -0,0 +1,180 @@
+"""
+Measure how fast large GraphQL responses are encoded as JSON and compressed.
+
+A synthetic response for a proposals query, with blocks, observations and
+observing windows, is encoded with every available JSON encoder (see
+:data:`app.graphql.encoding.JSON_ENCODERS`) and compressed with every available
+content encoding at a range of compression levels. The time taken and the
+resulting size are reported, so that the GRAPHQL_JSON_ENCODER,
+GRAPHQL_GZIP_LEVEL and GRAPHQL_BROTLI_QUALITY settings can be chosen.
+
+.. code-block:: bash
+
+   python -m benchmarks.json_encoding --proposals 2000
+
+"""
+
+import argparse
+import random
+import timeit
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from app.graphql.encoding import COMPRESSORS, JSON_ENCODERS
+
+# the compression levels to try for each content encoding
+LEVELS = dict(gzip=[1, 6, 9], br=[1, 5, 11])
+
+STATUSES = ["Accepted", "Rejected", "In queue"]
+
+
+def _window(start):
+    return OrderedDict(
+        [
+            ("visibilityStart", start.isoformat()),
+            ("visibilityEnd", (start + timedelta(hours=2)).isoformat()),
+            ("duration", 7200.0),
+        ]
+    )
+
+
+def _night(first_night, days):
+    return (first_night + timedelta(days=days)).date().isoformat()
+
+
+def create_response(proposal_count, blocks_per_proposal, rng):
+    """
+    Create a synthetic response for a proposals query.
+
+    Parameters
+    ----------
+    proposal_count : int
+        The number of proposals.
+    blocks_per_proposal : int
+        The number of blocks per proposal.
+    rng : random.Random
+        The random number generator.
+
+    Returns
+    -------
+    dict :
+        The response.
+
+    """
+
+    night = datetime(2020, 5, 1, 18)
+    proposals = []
+    for p in range(proposal_count):
+        blocks = []
+        for b in range(blocks_per_proposal):
+            blocks.append(
+                OrderedDict(
+                    [
+                        ("id", p * blocks_per_proposal + b),
+                        ("name", "Block {}".format(b)),
+                        ("status", "ACTIVE"),
+                        ("length", rng.randint(600, 7200)),
+                        (
+                            "visits",
+                            [
+                                OrderedDict(
+                                    [
+                                        ("night", _night(night, v)),
+                                        ("status", rng.choice(STATUSES)),
+                                        ("rejectionReason", None),
+                                    ]
+                                )
+                                for v in range(rng.randint(0, 5))
+                            ],
+                        ),
+                        (
+                            "observingWindows",
+                            OrderedDict(
+                                [
+                                    ("pastWindows", [_window(night)]),
+                                    ("tonightsWindows", []),
+                                    (
+                                        "futureWindows",
+                                        [
+                                            _window(night + timedelta(days=d))
+                                            for d in range(1, 6)
+                                        ],
+                                    ),
+                                ]
+                            ),
+                        ),
+                    ]
+                )
+            )
+        proposals.append(
+            OrderedDict(
+                [
+                    ("proposalCode", "2020-1-SCI-{:04d}".format(p)),
+                    ("title", "A study of object number {}".format(p)),
+                    ("status", "ACTIVE"),
+                    (
+                        "principalInvestigator",
+                        OrderedDict(
+                            [
+                                ("givenName", "Given{}".format(p)),
+                                ("familyName", "Family{}".format(p)),
+                                ("email", "pi{}@example.org".format(p)),
+                            ]
+                        ),
+                    ),
+                    ("blocks", blocks),
+                ]
+            )
+        )
+    return OrderedDict([("data", OrderedDict([("proposals", proposals)]))])
+
+
+def _milliseconds(f, repeat):
+    return 1000 * min(timeit.repeat(f, number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--proposals", type=int, default=1000, help="proposals")
+    parser.add_argument("--blocks", type=int, default=5, help="blocks per proposal")
+    parser.add_argument("--repeat", type=int, default=5, help="repetitions")
+    args = parser.parse_args()
+
+    response = create_response(args.proposals, args.blocks, random.Random(42))
+
+    print("{:>10} {:>12} {:>12}".format("encoder", "time", "size"))
+    body = None
+    for name, encode in sorted(JSON_ENCODERS.items()):
+        elapsed = _milliseconds(lambda: encode(response, False), args.repeat)
+        encoded = encode(response, False)
+        body = body or encoded
+        print(
+            "{:>10} {:>12} {:>12}".format(
+                name, "{:.1f} ms".format(elapsed), "{:,} B".format(len(encoded))
+            )
+        )
+
+    print()
+    print(
+        "{:>10} {:>6} {:>12} {:>12} {:>8}".format(
+            "encoding", "level", "time", "size", "ratio"
+        )
+    )
+    for encoding, (compress, _) in COMPRESSORS.items():
+        for level in LEVELS[encoding]:
+            elapsed = _milliseconds(lambda: compress(body, level), args.repeat)
+            compressed = compress(body, level)
+            print(
+                "{:>10} {:>6} {:>12} {:>12} {:>8}".format(
+                    encoding,
+                    level,
+                    "{:.1f} ms".format(elapsed),
+                    "{:,} B".format(len(compressed)),
+                    "{:.1%}".format(len(compressed) / len(body)),
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Measure how grouping observing windows scales with the number of blocks.
+
+The vectorised grouping of :class:`app.dataloader.ObservingWindowLoader` is compared
+with grouping by looping over all rows for every requested block, which the loader
+did originally.
+
+"""
+
+import argparse
+import time
+import timeit
+from collections import namedtuple
+from app.dataloader import ObservingWindowLoader
+
+Row = namedtuple(
+    "Row",
+    ["Block_Id", "VisibilityStart", "VisibilityEnd", "BlockVisibilityWindowType"],
+)
+
+
+def create_rows(block_count, windows_per_block, now):
+    rows = []
+    for block_id in range(block_count):
+        for i in range(windows_per_block):
+            start = now + (i - windows_per_block // 2) * 86400
+            rows.append(Row(block_id, start, start + 3600, "Strict"))
+    return rows
+
+
+def group_nested(loader, keys, rows, now):
+    today = loader.start_of_day(now, loader.START_OF_DAY_HOURS)
+    values = dict()
+    for key in keys:
+        windows = ([], [], [])
+        for row in rows:
+            if key == (row.Block_Id, row.BlockVisibilityWindowType):
+                start_of_night = loader.start_of_day(
+                    row.VisibilityStart, loader.START_OF_DAY_HOURS
+                )
+                if start_of_night < today:
+                    windows[0].append(row)
+                elif start_of_night == today:
+                    windows[1].append(row)
+                else:
+                    windows[2].append(row)
+        values[key] = windows
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--blocks",
+        type=int,
+        nargs="+",
+        default=[100, 250, 500, 1000],
+        help="numbers of blocks",
+    )
+    parser.add_argument("--windows", type=int, default=50, help="windows per block")
+    parser.add_argument(
+        "--skip-nested", action="store_true", help="don't time the nested loops"
+    )
+    args = parser.parse_args()
+
+    loader = ObservingWindowLoader()
+    now = int(time.time())
+    print("{:>8} {:>10} {:>14} {:>14}".format("blocks", "rows", "nested", "vectorised"))
+    for block_count in args.blocks:
+        rows = create_rows(block_count, args.windows, now)
+        keys = [(block_id, "Strict") for block_id in range(block_count)]
+
+        vectorised = min(
+            timeit.repeat(
+                lambda: loader.group_observing_windows(keys, rows, now),
+                number=1,
+                repeat=3,
+            )
+        )
+        if args.skip_nested:
+            nested = "-"
+        else:
+            nested = "{:.1f} ms".format(
+                1000
+                * min(
+                    timeit.repeat(
+                        lambda: group_nested(loader, keys, rows, now),
+                        number=1,
+                        repeat=1,
+                    )
+                )
+            )
+        print(
+            "{:>8} {:>10} {:>14} {:>14}".format(
+                block_count,
+                len(rows),
+                nested,
+                "{:.1f} ms".format(1000 * vectorised),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
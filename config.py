@@ -9,6 +9,126 @@ class Config:
     LOG_FILE_PATH = os.environ['LOG_FILE_PATH']
     SENTRY_DSN = os.getenv('SENTRY_DSN')
 
+    # database connection pool
+    SQLALCHEMY_POOL_SIZE = int(os.getenv('SQLALCHEMY_POOL_SIZE', 10))
+    SQLALCHEMY_MAX_OVERFLOW = int(os.getenv('SQLALCHEMY_MAX_OVERFLOW', 10))
+    SQLALCHEMY_POOL_TIMEOUT = int(os.getenv('SQLALCHEMY_POOL_TIMEOUT', 10))
+    SQLALCHEMY_POOL_RECYCLE = int(os.getenv('SQLALCHEMY_POOL_RECYCLE', 3600))
+    SQLALCHEMY_POOL_PRE_PING = True
+
+    # number of threads for running independent database queries concurrently (0 to
+    # run them one after the other); every thread needs its own pooled connection
+    DATABASE_QUERY_THREADS = int(os.getenv('DATABASE_QUERY_THREADS', 4))
+
+    # how GraphQL requests are executed: "sync" runs the data loader batches one
+    # after the other, "threaded" runs them concurrently on GRAPHQL_LOADER_THREADS
+    # threads (each of which needs its own pooled connection)
+    GRAPHQL_EXECUTION_MODE = os.getenv('GRAPHQL_EXECUTION_MODE', 'sync')
+    GRAPHQL_LOADER_THREADS = int(os.getenv('GRAPHQL_LOADER_THREADS', 4))
+
+    # maximum number of operations in a batched GraphQL request
+    GRAPHQL_MAX_BATCH_SIZE = int(os.getenv('GRAPHQL_MAX_BATCH_SIZE', 20))
+
+    # cache for data loader results, shared by all requests
+    RESULT_CACHE_MAX_SIZE = int(os.getenv('RESULT_CACHE_MAX_SIZE', 10000))
+    RESULT_CACHE_TTL = float(os.getenv('RESULT_CACHE_TTL', 300))
+
+    # cache for authenticated users and their permissions
+    USER_CACHE_MAX_SIZE = int(os.getenv('USER_CACHE_MAX_SIZE', 1000))
+    USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', 300))
+
+    # cache for parsed and validated GraphQL documents and persisted queries
+    GRAPHQL_DOCUMENT_CACHE_MAX_SIZE = int(
+        os.getenv('GRAPHQL_DOCUMENT_CACHE_MAX_SIZE', 1000)
+    )
+    GRAPHQL_DOCUMENT_CACHE_TTL = None
+
+    # file with queries persisted in advance, and whether only these are allowed
+    PERSISTED_QUERIES_FILE = os.getenv('PERSISTED_QUERIES_FILE')
+    PERSISTED_QUERIES_ONLY = os.getenv('PERSISTED_QUERIES_ONLY', 'false') == 'true'
+
+    # cache for the responses of read-only queries ("memory", "file" or "none")
+    RESPONSE_CACHE_BACKEND = os.getenv('RESPONSE_CACHE_BACKEND', 'memory')
+    RESPONSE_CACHE_MAX_SIZE = int(os.getenv('RESPONSE_CACHE_MAX_SIZE', 1000))
+    RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', 300))
+    RESPONSE_CACHE_DIR = os.getenv('RESPONSE_CACHE_DIR')
+
+    # limits for the (estimated) cost and the depth of GraphQL queries, and for the
+    # total query cost per client and second (0 for no limit); a dashboard query for
+    # the blocks, observations and observing windows of all proposals has an
+    # estimated cost of about 100000, so the default limit leaves ample room
+    GRAPHQL_MAX_QUERY_COST = int(os.getenv('GRAPHQL_MAX_QUERY_COST', 1000000))
+    GRAPHQL_MAX_QUERY_DEPTH = int(os.getenv('GRAPHQL_MAX_QUERY_DEPTH', 10))
+    GRAPHQL_COST_RATE = float(os.getenv('GRAPHQL_COST_RATE', 0))
+    GRAPHQL_COST_BURST = float(os.getenv('GRAPHQL_COST_BURST', 2000000))
+
+    # encoder for GraphQL responses ("orjson" or "json"), and compression of
+    # responses with at least the minimum size (in bytes) using gzip or Brotli
+    GRAPHQL_JSON_ENCODER = os.getenv('GRAPHQL_JSON_ENCODER', 'orjson')
+    GRAPHQL_COMPRESSION = os.getenv('GRAPHQL_COMPRESSION', 'true') == 'true'
+    GRAPHQL_COMPRESSION_MIN_SIZE = int(os.getenv('GRAPHQL_COMPRESSION_MIN_SIZE', 1024))
+    GRAPHQL_GZIP_LEVEL = int(os.getenv('GRAPHQL_GZIP_LEVEL', 6))
+    GRAPHQL_BROTLI_QUALITY = int(os.getenv('GRAPHQL_BROTLI_QUALITY', 5))
+
+    # whether clients may request timings of resolvers, data loader batches and SQL
+    # statements in the GraphQL response (which exposes the SQL statements)
+    GRAPHQL_TRACING = os.getenv('GRAPHQL_TRACING', 'false') == 'true'
+
+    # profiling of SQL statements, with statements taking longer than the threshold
+    # (in seconds) logged; the statistics cover the last one to two windows (in
+    # seconds)
+    SQL_PROFILE = os.getenv('SQL_PROFILE', 'true') == 'true'
+    SQL_SLOW_QUERY_THRESHOLD = float(os.getenv('SQL_SLOW_QUERY_THRESHOLD', 1))
+    SQL_PROFILE_WINDOW = float(os.getenv('SQL_PROFILE_WINDOW', 3600))
+    SQL_PROFILE_MAX_STATEMENTS = int(os.getenv('SQL_PROFILE_MAX_STATEMENTS', 1000))
+
+    # uploaded files are spooled to temporary files in the upload directory (by
+    # default the system's directory for temporary files); the maximum sizes are in
+    # bytes
+    UPLOAD_DIR = os.getenv('UPLOAD_DIR')
+    MAX_UPLOAD_SIZE = int(os.getenv('MAX_UPLOAD_SIZE', 200 * 1024 * 1024))
+    SUBMISSION_MAX_UNCOMPRESSED_SIZE = int(
+        os.getenv('SUBMISSION_MAX_UNCOMPRESSED_SIZE', 1024 * 1024 * 1024)
+    )
+
+    # queue for background jobs such as processing submissions, with its directory
+    # (by default in the system's directory for temporary files, but in testing mode
+    # the queue is only started if a directory is given), the number of worker
+    # threads and the time (in seconds) for which finished jobs are kept
+    JOB_QUEUE_DIR = os.getenv('JOB_QUEUE_DIR')
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+    JOB_RETENTION = float(os.getenv('JOB_RETENTION', 7 * 24 * 3600))
+
+    # service which processes proposal and block submissions, and its timeout (in
+    # seconds); submissions are not supported if no URL is given. The submitted zip
+    # file is sent to the URL as a POST request with the content type
+    # application/zip, the SHA-256 hash of the file in an X-Content-SHA256 header and
+    # the query parameters user_id, proposal_code (for resubmissions and block
+    # submissions) and block_code (for block resubmissions). The permission to
+    # modify the proposal has been checked already. The service must respond with a
+    # JSON object containing the proposal code ("proposal_code") and, for a block
+    # submission, the block id ("block_id"); if it rejects the submission, it must
+    # respond with a 4xx status code and a JSON object containing the error message
+    # ("error").
+    SUBMISSION_SERVICE_URL = os.getenv('SUBMISSION_SERVICE_URL')
+    SUBMISSION_SERVICE_TIMEOUT = float(os.getenv('SUBMISSION_SERVICE_TIMEOUT', 300))
+
+    # server-sent events: the interval (in seconds) for polling the database for
+    # changes, the interval for heartbeats, the maximum number of event streams and
+    # the maximum number of events waiting to be sent to a client; every open event
+    # stream occupies a worker thread (or greenlet) for as long as it is open, so the
+    # /events endpoint needs a threaded or asynchronous server (such as gunicorn with
+    # gthread or gevent workers), and the maximum number of event streams must be
+    # lower than the number of concurrent requests the server can handle
+    EVENTS_POLL_INTERVAL = float(os.getenv('EVENTS_POLL_INTERVAL', 10))
+    EVENTS_HEARTBEAT_INTERVAL = float(os.getenv('EVENTS_HEARTBEAT_INTERVAL', 30))
+    EVENTS_MAX_SUBSCRIBERS = int(os.getenv('EVENTS_MAX_SUBSCRIBERS', 20))
+    EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', 100))
+
+    # precomputed semester statistics
+    SEMESTER_STATISTICS_FILE = os.getenv('SEMESTER_STATISTICS_FILE')
+    SEMESTER_STATISTICS_TTL = float(os.getenv('SEMESTER_STATISTICS_TTL', 600))
+
     @staticmethod
     def init_app(app):
         pass
@@ -17,15 +137,30 @@ class Config:
 class DevelopmentConfig(Config):
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = os.environ['DEV_DATABASE_URI']
+    SQLALCHEMY_POOL_SIZE = int(os.getenv('SQLALCHEMY_POOL_SIZE', 2))
+    SQLALCHEMY_MAX_OVERFLOW = int(os.getenv('SQLALCHEMY_MAX_OVERFLOW', 2))
+    DATABASE_QUERY_THREADS = int(os.getenv('DATABASE_QUERY_THREADS', 2))
+    GRAPHQL_TRACING = os.getenv('GRAPHQL_TRACING', 'true') == 'true'
 
 
 class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = os.environ['TEST_DATABASE_URI']
+    RESULT_CACHE_MAX_SIZE = 0
+    USER_CACHE_MAX_SIZE = 0
+    RESPONSE_CACHE_BACKEND = 'none'
+    SEMESTER_STATISTICS_FILE = None
+    SEMESTER_STATISTICS_TTL = 0
+    SQLALCHEMY_POOL_SIZE = 2
+    SQLALCHEMY_MAX_OVERFLOW = 0
+    DATABASE_QUERY_THREADS = 0
+    GRAPHQL_EXECUTION_MODE = 'sync'
 
 
 class ProductionConfig(Config):
     SQLALCHEMY_DATABASE_URI = os.environ['DATABASE_URI']
+    SQLALCHEMY_POOL_SIZE = int(os.getenv('SQLALCHEMY_POOL_SIZE', 20))
+    SQLALCHEMY_MAX_OVERFLOW = int(os.getenv('SQLALCHEMY_MAX_OVERFLOW', 20))
 
 
 config = {
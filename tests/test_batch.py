@@ -0,0 +1,34 @@
+def test_empty_batch_is_rejected(client):
+    """An empty batch request is rejected."""
+
+    res = client.post("/graphql-api", json=[])
+
+    assert res.status_code == 400
+    assert len(res.get_json()["errors"]) > 0
+
+
+def test_too_large_batch_is_rejected(app, client):
+    """A batch request with too many operations is rejected."""
+
+    max_size = app.config["GRAPHQL_MAX_BATCH_SIZE"]
+    operations = [{"query": "{ __typename }"}] * (max_size + 1)
+    res = client.post("/graphql-api", json=operations)
+
+    assert res.status_code == 400
+    assert len(res.get_json()["errors"]) > 0
+
+
+def test_batch_returns_list_of_results(client):
+    """A batch request returns a result for every operation, in order."""
+
+    operations = [
+        {"query": "query A { __typename }"},
+        {"query": "query B { __schema { queryType { name } } }"},
+    ]
+    res = client.post("/graphql-api", json=operations)
+
+    assert res.status_code == 200
+    assert res.get_json() == [
+        {"data": {"__typename": "Query"}},
+        {"data": {"__schema": {"queryType": {"name": "Query"}}}},
+    ]
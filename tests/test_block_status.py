@@ -0,0 +1,124 @@
+import pytest
+from flask import g
+from sqlalchemy import create_engine
+from app.graphql.schema import _block_status_errors, _update_block_statuses
+from app.permissions import filter_editable_blocks
+
+STATUS_ERROR = "Only active blocks can be put on hold."
+
+
+def test_bulk_hold_requires_authentication(client):
+    """Putting blocks on hold requires an authentication token."""
+
+    res = client.post(
+        "/graphql-api",
+        json={
+            "query": "mutation { putBlocksOnHold(blockIds: [1, 2]) "
+            "{ results { blockId ok error } } }"
+        },
+    )
+
+    content = res.get_json()
+    assert content["data"] == {"putBlocksOnHold": None}
+    assert "authentication token" in content["errors"][0]["message"]
+
+
+class _User:
+    def __init__(self, admin, editable=(1, 2, 3, 4)):
+        self.admin = admin
+        self.editable = editable
+
+    def is_admin(self):
+        return self.admin
+
+    def may_edit_block(self, block_id):
+        return self.admin or block_id in self.editable
+
+
+@pytest.fixture()
+def connection():
+    """A connection to an in-memory database with three proposals and blocks."""
+
+    engine = create_engine("sqlite://")
+    connection = engine.connect()
+    for sql in [
+        "CREATE TABLE BlockStatus (BlockStatus_Id INTEGER, BlockStatus TEXT)",
+        "CREATE TABLE Block (Block_Id INTEGER, ProposalCode_Id INTEGER, "
+        "BlockStatus_Id INTEGER, BlockStatusReason TEXT)",
+        "CREATE TABLE ProposalContact (ProposalCode_Id INTEGER, Leader_Id INTEGER, "
+        "Contact_Id INTEGER, Astronomer_Id INTEGER)",
+        "CREATE TABLE Investigator (Investigator_Id INTEGER, PiptUser_Id INTEGER)",
+        "INSERT INTO BlockStatus VALUES (1, 'Active'), (2, 'On Hold')",
+        "INSERT INTO Block VALUES (1, 1, 1, NULL), (2, 2, 2, NULL), (3, 3, 1, NULL)",
+        # user 42 is the PI of proposal 1, the PC of proposal 2 and the liaison
+        # astronomer of no proposal; proposal 3 is none of their business
+        "INSERT INTO ProposalContact VALUES (1, 10, 11, 12), (2, 11, 10, 12), "
+        "(3, 11, 11, 12)",
+        "INSERT INTO Investigator VALUES (10, 42), (11, 7), (12, 8)",
+    ]:
+        connection.execute(sql)
+    yield connection
+    connection.close()
+
+
+def _statuses(connection):
+    sql = """
+SELECT Block_Id, BlockStatus
+       FROM Block AS b
+       JOIN BlockStatus AS bs ON b.BlockStatus_Id = bs.BlockStatus_Id
+    """
+    return {row[0]: row[1] for row in connection.execute(sql)}
+
+
+@pytest.mark.parametrize("admin, editable", [(False, [1, 2]), (True, [1, 2, 3, 4])])
+def test_editable_blocks(app, monkeypatch, connection, admin, editable):
+    """Only PIs, PCs and administrators may edit the blocks of a proposal."""
+
+    monkeypatch.setattr("app.dataloader.fetch.request_connection", lambda: connection)
+    with app.test_request_context():
+        g.user = _User(admin)
+        g.user_id = 42
+        assert filter_editable_blocks([1, 2, 3, 4]) == editable
+
+
+def test_editable_blocks_are_confirmed_by_the_user(app, monkeypatch, connection):
+    """Only blocks the user says they may edit are editable."""
+
+    monkeypatch.setattr("app.dataloader.fetch.request_connection", lambda: connection)
+    with app.test_request_context():
+        g.user = _User(False, editable=[2, 3])
+        g.user_id = 42
+        assert filter_editable_blocks([1, 2, 3, 4]) == [2]
+
+
+def test_block_status_errors():
+    """Every reason for not changing a block status is reported."""
+
+    errors = _block_status_errors(
+        [1, 2, 3, 4],
+        editable={1, 2, 3},
+        statuses={1: "Active", 2: "On Hold"},
+        old_status="Active",
+        status_error=STATUS_ERROR,
+    )
+
+    assert errors == {
+        2: STATUS_ERROR,
+        3: "There exists no block with id 3.",
+        4: "You are not allowed to modify the block with id 4.",
+    }
+
+
+def test_update_only_changes_blocks_with_the_old_status(connection):
+    """Blocks whose status has changed meanwhile are left alone."""
+
+    # block 2 has been put on hold by someone else meanwhile
+    updated = _update_block_statuses(
+        connection, [1, 2, 3], "Active", "On Hold", "Bad weather"
+    )
+
+    assert updated == 2
+    assert _statuses(connection) == {1: "On Hold", 2: "On Hold", 3: "On Hold"}
+    sql = "SELECT Block_Id, BlockStatusReason FROM Block"
+    reasons = {row[0]: row[1] for row in connection.execute(sql)}
+    assert reasons == {1: "Bad weather", 2: None, 3: "Bad weather"}
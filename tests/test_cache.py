@@ -0,0 +1,90 @@
+import time
+from app.cache import ResultCache
+
+
+def test_values_are_fetched_only_once():
+    """Cached values are not fetched again."""
+
+    cache = ResultCache(max_size=10, ttl=None)
+    fetched_keys = []
+
+    def fetch(keys):
+        fetched_keys.extend(keys)
+        return [key * 2 for key in keys]
+
+    assert cache.get_or_fetch("number", [1, 2], fetch) == [2, 4]
+    assert cache.get_or_fetch("number", [2, 3, 1], fetch) == [4, 6, 2]
+    assert fetched_keys == [1, 2, 3]
+
+
+def test_least_recently_used_values_are_evicted():
+    """The least recently used value is removed if the cache is full."""
+
+    cache = ResultCache(max_size=2, ttl=None)
+    cache.set("number", 1, "one")
+    cache.set("number", 2, "two")
+    cache.get("number", 1)
+    cache.set("number", 3, "three")
+
+    assert cache.get_many("number", [1, 2, 3]) == {1: "one", 3: "three"}
+
+
+def test_values_expire():
+    """Values are removed once their time to live has passed."""
+
+    cache = ResultCache(max_size=10, ttl=0.01)
+    cache.set("number", 1, "one")
+    time.sleep(0.02)
+
+    assert cache.get("number", 1) is None
+
+
+def test_invalidation():
+    """Values can be invalidated individually or by namespace."""
+
+    cache = ResultCache(max_size=10, ttl=None)
+    cache.set_many("proposal", {"2019-1-SCI-001": "a", "2019-1-SCI-002": "b"})
+    cache.set("block", 42, "c")
+
+    cache.invalidate("proposal", "2019-1-SCI-001")
+    assert cache.get_many("proposal", ["2019-1-SCI-001", "2019-1-SCI-002"]) == {
+        "2019-1-SCI-002": "b"
+    }
+
+    cache.invalidate("proposal")
+    assert cache.get("proposal", "2019-1-SCI-002") is None
+    assert cache.get("block", 42) == "c"
+
+
+def test_zero_size_disables_cache():
+    """Nothing is cached if the maximum size is 0."""
+
+    cache = ResultCache(max_size=0)
+    cache.set("number", 1, "one")
+
+    assert cache.get("number", 1) is None
+
+
+def test_invalidate_matching():
+    """Values whose key matches a condition can be invalidated."""
+
+    cache = ResultCache(max_size=10, ttl=None)
+    cache.set_many("user", {(1, "a"): "x", (1, "b"): "y", (2, "a"): "z"})
+    cache.invalidate_matching("user", lambda key: key[0] == 1)
+
+    assert cache.get_many("user", [(1, "a"), (1, "b"), (2, "a")]) == {(2, "a"): "z"}
+
+
+def test_stats():
+    """The cache statistics include the numbers of hits and misses."""
+
+    cache = ResultCache(max_size=10, ttl=None)
+    cache.set("number", 1, "one")
+    cache.get_many("number", [1, 2])
+    cache.get("number", 1)
+
+    stats = cache.stats()
+    assert stats["size"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 2 / 3
@@ -0,0 +1,59 @@
+import datetime
+import gzip
+from flask import Flask, Response
+from app.graphql.encoding import JSON_ENCODERS, compress_response, decode_json
+
+
+def test_encoders_support_dates():
+    """All JSON encoders encode dates and times as ISO strings."""
+
+    data = dict(night=datetime.date(2020, 5, 1), count=3)
+    for encode in JSON_ENCODERS.values():
+        assert decode_json(encode(data, False)) == dict(night="2020-05-01", count=3)
+
+
+def test_large_response_is_compressed():
+    """Large responses are compressed if the client accepts it."""
+
+    app = Flask(__name__)
+    app.config.update(
+        GRAPHQL_COMPRESSION=True, GRAPHQL_COMPRESSION_MIN_SIZE=100, GRAPHQL_GZIP_LEVEL=6
+    )
+    body = b'{"data": "' + b"x" * 1000 + b'"}'
+    with app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+        response = compress_response(Response(body, content_type="application/json"))
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.get_data()) == body
+
+
+def test_small_response_is_not_compressed():
+    """Responses below the minimum size are not compressed."""
+
+    app = Flask(__name__)
+    app.config.update(GRAPHQL_COMPRESSION=True, GRAPHQL_COMPRESSION_MIN_SIZE=100)
+    with app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+        response = compress_response(Response(b"{}", content_type="application/json"))
+
+    assert "Content-Encoding" not in response.headers
+
+
+def test_compressed_variants_are_reused(monkeypatch):
+    """A previously compressed body is used rather than compressing again."""
+
+    app = Flask(__name__)
+    app.config.update(
+        GRAPHQL_COMPRESSION=True, GRAPHQL_COMPRESSION_MIN_SIZE=100, GRAPHQL_GZIP_LEVEL=6
+    )
+    body = b'{"data": "' + b"x" * 1000 + b'"}'
+    variants = dict()
+    with app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+        compress_response(Response(body, content_type="application/json"), variants)
+        assert gzip.decompress(variants["gzip"]) == body
+
+        monkeypatch.setattr(gzip, "compress", None)
+        response = compress_response(
+            Response(body, content_type="application/json"), variants
+        )
+
+    assert response.get_data() == variants["gzip"]
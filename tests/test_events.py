@@ -0,0 +1,178 @@
+import pytest
+from sqlalchemy import create_engine
+from app.events import ChangeDetector, Event, Subscription, format_event
+
+
+def test_subscription_filters_proposals():
+    """A subscription only wants the events for its proposals."""
+
+    subscription = Subscription({"2020-2-SCI-001"}, 10)
+    everything = Subscription(None, 10)
+
+    assert subscription.wants("2020-2-SCI-001")
+    assert not subscription.wants("2020-2-SCI-002")
+    assert everything.wants("2020-2-SCI-002")
+
+
+def test_full_subscription_asks_for_reload():
+    """A subscriber is asked to reload if events have been dropped."""
+
+    subscription = Subscription(None, 2)
+    for i in range(3):
+        subscription.put(Event(i, "observation", "2020-2-SCI-001", dict()))
+
+    assert subscription.next_event(0.01).kind == "reload"
+    assert subscription.next_event(0.01) is None
+
+
+def test_event_format():
+    """Events are formatted as server-sent events."""
+
+    event = Event(7, "block_status", "2020-2-SCI-001", dict(blockId=3))
+
+    assert format_event(event) == 'id: 7\nevent: block_status\ndata: {"blockId": 3}\n\n'
+
+
+@pytest.fixture()
+def connection(monkeypatch):
+    """
+    A connection to an in-memory database with two proposals, which is used for all
+    database queries.
+
+    Proposal 2020-2-SCI-001 has the active blocks 1 and 2, proposal 2020-2-SCI-002
+    the active block 3. There is one observation, of block 1.
+
+    """
+
+    connection = create_engine("sqlite://").connect()
+    for sql in [
+        "CREATE TABLE ProposalCode (ProposalCode_Id INTEGER, Proposal_Code TEXT)",
+        "CREATE TABLE BlockStatus (BlockStatus_Id INTEGER, BlockStatus TEXT)",
+        "CREATE TABLE Block (Block_Id INTEGER, ProposalCode_Id INTEGER, "
+        "BlockStatus_Id INTEGER)",
+        "CREATE TABLE BlockVisitStatus (BlockVisitStatus_Id INTEGER, "
+        "BlockVisitStatus TEXT)",
+        "CREATE TABLE BlockVisit (BlockVisit_Id INTEGER, Block_Id INTEGER, "
+        "BlockVisitStatus_Id INTEGER)",
+        "INSERT INTO ProposalCode VALUES (1, '2020-2-SCI-001'), (2, '2020-2-SCI-002')",
+        "INSERT INTO BlockStatus VALUES (1, 'Active'), (2, 'On Hold'), "
+        "(3, 'Completed')",
+        "INSERT INTO Block VALUES (1, 1, 1), (2, 1, 1), (3, 2, 1)",
+        "INSERT INTO BlockVisitStatus VALUES (1, 'Accepted'), (2, 'In queue')",
+        "INSERT INTO BlockVisit VALUES (1, 1, 1)",
+    ]:
+        connection.execute(sql)
+    monkeypatch.setattr("app.dataloader.fetch.request_connection", lambda: connection)
+    yield connection
+    connection.close()
+
+
+def _detector(*proposal_codes):
+    # the subscriptions are added without starting the background thread
+    detector = ChangeDetector()
+    subscriptions = [Subscription(codes, 100) for codes in proposal_codes]
+    detector._subscriptions.update(subscriptions)
+    return detector, subscriptions
+
+
+def _events(subscription):
+    events = []
+    while True:
+        event = subscription.next_event(0)
+        if event is None:
+            return events
+        events.append((event.kind, event.data))
+
+
+def test_changes_are_detected(connection):
+    """Block status changes and new observations are reported by the next poll."""
+
+    detector, (subscription,) = _detector(None)
+    detector.poll()
+    assert _events(subscription) == []
+
+    connection.execute("UPDATE Block SET BlockStatus_Id = 2 WHERE Block_Id = 2")
+    connection.execute("INSERT INTO BlockVisit VALUES (2, 3, 2)")
+    detector.poll()
+
+    assert _events(subscription) == [
+        (
+            "observation",
+            dict(
+                observationId=2,
+                blockId=3,
+                status="In queue",
+                proposalCode="2020-2-SCI-002",
+            ),
+        ),
+        (
+            "block_status",
+            dict(blockId=2, status="On Hold", proposalCode="2020-2-SCI-001"),
+        ),
+    ]
+
+    detector.poll()
+    assert _events(subscription) == []
+
+
+def test_blocks_leaving_the_live_statuses(connection):
+    """A block which is neither active nor on hold any longer is reported."""
+
+    detector, (subscription,) = _detector({"2020-2-SCI-001"})
+    detector.poll()
+
+    connection.execute("UPDATE Block SET BlockStatus_Id = 3 WHERE Block_Id IN (1, 3)")
+    detector.poll()
+
+    assert _events(subscription) == [
+        (
+            "block_status",
+            dict(blockId=1, status="Completed", proposalCode="2020-2-SCI-001"),
+        ),
+    ]
+
+
+def test_newly_watched_proposals(connection):
+    """The blocks of a newly watched proposal are not reported as changed."""
+
+    detector, (first,) = _detector({"2020-2-SCI-001"})
+    detector.poll()
+
+    second = Subscription({"2020-2-SCI-002"}, 100)
+    detector._subscriptions.add(second)
+    connection.execute("UPDATE Block SET BlockStatus_Id = 2 WHERE Block_Id = 1")
+    detector.poll()
+
+    assert _events(first) == [
+        (
+            "block_status",
+            dict(blockId=1, status="On Hold", proposalCode="2020-2-SCI-001"),
+        ),
+    ]
+    assert _events(second) == []
+
+    connection.execute("UPDATE Block SET BlockStatus_Id = 2 WHERE Block_Id = 3")
+    detector.poll()
+
+    assert _events(first) == []
+    assert _events(second) == [
+        (
+            "block_status",
+            dict(blockId=3, status="On Hold", proposalCode="2020-2-SCI-002"),
+        ),
+    ]
+
+
+def test_observation_marker(connection, monkeypatch):
+    """Observations are reported once, in order, and at most a maximum per poll."""
+
+    monkeypatch.setattr("app.events.MAX_NEW_OBSERVATIONS", 2)
+    detector, (subscription,) = _detector(None)
+    detector.poll()
+
+    connection.execute("INSERT INTO BlockVisit VALUES (2, 1, 1), (3, 2, 1), (4, 3, 1)")
+    detector.poll()
+    assert [data["observationId"] for _, data in _events(subscription)] == [2, 3]
+
+    detector.poll()
+    assert [data["observationId"] for _, data in _events(subscription)] == [4]
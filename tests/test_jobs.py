@@ -0,0 +1,76 @@
+import time
+from flask import Flask
+from app.jobs import FAILED, SUCCEEDED, JobError, JobQueue
+
+
+def _wait_for(queue, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job.status in (SUCCEEDED, FAILED):
+            return job
+        time.sleep(0.01)
+    raise AssertionError("The job has not finished.")
+
+
+def _queue(tmp_path):
+    app = Flask(__name__)
+    app.config.update(JOB_QUEUE_DIR=str(tmp_path), JOB_WORKERS=1)
+    queue = JobQueue()
+
+    @queue.handler("add")
+    def add(job, report_progress):
+        report_progress("Adding")
+        if job.payload["b"] < 0:
+            raise JobError("Only positive numbers can be added.")
+        return job.payload["a"] + job.payload["b"]
+
+    queue.init_app(app)
+    return queue
+
+
+def test_job_result_is_stored(tmp_path):
+    """The result of a job is stored with the job."""
+
+    queue = _queue(tmp_path)
+    job = _wait_for(queue, queue.enqueue("add", dict(a=1, b=2), user_id=42))
+
+    assert job.status == SUCCEEDED
+    assert job.result == 3
+    assert job.user_id == 42
+
+
+def test_job_error_is_stored(tmp_path):
+    """The error message of a failed job is stored with the job."""
+
+    queue = _queue(tmp_path)
+    job = _wait_for(queue, queue.enqueue("add", dict(a=1, b=-2)))
+
+    assert job.status == FAILED
+    assert job.error == "Only positive numbers can be added."
+
+
+def test_attached_file_is_removed(tmp_path):
+    """A file attached to a job is removed once the job has finished."""
+
+    attachment = tmp_path / "attachment.zip"
+    attachment.write_bytes(b"content")
+    queue = _queue(tmp_path)
+    with open(str(attachment), "rb") as f:
+        job_id = queue.enqueue("add", dict(a=1, b=2), file=f)
+    _wait_for(queue, job_id)
+
+    assert attachment.exists()
+    assert not (tmp_path / job_id).exists()
+
+
+def test_queue_is_not_started_for_tests_without_directory():
+    """In testing mode the queue is only started if its directory is configured."""
+
+    app = Flask(__name__)
+    app.config.update(TESTING=True, JOB_QUEUE_DIR=None)
+    queue = JobQueue()
+    queue.init_app(app)
+
+    assert not queue.started
+    assert queue.get("abc") is None
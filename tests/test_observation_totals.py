@@ -0,0 +1,143 @@
+import pytest
+from sqlalchemy import create_engine
+from app.graphql.views import schema
+from app.statistics import compute_observation_totals
+from app.util import _SemesterContent
+
+SEMESTER = _SemesterContent(year="2019", semester="1")
+
+
+@pytest.fixture()
+def connection(monkeypatch):
+    """
+    A connection to an in-memory database with observations in two semesters.
+
+    The connection is used for all database queries, and all semesters are treated
+    as open.
+
+    """
+
+    engine = create_engine("sqlite://")
+    connection = engine.connect()
+    for sql in [
+        "CREATE TABLE Semester (Semester_Id INTEGER, Year INTEGER, Semester INTEGER)",
+        "CREATE TABLE Proposal (Proposal_Id INTEGER, ProposalCode_Id INTEGER, "
+        "Semester_Id INTEGER)",
+        "CREATE TABLE Block (Block_Id INTEGER, Proposal_Id INTEGER)",
+        "CREATE TABLE BlockVisitStatus (BlockVisitStatus_Id INTEGER, "
+        "BlockVisitStatus TEXT)",
+        "CREATE TABLE NightInfo (NightInfo_Id INTEGER, Date TEXT)",
+        "CREATE TABLE BlockVisit (BlockVisit_Id INTEGER, Block_Id INTEGER, "
+        "BlockVisitStatus_Id INTEGER, NightInfo_Id INTEGER, ObsTime INTEGER)",
+        "CREATE TABLE ProposalContact (ProposalCode_Id INTEGER, Leader_Id INTEGER)",
+        "CREATE TABLE Investigator (Investigator_Id INTEGER, Institute_Id INTEGER)",
+        "CREATE TABLE Institute (Institute_Id INTEGER, Partner_Id INTEGER)",
+        "CREATE TABLE Partner (Partner_Id INTEGER, Partner_Code TEXT)",
+        "INSERT INTO Semester VALUES (1, 2019, 1), (2, 2019, 2)",
+        "INSERT INTO Proposal VALUES (1, 1, 1), (2, 2, 1), (3, 3, 2)",
+        "INSERT INTO Block VALUES (1, 1), (2, 2), (3, 3)",
+        "INSERT INTO BlockVisitStatus VALUES (1, 'Accepted'), (2, 'Rejected'), "
+        "(3, 'In queue')",
+        "INSERT INTO NightInfo VALUES (1, '2019-05-01'), (2, '2019-05-02')",
+        "INSERT INTO BlockVisit VALUES (1, 1, 1, 1, 1000), (2, 1, 1, 2, 1500), "
+        "(3, 1, 2, 2, 300), (4, 2, 1, 1, 2000), (5, 2, 3, 2, 700), "
+        "(6, 3, 1, 1, 9999)",
+        # the PI of proposals 1 and 3 is from RSA, that of proposal 2 from UW
+        "INSERT INTO ProposalContact VALUES (1, 10), (2, 11), (3, 10)",
+        "INSERT INTO Investigator VALUES (10, 1), (11, 2)",
+        "INSERT INTO Institute VALUES (1, 1), (2, 2)",
+        "INSERT INTO Partner VALUES (1, 'RSA'), (2, 'UW')",
+    ]:
+        connection.execute(sql)
+    monkeypatch.setattr("app.dataloader.fetch.request_connection", lambda: connection)
+    monkeypatch.setattr("app.statistics.is_closed_semester", lambda semester: False)
+    yield connection
+    connection.close()
+
+
+def _totals(group_by):
+    return sorted(
+        (
+            total["status"],
+            total["night"],
+            total["partner_code"],
+            total["observation_time"],
+            total["observations"],
+        )
+        for total in compute_observation_totals(SEMESTER, group_by)
+    )
+
+
+def test_totals_by_status(connection):
+    """Without a grouping the totals are computed per observation status."""
+
+    assert _totals(None) == [
+        ("Accepted", None, None, 4500, 3),
+        ("In queue", None, None, 700, 1),
+        ("Rejected", None, None, 300, 1),
+    ]
+
+
+def test_totals_by_night(connection):
+    """The totals may be grouped by night."""
+
+    assert _totals("Night") == [
+        ("Accepted", "2019-05-01", None, 3000, 2),
+        ("Accepted", "2019-05-02", None, 1500, 1),
+        ("In queue", "2019-05-02", None, 700, 1),
+        ("Rejected", "2019-05-02", None, 300, 1),
+    ]
+
+
+def test_totals_by_partner(connection):
+    """The totals may be grouped by the partner of the Principal Investigator."""
+
+    assert _totals("Partner") == [
+        ("Accepted", None, "RSA", 2500, 2),
+        ("Accepted", None, "UW", 2000, 1),
+        ("In queue", None, "UW", 700, 1),
+        ("Rejected", None, "RSA", 300, 1),
+    ]
+
+
+def test_unsupported_grouping(connection):
+    """Only grouping by night or partner is supported."""
+
+    with pytest.raises(ValueError):
+        compute_observation_totals(SEMESTER, "Block")
+
+
+@pytest.mark.parametrize("group_by", ["", ", groupBy: NIGHT", ", groupBy: PARTNER"])
+def test_totals_match_the_observations(app, connection, group_by):
+    """The totals agree with the list of all observations of the semester."""
+
+    query = """query {{
+    partnerStatObservations(semester: "2019-1") {{ observationTime status }}
+    partnerStatObservationTotals(semester: "2019-1"{group_by}) {{
+        status night partnerCode observationTime observations
+    }}
+}}""".format(
+        group_by=group_by
+    )
+
+    with app.test_request_context():
+        result = schema.execute(query)
+    assert not result.errors
+
+    expected = dict()
+    for observation in result.data["partnerStatObservations"]:
+        time, count = expected.get(observation["status"], (0, 0))
+        expected[observation["status"]] = (
+            time + observation["observationTime"],
+            count + 1,
+        )
+
+    totals = dict()
+    for total in result.data["partnerStatObservationTotals"]:
+        time, count = totals.get(total["status"], (0, 0))
+        totals[total["status"]] = (
+            time + total["observationTime"],
+            count + total["observations"],
+        )
+
+    assert totals == expected
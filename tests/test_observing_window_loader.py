@@ -0,0 +1,57 @@
+from collections import namedtuple
+from app.dataloader import ObservingWindowLoader
+
+Row = namedtuple(
+    "Row", ["Block_Id", "VisibilityStart", "VisibilityEnd", "BlockVisibilityWindowType"]
+)
+
+# 2019-06-15 12:00 UT
+NOW = 1560600000
+
+DAY = 24 * 3600
+
+
+def test_windows_are_grouped_by_block_and_window_type():
+    """Observing windows are grouped by block id and window type."""
+
+    rows = [
+        Row(1, NOW + 3600, NOW + 7200, "Strict"),
+        Row(1, NOW + 3600, NOW + 5400, "Extended"),
+        Row(2, NOW + 3600, NOW + 9000, "Strict"),
+    ]
+    values = ObservingWindowLoader().group_observing_windows(
+        [(1, "Strict"), (2, "Strict")], rows, NOW
+    )
+
+    assert [w.duration for w in values[(1, "Strict")]["tonights_windows"]] == [3600]
+    assert [w.duration for w in values[(2, "Strict")]["tonights_windows"]] == [5400]
+
+
+def test_windows_are_classified_as_past_tonight_and_future():
+    """Observing windows are classified as past, tonight's and future windows."""
+
+    rows = [
+        Row(1, NOW + 2 * DAY, NOW + 2 * DAY + 100, "Strict"),
+        Row(1, NOW - 2 * DAY, NOW - 2 * DAY + 100, "Strict"),
+        Row(1, NOW - 3 * DAY, NOW - 3 * DAY + 100, "Strict"),
+        Row(1, NOW + 100, NOW + 200, "Strict"),
+    ]
+    windows = ObservingWindowLoader().group_observing_windows(
+        [(1, "Strict")], rows, NOW
+    )[(1, "Strict")]
+
+    assert len(windows["past_windows"]) == 2
+    assert len(windows["tonights_windows"]) == 1
+    assert len(windows["future_windows"]) == 1
+    past_starts = [w.visibility_start for w in windows["past_windows"]]
+    assert past_starts == sorted(past_starts)
+
+
+def test_blocks_without_windows_have_empty_lists():
+    """A block without observing windows gets empty lists of windows."""
+
+    windows = ObservingWindowLoader().group_observing_windows(
+        [(3, "Strict")], [], NOW
+    )[(3, "Strict")]
+
+    assert windows == dict(past_windows=[], tonights_windows=[], future_windows=[])
@@ -0,0 +1,128 @@
+import pytest
+from flask import g
+from sqlalchemy import create_engine
+from app.permissions import (
+    filter_viewable_proposals,
+    may_edit_proposal,
+    may_view_proposal,
+    viewable_proposal_codes,
+)
+
+
+class _User:
+    def __init__(self, admin, viewable=()):
+        self.admin = admin
+        self.viewable = viewable
+
+    def is_admin(self):
+        return self.admin
+
+    def may_view_proposal(self, proposal_code):
+        return self.admin or proposal_code in self.viewable
+
+
+PROPOSAL_CODES = ["2019-1-SCI-001", "2019-1-SCI-002", "2019-2-SCI-003"]
+
+
+@pytest.fixture()
+def connection(monkeypatch):
+    """
+    A connection to an in-memory database with three proposals, which is used for
+    all database queries.
+
+    User 42 is a Co-Investigator on the first proposal, user 43 the liaison
+    astronomer of the second proposal, and user 44 a member of the TAC of the
+    partner from which the second and third proposal request time. User 45 is not
+    associated with any proposal.
+
+    """
+
+    connection = create_engine("sqlite://").connect()
+    for sql in [
+        "CREATE TABLE ProposalCode (ProposalCode_Id INTEGER, Proposal_Code TEXT)",
+        "CREATE TABLE ProposalInvestigator (ProposalCode_Id INTEGER, "
+        "Investigator_Id INTEGER)",
+        "CREATE TABLE ProposalContact (ProposalCode_Id INTEGER, Leader_Id INTEGER, "
+        "Contact_Id INTEGER, Astronomer_Id INTEGER)",
+        "CREATE TABLE Investigator (Investigator_Id INTEGER, PiptUser_Id INTEGER)",
+        "CREATE TABLE MultiPartner (ProposalCode_Id INTEGER, Partner_Id INTEGER)",
+        "CREATE TABLE PiptUserTAC (PiptUser_Id INTEGER, Partner_Id INTEGER)",
+        "INSERT INTO ProposalCode VALUES (1, '2019-1-SCI-001'), "
+        "(2, '2019-1-SCI-002'), (3, '2019-2-SCI-003')",
+        "INSERT INTO ProposalInvestigator VALUES (1, 10), (1, 12), (2, 10), (3, 10)",
+        "INSERT INTO ProposalContact VALUES (1, 10, 10, 11), (2, 10, 10, 13), "
+        "(3, 10, 10, 11)",
+        "INSERT INTO Investigator VALUES (10, 7), (11, 8), (12, 42), (13, 43)",
+        "INSERT INTO MultiPartner VALUES (1, 1), (2, 2), (3, 2)",
+        "INSERT INTO PiptUserTAC VALUES (44, 2), (42, 3)",
+    ]:
+        connection.execute(sql)
+    monkeypatch.setattr("app.dataloader.fetch.request_connection", lambda: connection)
+    yield connection
+    connection.close()
+
+
+@pytest.mark.parametrize(
+    "user_id, proposal_codes",
+    [
+        (42, {"2019-1-SCI-001"}),
+        (43, {"2019-1-SCI-002"}),
+        (44, {"2019-1-SCI-002", "2019-2-SCI-003"}),
+        (45, set()),
+    ],
+)
+def test_viewable_proposal_codes(app, connection, user_id, proposal_codes):
+    """Investigators, liaison astronomers and TAC members find their proposals."""
+
+    with app.app_context():
+        assert viewable_proposal_codes(user_id) == proposal_codes
+
+
+@pytest.mark.parametrize("admin", [False, True])
+def test_bulk_check_is_confirmed_by_the_user(app, connection, admin):
+    """The bulk check only includes proposals the user says they may view."""
+
+    with app.test_request_context():
+        # user 44 is a TAC member for two proposals, but may only view one of them
+        g.user = _User(admin, viewable=["2019-2-SCI-003"])
+        g.user_id = 44
+        viewable = filter_viewable_proposals(PROPOSAL_CODES)
+        for proposal_code in viewable:
+            assert may_view_proposal(proposal_code)
+        assert viewable == (PROPOSAL_CODES if admin else ["2019-2-SCI-003"])
+
+
+@pytest.mark.parametrize(
+    "proposal_code, admin, editable",
+    [
+        ("2019-1-SCI-001", False, True),
+        ("2019-1-SCI-002", False, True),
+        ("2019-1-SCI-003", False, False),
+        ("2019-1-SCI-004", False, False),
+        ("2019-1-SCI-003", True, True),
+    ],
+)
+def test_may_edit_proposal(app, monkeypatch, proposal_code, admin, editable):
+    """Only PIs, PCs, liaison astronomers and administrators may edit a proposal."""
+
+    connection = create_engine("sqlite://").connect()
+    for sql in [
+        "CREATE TABLE ProposalCode (ProposalCode_Id INTEGER, Proposal_Code TEXT)",
+        "CREATE TABLE ProposalContact (ProposalCode_Id INTEGER, Leader_Id INTEGER, "
+        "Contact_Id INTEGER, Astronomer_Id INTEGER)",
+        "CREATE TABLE Investigator (Investigator_Id INTEGER, PiptUser_Id INTEGER)",
+        "INSERT INTO ProposalCode VALUES (1, '2019-1-SCI-001'), "
+        "(2, '2019-1-SCI-002'), (3, '2019-1-SCI-003')",
+        # user 42 is the PI of the first and the liaison astronomer of the second
+        # proposal
+        "INSERT INTO ProposalContact VALUES (1, 10, 11, 12), (2, 11, 11, 10), "
+        "(3, 11, 11, 12)",
+        "INSERT INTO Investigator VALUES (10, 42), (11, 7), (12, 8)",
+    ]:
+        connection.execute(sql)
+    monkeypatch.setattr("app.dataloader.fetch.request_connection", lambda: connection)
+
+    with app.test_request_context():
+        g.user = _User(admin)
+        g.user_id = 42
+        assert may_edit_proposal(proposal_code) == editable
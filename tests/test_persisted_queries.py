@@ -0,0 +1,46 @@
+import pytest
+from graphql_server import HttpQueryError
+from app.cache import ResultCache
+from app.graphql.persisted_queries import PersistedQueries, query_hash
+
+
+QUERY = "query { proposal(proposalCode: \"2019-1-SCI-042\") { title } }"
+
+
+def _extensions(sha256_hash):
+    return {"persistedQuery": {"version": 1, "sha256Hash": sha256_hash}}
+
+
+def test_unknown_hash_is_not_found():
+    """An error is raised for an unknown query hash."""
+
+    persisted_queries = PersistedQueries(None, None, ResultCache(max_size=10))
+
+    with pytest.raises(HttpQueryError) as excinfo:
+        persisted_queries.resolve({"extensions": _extensions(query_hash(QUERY))})
+    assert str(excinfo.value) == "PersistedQueryNotFound"
+
+
+def test_query_is_persisted():
+    """A query sent with its hash can later be requested by its hash only."""
+
+    persisted_queries = PersistedQueries(None, None, ResultCache(max_size=10))
+    sha256_hash = query_hash(QUERY)
+    persisted_queries.resolve({"query": QUERY, "extensions": _extensions(sha256_hash)})
+
+    data = persisted_queries.resolve(
+        {"extensions": _extensions(sha256_hash), "variables": {"a": 1}}
+    )
+    assert data["query"] == QUERY
+    assert data["variables"] == {"a": 1}
+
+
+def test_hash_must_match_query():
+    """An error is raised if the hash doesn't match the query."""
+
+    persisted_queries = PersistedQueries(None, None, ResultCache(max_size=10))
+
+    with pytest.raises(HttpQueryError):
+        persisted_queries.resolve(
+            {"query": QUERY, "extensions": _extensions(query_hash("query { x }"))}
+        )
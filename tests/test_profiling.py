@@ -0,0 +1,37 @@
+from app.profiling import StatementProfiler, normalize_statement
+
+
+def test_normalize_statement():
+    """Statements differing in their parameters are normalized to the same text."""
+
+    first = normalize_statement(
+        "SELECT *\n  FROM Block WHERE Block_Id IN (%s, %s, %s) AND Name='abc'"
+    )
+    second = normalize_statement(
+        "SELECT * FROM Block WHERE Block_Id IN (%s) AND Name = 'x'"
+    )
+    assert first == "SELECT * FROM Block WHERE Block_Id IN (?) AND Name=?"
+    assert second == "SELECT * FROM Block WHERE Block_Id IN (?) AND Name = ?"
+    assert normalize_statement("SELECT 42 FROM T2 LIMIT 10") == (
+        "SELECT ? FROM T2 LIMIT ?"
+    )
+
+
+def test_summary():
+    """The summary ranks the statements by their total duration."""
+
+    profiler = StatementProfiler()
+    profiler.record("SELECT * FROM Block WHERE Block_Id=1", 0.5, 1, "block")
+    profiler.record("SELECT * FROM Block WHERE Block_Id=2", 0.25, 1, "block")
+    profiler.record("SELECT * FROM Proposal", 0.1, 100)
+
+    summary = profiler.summary(top=1)
+    assert len(summary) == 1
+    assert summary[0]["statement"] == "SELECT * FROM Block WHERE Block_Id=?"
+    assert summary[0]["count"] == 2
+    assert summary[0]["total_seconds"] == 0.75
+    assert summary[0]["max_seconds"] == 0.5
+    assert summary[0]["callers"] == {"block": 2}
+
+    profiler.reset()
+    assert profiler.summary() == []
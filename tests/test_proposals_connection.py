@@ -0,0 +1,30 @@
+import pytest
+from graphql import GraphQLError
+from app.graphql.schema import (
+    _decode_proposal_cursor,
+    _encode_proposal_cursor,
+    _proposal_codes,
+)
+
+
+def test_proposal_cursors_can_be_decoded():
+    """A proposal cursor decodes to the proposal code."""
+
+    cursor = _encode_proposal_cursor("2019-1-SCI-042")
+
+    assert _decode_proposal_cursor(cursor) == "2019-1-SCI-042"
+
+
+@pytest.mark.parametrize("cursor", ["2019-1-SCI-042", "%%%", "YWJj"])
+def test_invalid_proposal_cursors_are_rejected(cursor):
+    """An invalid cursor raises an error."""
+
+    with pytest.raises(GraphQLError):
+        _decode_proposal_cursor(cursor)
+
+
+def test_no_query_for_users_without_viewable_proposals():
+    """No database query is made if the user may view no proposals."""
+
+    # no app context is needed, as the database isn't queried
+    assert _proposal_codes(limit=51, proposal_codes=frozenset()) == []
@@ -0,0 +1,101 @@
+import time
+from graphql import parse
+from app.graphql.cost import CostEstimate, CostLimiter
+from app.graphql.views import schema
+
+
+def test_list_fields_are_weighted_by_their_expected_size():
+    """The cost of nested list fields is multiplied by their expected sizes."""
+
+    query = """query {
+    proposals {
+        title
+        blocks {
+            visits { night }
+        }
+    }
+}"""
+
+    estimate = CostEstimate(schema, parse(query))
+
+    assert estimate.cost == 100 * (1 + 20 * (1 + 5))
+    assert estimate.depth == 3
+
+
+def test_first_argument_is_used_as_page_size():
+    """The first argument of a connection determines its size."""
+
+    query = """query Proposals($first: Int) {
+    proposalsConnection(first: $first) {
+        edges { node { proposalCode } }
+    }
+}"""
+
+    estimate = CostEstimate(schema, parse(query), variables={"first": 10})
+
+    assert estimate.cost == 10 * (1 + 1 * (1 + 1))
+
+
+def test_negative_first_argument_does_not_lower_the_cost():
+    """A negative first argument cannot offset the cost of other fields."""
+
+    query = """query Proposals($first: Int) {
+    x: proposalsConnection(first: -100000) {
+        edges { node { proposalCode } }
+    }
+    y: proposalsConnection(first: $first) {
+        edges { node { proposalCode } }
+    }
+    proposals {
+        blocks {
+            visits { night }
+        }
+    }
+}"""
+
+    estimate = CostEstimate(schema, parse(query), variables={"first": -100000})
+
+    assert estimate.cost == 100 * (1 + 20 * (1 + 5))
+
+
+def test_dashboard_queries_are_within_the_default_limit(app):
+    """The default cost limit doesn't reject the queries of the dashboards."""
+
+    query = """query {
+    proposals {
+        proposalCode
+        blocks {
+            visits { night }
+            observingWindows {
+                pastWindows { start }
+                tonightsWindows { start }
+                futureWindows { start }
+            }
+        }
+        observations { night }
+        timeAllocations { amount }
+    }
+}"""
+
+    estimate = CostEstimate(schema, parse(query))
+
+    assert estimate.cost <= app.config["GRAPHQL_MAX_QUERY_COST"]
+    assert estimate.depth <= app.config["GRAPHQL_MAX_QUERY_DEPTH"]
+
+
+def test_idle_buckets_are_removed(monkeypatch):
+    """The token buckets of idle clients are removed once they are full again."""
+
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    limiter = CostLimiter()
+    limiter.rate = 10
+    limiter.burst = 100
+    limiter._last_pruned = now[0]
+
+    limiter.check(CostEstimate(schema, parse("{ proposals { title } }")), "a")
+    assert "a" in limiter._buckets
+
+    now[0] += 10
+    limiter.check(CostEstimate(schema, parse("{ proposals { title } }")), "b")
+    assert set(limiter._buckets) == {"b"}
@@ -0,0 +1,161 @@
+import threading
+import time
+import pytest
+from flask import Flask
+from app.auth import encode
+from app.jobs import FAILED, SUCCEEDED, job_queue
+from app.response_cache import ResponseCache, record_tag, response_cache
+
+
+def _response_cache():
+    app = Flask(__name__)
+    app.config.update(
+        RESPONSE_CACHE_BACKEND="memory",
+        RESPONSE_CACHE_MAX_SIZE=10,
+        RESPONSE_CACHE_TTL=None,
+    )
+    cache = ResponseCache()
+    cache.init_app(app)
+    return app, cache
+
+
+def test_key_ignores_variable_order():
+    """The cache key does not depend on the order of the variables."""
+
+    assert ResponseCache.key("{ a }", None, {"x": 1, "y": 2}, "admin") == (
+        ResponseCache.key("{ a }", None, {"y": 2, "x": 1}, "admin")
+    )
+    assert ResponseCache.key("{ a }", None, None, "admin") != (
+        ResponseCache.key("{ a }", None, None, "user:42")
+    )
+
+
+def test_invalidation_by_tag():
+    """A cached response is invalidated if any of its tags is invalidated."""
+
+    app, cache = _response_cache()
+    with app.app_context():
+        cache.start_recording()
+        record_tag("block", 42)
+        cache.set("key", b"{}", "etag")
+        assert cache.get("key")["etag"] == "etag"
+
+        cache.invalidate("block", 7)
+        assert cache.get("key") is not None
+
+        cache.invalidate("block", 42)
+        assert cache.get("key") is None
+
+
+def test_outdated_response_is_not_cached():
+    """A response is not cached if something was invalidated while computing it."""
+
+    app, cache = _response_cache()
+    with app.app_context():
+        cache.start_recording()
+        record_tag("block", 42)
+        cache.invalidate("block", 42)
+        cache.set("key", b"{}", "etag")
+
+        assert cache.get("key") is None
+
+
+def test_response_without_tags_is_not_cached():
+    """A response which doesn't depend on any tagged data is not cached."""
+
+    app, cache = _response_cache()
+    with app.app_context():
+        cache.start_recording()
+        cache.set("key", b"{}", "etag")
+
+        assert cache.get("key") is None
+
+
+def test_tag_versions_are_bounded():
+    """The memory backend does not keep a version for every invalidated tag."""
+
+    app, cache = _response_cache()
+    with app.app_context():
+        cache.start_recording()
+        record_tag("block", 42)
+        cache.set("key", b"{}", "etag")
+
+        for block_id in range(1000):
+            cache.invalidate("block", 1000 + block_id)
+
+        assert len(cache.backend._tag_versions) <= cache.backend.max_tags
+        # the cached response might depend on a forgotten tag
+        assert cache.get("key") is None
+
+
+def test_variants_keep_the_expiry_time():
+    """Adding a compressed variant doesn't extend the life of a cached response."""
+
+    app, cache = _response_cache()
+    cache.ttl = 60
+    with app.app_context():
+        cache.start_recording()
+        record_tag("block", 42)
+        cache.set("key", b"{}", "etag", dict(gzip=b"gz"))
+        entry = cache.get("key")
+        assert entry["variants"] == dict(gzip=b"gz")
+
+        cache.set_variants("key", entry, dict(gzip=b"gz", br=b"br"))
+        updated = cache.get("key")
+
+    assert updated["variants"] == dict(gzip=b"gz", br=b"br")
+    assert updated["expires"] == entry["expires"]
+
+
+class _User:
+    def is_admin(self):
+        return False
+
+
+@pytest.fixture()
+def caching_app(app, monkeypatch, tmp_path):
+    """The Flask app with the memory backend and a started job queue."""
+
+    monkeypatch.setattr("app.auth.load_user", lambda user_id: _User())
+    app.config.update(RESPONSE_CACHE_BACKEND="memory", JOB_QUEUE_DIR=str(tmp_path))
+    response_cache.init_app(app)
+    job_queue.init_app(app)
+    yield app
+    app.config.update(RESPONSE_CACHE_BACKEND="none", JOB_QUEUE_DIR=None)
+    response_cache.init_app(app)
+    job_queue.init_app(app)
+
+
+def test_submission_status_is_not_cached(caching_app):
+    """Polling the status of a submission returns its current status."""
+
+    proceed = threading.Event()
+
+    @job_queue.handler("wait")
+    def wait(job, report_progress):
+        proceed.wait(5)
+        return dict(proposal_code="2019-1-SCI-042")
+
+    job_id = job_queue.enqueue("wait", dict(), user_id=42)
+    client = caching_app.test_client()
+
+    def poll():
+        res = client.post(
+            "/graphql-api",
+            json={
+                "query": 'query {{ submissionStatus(jobId: "{job_id}") '
+                "{{ status proposalCode }} }}".format(job_id=job_id)
+            },
+            headers={"Authorization": "Token " + encode({"user_id": 42})},
+        )
+        return res.get_json()["data"]["submissionStatus"]
+
+    assert poll()["proposalCode"] is None
+
+    proceed.set()
+    for _ in range(500):
+        if job_queue.get(job_id).status in (SUCCEEDED, FAILED):
+            break
+        time.sleep(0.01)
+
+    assert poll() == dict(status="SUCCEEDED", proposalCode="2019-1-SCI-042")
@@ -0,0 +1,57 @@
+from collections import namedtuple
+from graphql import parse
+from graphql.language import ast
+from app.graphql.selection import selected_fields
+
+
+_Info = namedtuple("Info", ["field_asts", "fragments"])
+
+
+def _info(query):
+    document = parse(query)
+    operation = next(
+        d for d in document.definitions if isinstance(d, ast.OperationDefinition)
+    )
+    fragments = {
+        d.name.value: d
+        for d in document.definitions
+        if isinstance(d, ast.FragmentDefinition)
+    }
+    return _Info(field_asts=operation.selection_set.selections, fragments=fragments)
+
+
+def test_selected_fields_include_fragments():
+    """Fields selected in fragments and inline fragments are included."""
+
+    info = _info(
+        """query {
+    proposal(proposalCode: "2019-1-SCI-042") {
+        proposalCode
+        ...blocks
+        ... on Proposal { timeAllocations { amount } }
+    }
+}
+
+fragment blocks on Proposal {
+    blocks { id }
+}"""
+    )
+
+    assert selected_fields(info) == {"proposal_code", "blocks", "time_allocations"}
+
+
+def test_selected_fields_of_nested_field():
+    """The fields selected for a nested field can be found."""
+
+    info = _info(
+        """query {
+    proposalsConnection(first: 10) {
+        edges { node { title completionComments { comment } } }
+    }
+}"""
+    )
+
+    assert selected_fields(info, ("edges", "node")) == {
+        "title",
+        "completion_comments",
+    }
@@ -0,0 +1,50 @@
+import json
+from collections import namedtuple
+from decimal import Decimal
+from flask import Flask
+from app.statistics import SemesterStatisticsStore, compute_observations
+from app.util import _SemesterContent
+
+SEMESTER = _SemesterContent(year="2019", semester="1")
+
+
+def test_observation_times_are_floats(monkeypatch):
+    """Observation times are stored as floats, so that they can be saved as JSON."""
+
+    Row = namedtuple("Row", ["ObsTime", "BlockVisitStatus"])
+    monkeypatch.setattr(
+        "app.statistics.fetch_rows",
+        lambda sql, params: [Row(Decimal("1200.5"), "Accepted"), Row(None, "Deleted")],
+    )
+
+    observations = compute_observations(SEMESTER)
+
+    assert observations == [[1200.5, "Accepted"], [0, "Deleted"]]
+    assert json.loads(json.dumps(observations)) == observations
+
+
+def test_open_semester_is_recomputed_after_ttl(monkeypatch):
+    """The statistics of an open semester are reused until they are outdated."""
+
+    now = [1000.0]
+    calls = []
+    monkeypatch.setattr("app.statistics.time.time", lambda: now[0])
+    monkeypatch.setattr("app.statistics.is_closed_semester", lambda semester: False)
+    monkeypatch.setattr(
+        SemesterStatisticsStore,
+        "COMPUTE",
+        dict(observations=lambda semester: calls.append(semester) or [[1.0, "x"]]),
+    )
+
+    app = Flask(__name__)
+    store = SemesterStatisticsStore()
+    store.init_app(app)
+
+    assert store.observations(SEMESTER) == [[1.0, "x"]]
+    now[0] += 599
+    assert store.observations(SEMESTER) == [[1.0, "x"]]
+    assert len(calls) == 1
+
+    now[0] += 2
+    store.observations(SEMESTER)
+    assert len(calls) == 2
@@ -0,0 +1,69 @@
+import hashlib
+import io
+import zipfile
+import pytest
+from graphql import GraphQLError
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import RequestEntityTooLarge
+from app.submission import SpooledUpload, SubmissionPackage
+
+
+def _zip_content(entries):
+    content = io.BytesIO()
+    with zipfile.ZipFile(content, "w") as z:
+        for name, data in entries.items():
+            z.writestr(name, data)
+    return content.getvalue()
+
+
+def _upload(content, max_size=None):
+    spooled = SpooledUpload(max_size=max_size)
+    for i in range(0, len(content), 100):
+        spooled.write(content[i : i + 100])
+    spooled.seek(0)
+    return FileStorage(stream=spooled, filename="proposal.zip")
+
+
+def test_spooled_upload_tracks_size_and_hash():
+    """A spooled upload knows its size and SHA-256 hash."""
+
+    content = _zip_content({"Proposal.xml": "<Proposal/>"})
+    upload = _upload(content)
+
+    assert upload.stream.size == len(content)
+    assert upload.stream.sha256 == hashlib.sha256(content).hexdigest()
+    assert upload.stream.read() == content
+
+
+def test_spooled_upload_is_limited_in_size():
+    """An upload larger than the maximum size is rejected."""
+
+    with pytest.raises(RequestEntityTooLarge):
+        _upload(b"x" * 1000, max_size=999)
+
+
+def test_submission_package_reads_entries():
+    """The entries of a submission package can be read."""
+
+    content = _zip_content({"Proposal.xml": "<Proposal/>", "chart.pdf": "chart"})
+    package = SubmissionPackage(_upload(content).stream, "Proposal.xml")
+
+    assert sorted(package.names()) == ["Proposal.xml", "chart.pdf"]
+    assert package.open("Proposal.xml").read() == b"<Proposal/>"
+    assert package.size == len(content)
+
+
+def test_submission_package_requires_entry():
+    """A submission package must contain the required entry."""
+
+    content = _zip_content({"Block.xml": "<Block/>"})
+    with pytest.raises(GraphQLError):
+        SubmissionPackage(_upload(content).stream, "Proposal.xml")
+
+
+def test_submission_package_limits_uncompressed_size():
+    """The uncompressed content of a submission package is limited in size."""
+
+    content = _zip_content({"Proposal.xml": "x" * 10000})
+    with pytest.raises(GraphQLError):
+        SubmissionPackage(_upload(content).stream, "Proposal.xml", 1000)
@@ -0,0 +1,59 @@
+import threading
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from app.tracing import Tracer, add_statement_listener, current_trace, timed_batch
+
+
+def test_timed_batch_records_to_request_trace():
+    """Batches are recorded in the trace of the request, even in other threads."""
+
+    app = Flask(__name__)
+    with app.app_context():
+        trace = Tracer.start_trace()
+        fetch = timed_batch("proposal", lambda keys: [current_trace() for _ in keys])
+
+        values = []
+        thread = threading.Thread(target=lambda: values.extend(fetch(["a", "b"])))
+        thread.start()
+        thread.join()
+
+        assert values == [trace, trace]
+        assert len(trace.batches) == 1
+        assert trace.batches[0]["loader"] == "proposal"
+        assert trace.batches[0]["size"] == 2
+
+    assert current_trace() is None
+
+
+def test_trace_format():
+    """The trace is formatted in the Apollo tracing format."""
+
+    app = Flask(__name__)
+    with app.app_context():
+        trace = Tracer.start_trace()
+        content = trace.as_dict()
+
+    assert content["version"] == 1
+    assert content["execution"] == {"resolvers": []}
+    assert content["duration"] >= 0
+    assert content["batches"] == [] and content["statements"] == []
+
+
+def test_failed_statements_do_not_leave_start_times():
+    """The start time of a failed statement doesn't remain with the connection."""
+
+    statements = []
+    add_statement_listener(lambda statement, *args: statements.append(statement))
+
+    engine = create_engine("sqlite://")
+    with engine.connect() as connection:
+        with pytest.raises(OperationalError):
+            connection.execute("SELECT * FROM NoSuchTable")
+        assert not connection.info.get("statement_start_times")
+
+        connection.execute("SELECT 1")
+        assert not connection.info.get("statement_start_times")
+
+    assert statements[-1] == "SELECT 1"